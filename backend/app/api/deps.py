@@ -1,37 +1,91 @@
+import math
 from collections.abc import Generator
+from datetime import datetime
 from typing import Annotated
 
-from sqlalchemy.orm import Session
-
 import jwt
-from fastapi import Depends, HTTPException, status, Path
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import Depends, Header, HTTPException, Query, Request, status
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
+from sqlalchemy.orm import Session
 
-from app.database.session import engine
-from app.core import security
+from app.core import rls, security
 from app.core.config import settings
-
-from app.schemas.token import TokenData
-from app.schemas.user import User
+from app.core.rate_limit import check_login_attempt
+from app.core.revocation import revocation_cache
+from app.core.tracing import traced
+from app.crud.batch import MAX_BATCH_IDS
 from app.crud.user import get_user_by_email
-
+from app.database.replicas import last_write, replica_router
+from app.database.session import get_engine
+from app.database.shards import DEFAULT_SHARD, shard_router
 from app.models.role import Role
 from app.models.subject import Subject
+from app.schemas.token import TokenData
+from app.schemas.user import User
+
+# Set on the scope of sub-requests of POST /batch, see app.api.routes.batch
+BATCH_SCOPE_KEY = "gradetracker.batch"
+
+# Shard of the tenant a superuser acts in, see get_db
+TENANT_HEADER = "X-Tenant-ID"
+
 
 # Database Session
-def get_db() -> Generator[Session, None, None]:
+def _token_tenant(request: Request) -> int | None:
+    # The tenant claim of a valid bearer token, before get_current_user ran.
+    # Superusers act in the tenant named by X-Tenant-ID, their own by default
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM])
+    except InvalidTokenError:
+        return None
+    tenant = request.headers.get(TENANT_HEADER)
+    if tenant is not None and payload.get("role") == Role.SUPERUSER.value:
+        if not tenant.isdigit():
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{TENANT_HEADER} must be a tenant id.")
+        return int(tenant)
+    return payload.get("tid")
+
+
+def get_db(request: Request) -> Generator[Session, None, None]:
     """
     Dependency that provides a SQLAlchemy session.
 
     This function is a generator that yields a SQLAlchemy session object.
-    It ensures that the session is properly closed after use.
+    It ensures that the session is properly closed after use. Sub-requests
+    of a batch share the session of the batch, which closes it. With
+    SHARD_URLS, the session is bound to the shard of the caller's tenant;
+    superusers writing for another school name its tenant in X-Tenant-ID.
 
     Yields:
         Session: A SQLAlchemy session object.
+
+    Raises:
+        HTTPException: 503 for writes while the caller's tenant is being moved,
+                       400 for an X-Tenant-ID that isn't a tenant id.
     """
-    with Session(engine) as session:
+    batch = request.scope.get(BATCH_SCOPE_KEY)
+    if batch is not None:
+        yield batch.session
+        return
+
+    if not shard_router.enabled:
+        with Session(get_engine()) as session:
+            yield session
+        return
+
+    tenant_id = _token_tenant(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and shard_router.is_read_only(tenant_id):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The school is being moved, please retry shortly.",
+            headers={"Retry-After": str(math.ceil(settings.SHARD_MAP_REFRESH_SECONDS))},
+        )
+    with shard_router.session(shard_router.shard_of(tenant_id)) as session:
         yield session
 
 SessionDep = Annotated[Session, Depends(get_db)]
@@ -43,11 +97,15 @@ reusable_oauth2 = OAuth2PasswordBearer(
 
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+@traced()
+def get_current_user(request: Request, session: SessionDep, token: TokenDep) -> User:
     """
     Retrieve the current user based on the provided session and token.
 
+    Sub-requests of a batch reuse the principal resolved for the batch.
+
     Args:
+        request (Request): The incoming request.
         session (SessionDep): The database session dependency.
         token (TokenDep): The JWT token dependency.
 
@@ -55,15 +113,19 @@ def get_current_user(session: SessionDep, token: TokenDep) -> User:
         User: The authenticated user.
 
     Raises:
-        HTTPException: If the token is invalid, credentials cannot be validated,
-                       the user is not found, or the user is inactive.
+        HTTPException: If the token is invalid or revoked, credentials cannot be
+                       validated, the user is not found, or the user is inactive.
     """
+    batch = request.scope.get(BATCH_SCOPE_KEY)
+    if batch is not None:
+        return batch.user
+
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
         username = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("type", "access") != "access":
             raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -74,17 +136,81 @@ def get_current_user(session: SessionDep, token: TokenDep) -> User:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
-    user = get_user_by_email(db=session, email=token_data.username)
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    if user.updated_at: # change to deleted_at
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+
+    if "uid" in payload:
+        # Stateless validation: the user travels in the signed token and
+        # revocations (logout, deactivation) come from the in-memory cache
+        revocation_cache.refresh(session)
+        if revocation_cache.is_revoked(payload):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+        user = User.model_construct(
+            id=payload["uid"],
+            username=payload["username"],
+            email=token_data.username,
+            role=Role(payload["role"]),
+            created_at=datetime.fromisoformat(payload["created_at"]),
+            updated_at=None,
+            tenant_id=payload.get("tid"),
+        )
+    else:
+        # Tokens issued before refresh tokens existed only carry the e-mail
+        user = get_user_by_email(db=session, email=token_data.username)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        if user.updated_at: # change to deleted_at
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+    # The crud functions take the role from here instead of loading the user
+    session.info["principal"] = user
+    rls.set_principal(session, user.id, user.role)
     return user
 
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 
+def get_streaming_user(
+    request: Request, session: Annotated[Session, Depends(get_db, scope="function")], token: TokenDep
+) -> User:
+    """
+    Retrieve the current user for routes streaming a long-lived response.
+
+    The session is closed as soon as the route returns, before the response
+    is streamed, so open streams don't hold pooled connections.
+
+    Returns:
+        User: The authenticated user.
+    """
+    return get_current_user(request, session, token)
+
+StreamingUser = Annotated[User, Depends(get_streaming_user)]
+
+
+def get_read_db(request: Request, session: SessionDep, current_user: CurrentUser) -> Generator[Session, None, None]:
+    """
+    Dependency that provides a session for read-only routes.
+
+    The session is bound to a healthy read replica chosen round-robin. It falls
+    back to the primary session if no replica is configured or available, if
+    the client wrote within the last READ_REPLICA_LAG_SECONDS, inside a batch
+    (whose reads must see its own writes), or if the user's tenant is on
+    another shard (replicas are of the primary database).
+
+    Yields:
+        Session: A SQLAlchemy session object.
+    """
+    replica = replica_router.choose(last_write())
+    if replica is None or BATCH_SCOPE_KEY in request.scope or session.info.get("shard", DEFAULT_SHARD) != DEFAULT_SHARD:
+        yield session
+        return
+
+    with Session(replica) as read_session:
+        read_session.info["principal"] = current_user
+        rls.set_principal(read_session, current_user.id, current_user.role)
+        yield read_session
+
+ReadSessionDep = Annotated[Session, Depends(get_read_db)]
+
+
 def get_current_active_superuser(current_user: CurrentUser) -> User:
     """
     Verify if the current user is a superuser.
@@ -111,3 +237,77 @@ def verify_subject_ownership(current_user: CurrentUser) -> Subject:
         )
 
     return current_user
+
+
+# Batch lookups
+def get_batch_ids(ids: str = Query(..., description="Comma separated list of IDs, e.g. 1,2,3")) -> list[int]:
+    """
+    Parse the comma separated ``ids`` query parameter of batch lookups.
+
+    Duplicates are dropped while keeping the request order.
+
+    Raises:
+        HTTPException: If an ID is not an integer or too many IDs are requested.
+    """
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="IDs must be integers.")
+
+    unique_ids = list(dict.fromkeys(parsed))
+    if not unique_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="At least one ID is required.")
+    if len(unique_ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_BATCH_IDS} IDs per request."
+        )
+    return unique_ids
+
+BatchIdsDep = Annotated[list[int], Depends(get_batch_ids)]
+
+
+# Login throttling
+def limit_login_attempts(request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]) -> None:
+    """
+    Reject login attempts over the per e-mail or per IP budget.
+
+    Runs before the login route touches the database or bcrypt.
+
+    Raises:
+        HTTPException: 429 with a Retry-After header if the budget is exhausted.
+    """
+    client_ip = request.client.host if request.client else None
+    retry_after = check_login_attempt(form_data.username, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please try again later.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+# Optional Idempotency-Key header of the create routes, see app.core.idempotency
+IdempotencyKeyDep = Annotated[str | None, Header(alias="Idempotency-Key", min_length=1, max_length=255)]
+
+
+# Optimistic concurrency of the PUT routes
+def get_if_match(if_match: Annotated[str | None, Header(alias="If-Match")] = None) -> int | None:
+    """
+    Parse the If-Match header into the row version the client expects.
+
+    Accepts the ETag of the PUT responses (``"3"``, also weak or unquoted).
+
+    Returns:
+        int | None: The expected version, or None if the header is missing or ``*``.
+
+    Raises:
+        HTTPException: If the header is not a version ETag.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.strip().removeprefix("W/").strip('"')
+    if not tag.isdigit():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="If-Match must be a version ETag.")
+    return int(tag)
+
+IfMatchDep = Annotated[int | None, Depends(get_if_match)]
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.routes import login, user, exam, subject, grade
+from app.api.routes import login, user, exam, subject, grade, search, events, sync, metrics, batch, profiles, slow_queries, tenants, audit
 
 api_router = APIRouter()
 
@@ -9,3 +9,12 @@ api_router.include_router(user.router, prefix="/users", tags=["users"])
 api_router.include_router(exam.router, prefix="/exams", tags=["exams"])
 api_router.include_router(subject.router, prefix="/subjects", tags=["subjects"])
 api_router.include_router(grade.router, prefix="/grades", tags=["grades"])
+api_router.include_router(search.router, prefix="/search", tags=["search"])
+api_router.include_router(events.router, prefix="/events", tags=["events"])
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+api_router.include_router(batch.router, prefix="/batch", tags=["batch"])
+api_router.include_router(profiles.router, prefix="/profiles", tags=["profiles"])
+api_router.include_router(slow_queries.router, prefix="/slow-queries", tags=["slow-queries"])
+api_router.include_router(tenants.router, prefix="/tenants", tags=["tenants"])
+api_router.include_router(audit.router, prefix="/audit", tags=["audit"])
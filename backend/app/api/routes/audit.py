@@ -0,0 +1,25 @@
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.crud import audit as crud
+from app.schemas.audit import AuditPage
+from app.api.deps import SessionDep, CurrentUser, get_current_active_superuser
+from app.exceptions.subject import PermissionDenied
+
+
+router = APIRouter(dependencies=[Depends(get_current_active_superuser)])
+
+# Who changed which subject, exam, grade, user or tenant, newest first
+@router.get("/", response_model=AuditPage, status_code=status.HTTP_200_OK)
+def get_audit_log(
+    db: SessionDep,
+    current_user: CurrentUser,
+    entity: Optional[Literal["subject", "exam", "grade", "user", "tenant"]] = None,
+    entity_id: Optional[int] = None,
+    principal_id: Optional[int] = None,
+    before: Optional[int] = Query(None, ge=1),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    try:
+        return crud.get_audit_log(db, current_user.id, entity, entity_id, principal_id, before=before, limit=limit)
+    except PermissionDenied:
+        raise HTTPException(403, detail="Permission denied.")
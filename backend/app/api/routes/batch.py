@@ -0,0 +1,160 @@
+import json
+import logging
+from dataclasses import dataclass
+
+from fastapi import APIRouter, Request, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.api.deps import BATCH_SCOPE_KEY, CurrentUser, SessionDep
+from app.core import rls
+from app.core.config import settings
+from app.core.tracing import current_span
+from app.database.session import DEFERRED_KEY
+from app.database.shards import DEFAULT_SHARD, shard_router
+from app.schemas.batch import BatchOperation, BatchRequest, BatchResult
+from app.schemas.user import User
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Nested batches and the endless SSE stream can't run as sub-requests
+EXCLUDED_PATHS = ("/batch", "/events")
+
+
+@dataclass
+class BatchContext:
+    """Session and principal shared by the sub-requests of a batch."""
+    session: Session
+    user: User
+
+
+async def _dispatch(request: Request, operation: BatchOperation, context: BatchContext) -> BatchResult:
+    """
+    Run one operation through the app and capture its response.
+
+    Sub-requests pass the whole middleware stack like any request: they are
+    admitted in their own route group, traced as children of the batch's
+    span, profiled and tagged as the origin of their queries.
+    """
+    path, _, query = operation.path.partition("?")
+    if path.rstrip("/").startswith(EXCLUDED_PATHS):
+        return BatchResult(status=status.HTTP_400_BAD_REQUEST, body={"detail": f"{path} can't be batched."})
+
+    body = b"" if operation.body is None else json.dumps(operation.body).encode()
+    headers = [
+        (name, value) for name, value in request.scope["headers"]
+        if name not in (b"content-type", b"content-length", b"traceparent")
+    ]
+    headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    span = current_span()
+    if span is not None:
+        headers.append((b"traceparent", span.traceparent.encode()))
+    full_path = settings.API_V1_STR + path
+
+    scope = {
+        **request.scope,
+        "method": operation.method,
+        "path": full_path,
+        "raw_path": full_path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+        BATCH_SCOPE_KEY: context,
+    }
+    for key in ("route", "endpoint", "path_params"):
+        scope.pop(key, None)
+
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if request_sent:
+            return {"type": "http.disconnect"}
+        request_sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    response = {"status": 500, "body": b"", "json": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["json"] = any(
+                name == b"content-type" and value.startswith(b"application/json")
+                for name, value in message.get("headers", [])
+            )
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:
+        logger.exception("Batch operation %s %s failed", operation.method, operation.path)
+        return BatchResult(status=status.HTTP_500_INTERNAL_SERVER_ERROR, body={"detail": "Internal Server Error"})
+
+    if not response["body"]:
+        result_body = None
+    elif response["json"]:
+        result_body = json.loads(response["body"])
+    else:
+        result_body = response["body"].decode(errors="replace")
+    return BatchResult(status=response["status"], body=result_body)
+
+
+def _commit(session: Session, transaction) -> None:
+    transaction.commit()
+    for callback in session.info.pop(DEFERRED_KEY):
+        callback()
+
+
+def _close(session: Session, connection) -> None:
+    session.close()
+    connection.close()
+
+
+# Run several API calls in one request, sharing one session and the resolved user
+@router.post("/", response_model=list[BatchResult], status_code=status.HTTP_200_OK)
+async def run_batch(request: Request, data: BatchRequest, db: SessionDep, current_user: CurrentUser):
+    if not data.atomic:
+        context = BatchContext(db, current_user)
+        return [await _dispatch(request, operation, context) for operation in data.operations]
+
+    # The crud functions commit; joined into an outer transaction, their
+    # commits only release savepoints and the batch decides at the end
+    connection = await run_in_threadpool(db.get_bind().connect)
+    transaction = await run_in_threadpool(connection.begin)
+    # On a shard, users and audit entries stay on the primary database,
+    # outside the batch's transaction
+    shard = db.info.get("shard", DEFAULT_SHARD)
+    session = Session(
+        bind=connection, binds=shard_router.directory_binds(shard), join_transaction_mode="create_savepoint"
+    )
+    session.info["shard"] = shard
+    session.info["principal"] = current_user
+    # Audit entries, change events and cached responses of the operations
+    # wait for the outcome of the batch
+    session.info[DEFERRED_KEY] = []
+    try:
+        await run_in_threadpool(rls.set_principal, session, current_user.id, current_user.role)
+        context = BatchContext(session, current_user)
+
+        results = []
+        for operation in data.operations:
+            results.append(await _dispatch(request, operation, context))
+            if results[-1].status >= 400:
+                break
+
+        if results[-1].status >= 400:
+            await run_in_threadpool(transaction.rollback)
+            results += [
+                BatchResult(
+                    status=status.HTTP_424_FAILED_DEPENDENCY,
+                    body={"detail": "Not run, an earlier operation failed."},
+                )
+                for _ in data.operations[len(results):]
+            ]
+        else:
+            await run_in_threadpool(_commit, session, transaction)
+        return results
+    finally:
+        await run_in_threadpool(_close, session, connection)
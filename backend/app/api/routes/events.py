@@ -0,0 +1,77 @@
+import asyncio
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.api.deps import StreamingUser, get_db
+from app.core.config import settings
+from app.core.events import ChangeEvent, bus, format_sse
+from app.crud.sync import get_change_events
+from app.models.role import Role
+
+router = APIRouter()
+
+# Tells the client that missed events can't be replayed and it has to refetch
+RESET_EVENT = "event: reset\ndata: {}\n\n"
+
+
+async def _stream(request: Request, subscriber, backlog):
+    try:
+        last_seq = 0
+        if backlog is None:
+            yield RESET_EVENT
+        else:
+            for change in backlog:
+                last_seq = change.seq
+                yield format_sse(change)
+
+        while not await request.is_disconnected():
+            try:
+                change = await asyncio.wait_for(subscriber.queue.get(), timeout=settings.EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            if change is None:
+                # Subscriber queue overflowed, the client must reconnect
+                yield RESET_EVENT
+                break
+            if change.seq > last_seq:
+                yield format_sse(change)
+    finally:
+        bus.unsubscribe(subscriber)
+
+
+def _backlog(db: Session, user_id: int, last_event_id: str | None) -> list[ChangeEvent] | None:
+    # Event ids are change sequences, the same in every worker
+    if not last_event_id:
+        return []
+    if not last_event_id.isdigit():
+        return None
+    return get_change_events(db, user_id, int(last_event_id), settings.EVENTS_REPLAY_LIMIT)
+
+
+# Stream subject, exam and grade changes visible to the current user
+@router.get("/")
+async def stream_events(
+    request: Request,
+    current_user: StreamingUser,
+    db: Annotated[Session, Depends(get_db, scope="function")],
+    last_event_id: Annotated[str | None, Header()] = None,
+):
+    subscriber = bus.subscribe(current_user.id, current_user.role == Role.SUPERUSER)
+    # Replay is computed after subscribing, so nothing falls in between
+    try:
+        backlog = await run_in_threadpool(_backlog, db, current_user.id, last_event_id)
+    except BaseException:
+        bus.unsubscribe(subscriber)
+        raise
+
+    return StreamingResponse(
+        _stream(request, subscriber, backlog),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,21 +1,35 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+
+from app.api.deps import (
+    BatchIdsDep,
+    IdempotencyKeyDep,
+    IfMatchDep,
+    ReadSessionDep,
+    SessionDep,
+    get_current_user,
+)
+from app.core.coalesce import coalesce
+from app.core.idempotency import IdempotentRequest
 from app.crud import exam as crud
-from app.schemas.exam import ExamBase, ExamCreate, ExamRead, ExamUpdate
-from typing import List
-from app.api.deps import SessionDep, CurrentUser, get_current_user
-from app.models.role import Role
-from typing import List
-from app.models.subject import Subject
+from app.exceptions.concurrency import VersionConflict
+from app.exceptions.exam import ExamNotFound, SubjectAccessDenied
+from app.exceptions.idempotency import IdempotencyKeyInProgress, IdempotencyKeyReused
+from app.exceptions.subject import PermissionDenied, SubjectNotFound
 from app.models.user import User
-from app.exceptions.exam import *
-from app.exceptions.subject import *
-
+from app.schemas.batch import BatchItem
+from app.schemas.exam import ExamCreate, ExamRead, ExamUpdate
 
 router = APIRouter()
 
+# Look up several exams at once, e.g. /exams/batch?ids=1,2,3
+@router.get("/batch", response_model=list[BatchItem[ExamRead]], dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
+def get_exams_batch(db: ReadSessionDep, ids: BatchIdsDep, current_user: User=Depends(get_current_user)):
+    return crud.get_exams_by_ids(db, ids, current_user.id)
+
 # Get a single exam by ID if the user has access
 @router.get("/{exam_id}", response_model=ExamRead, dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
-def get_exam(db: SessionDep, exam_id: int, current_user: User=Depends(get_current_user)):
+@coalesce(ExamRead)
+def get_exam(db: ReadSessionDep, exam_id: int, current_user: User=Depends(get_current_user)):
     try:
         return crud.get_exam(db, exam_id, current_user.id)
     except ExamNotFound:
@@ -23,19 +37,28 @@ def get_exam(db: SessionDep, exam_id: int, current_user: User=Depends(get_curren
     except PermissionDenied:
         raise HTTPException(403, detail="Permission denied.")
 
-# Get all exams visible to the current user
-@router.get("/", response_model=List[ExamRead], dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
-def get_exams(db: SessionDep, current_user: User=Depends(get_current_user)):
+# Get all exams visible to the current user, optionally of one school year, e.g. /exams?school_year=2024
+@router.get("/", response_model=list[ExamRead], dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
+@coalesce(list[ExamRead])
+def get_exams(db: ReadSessionDep, school_year: int | None = None, current_user: User=Depends(get_current_user)):
     try:
-        return crud.get_exams(db, current_user.id)
+        return crud.get_exams(db, current_user.id, school_year)
     except PermissionDenied:
         raise HTTPException(403, detail="Permission denied.")
 
 # Create a new exam (requires editor or superuser)
 @router.post("/create-exam", response_model=ExamRead, dependencies=[Depends(get_current_user)], status_code=status.HTTP_201_CREATED)
-def create_exam(db: SessionDep, data: ExamCreate, current_user: User=Depends(get_current_user)):
+def create_exam(db: SessionDep, data: ExamCreate, idempotency_key: IdempotencyKeyDep = None, current_user: User=Depends(get_current_user)):
     try:
-        return crud.create_exam(db, data, current_user.id)
+        with IdempotentRequest(db, current_user.id, idempotency_key, "create-exam", data) as request:
+            if request.replay is not None:
+                return request.replay
+            exam = crud.create_exam(db, data, current_user.id)
+            return request.respond(ExamRead, exam, status.HTTP_201_CREATED)
+    except IdempotencyKeyReused:
+        raise HTTPException(422, detail="Idempotency-Key was already used for a different request.")
+    except IdempotencyKeyInProgress:
+        raise HTTPException(409, detail="A request with this Idempotency-Key is still in progress.")
     except SubjectNotFound:
         raise HTTPException(404, detail="Subject not found.")
     except SubjectAccessDenied:
@@ -45,9 +68,13 @@ def create_exam(db: SessionDep, data: ExamCreate, current_user: User=Depends(get
 
 # Update an existing exam (requires editor or superuser)
 @router.put("/update-exam/{exam_id}", response_model=ExamRead, dependencies=[Depends(get_current_user)], status_code=status.HTTP_201_CREATED)
-def update_exam(db: SessionDep, exam_id: int, new_data: ExamUpdate, current_user: User=Depends(get_current_user)):
+def update_exam(db: SessionDep, exam_id: int, new_data: ExamUpdate, response: Response, expected_version: IfMatchDep, current_user: User=Depends(get_current_user)):
     try:
-        return crud.update_exam(db, exam_id, new_data, current_user.id)
+        exam = crud.update_exam(db, exam_id, new_data, current_user.id, expected_version)
+        response.headers["ETag"] = f'"{exam.version}"'
+        return exam
+    except VersionConflict:
+        raise HTTPException(409, detail="Exam was changed by someone else, reload it and try again.")
     except ExamNotFound:
         raise HTTPException(404, detail="Exam not found.")
     except SubjectAccessDenied:
@@ -65,4 +92,4 @@ def delete_exam(db: SessionDep, exam_id: int, current_user: User=Depends(get_cur
     except SubjectAccessDenied:
         raise HTTPException(403, detail="You don't have access to this subject.")
     except PermissionDenied:
-        raise HTTPException(403, detail="Permission denied.")
\ No newline at end of file
+        raise HTTPException(403, detail="Permission denied.")
@@ -1,18 +1,29 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, Response, status, HTTPException
 from app.schemas.grade import GradeCreate, GradeUpdate, GradeRead
-from app.api.deps import SessionDep, get_current_user
+from app.core.coalesce import coalesce
+from app.api.deps import SessionDep, ReadSessionDep, BatchIdsDep, get_current_user, IdempotencyKeyDep, IfMatchDep
+from app.core.idempotency import IdempotentRequest
+from app.schemas.batch import BatchItem
 from app.crud import grade as crud
 from typing import List
 from app.models.user import User
 from app.exceptions.exam import *
 from app.exceptions.subject import *
 from app.exceptions.grade import *
+from app.exceptions.idempotency import *
+from app.exceptions.concurrency import *
 
 router = APIRouter()
 
+# Look up several grades at once, e.g. /grades/batch?ids=1,2,3
+@router.get("/batch", response_model=List[BatchItem[GradeRead]], dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
+def get_grades_batch(db: ReadSessionDep, ids: BatchIdsDep, current_user: User=Depends(get_current_user)):
+    return crud.get_grades_by_ids(db, ids, current_user.id)
+
 # Fetch a single grade by ID (only for superusers or owners of the subject)
 @router.get("/{grade_id}", response_model=GradeRead, dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
-def get_grade(grade_id: int, db: SessionDep, current_user: User=Depends(get_current_user)):
+@coalesce(GradeRead)
+def get_grade(grade_id: int, db: ReadSessionDep, current_user: User=Depends(get_current_user)):
     try:
         return crud.get_grade(db, grade_id, current_user.id)
     except GradeNotFound:
@@ -22,19 +33,28 @@ def get_grade(grade_id: int, db: SessionDep, current_user: User=Depends(get_curr
     except PermissionDenied:
         raise HTTPException(403, detail="Permission denied.")
 
-# Fetch all grades for the current user (superuser sees all)
+# Fetch all grades for the current user (superuser sees all), optionally of one school year
 @router.get("/", response_model=List[GradeRead], dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
-def get_grades(db: SessionDep, current_user: User=Depends(get_current_user)):
+@coalesce(List[GradeRead])
+def get_grades(db: ReadSessionDep, school_year: int | None = None, current_user: User=Depends(get_current_user)):
     try:
-        return crud.get_grades(db, current_user.id)
+        return crud.get_grades(db, current_user.id, school_year)
     except PermissionDenied:
         raise HTTPException(403, detail="Permission denied.")
 
 # Create a new grade (editor or superuser, subject must belong to user)
 @router.post("/create-grade", response_model=GradeRead, dependencies=[Depends(get_current_user)], status_code=status.HTTP_201_CREATED)
-def create_grade(data: GradeCreate, db: SessionDep, current_user: User=Depends(get_current_user)):
+def create_grade(data: GradeCreate, db: SessionDep, idempotency_key: IdempotencyKeyDep = None, current_user: User=Depends(get_current_user)):
     try:
-        return crud.create_grade(db, data, current_user.id)
+        with IdempotentRequest(db, current_user.id, idempotency_key, "create-grade", data) as request:
+            if request.replay is not None:
+                return request.replay
+            grade = crud.create_grade(db, data, current_user.id)
+            return request.respond(GradeRead, grade, status.HTTP_201_CREATED)
+    except IdempotencyKeyReused:
+        raise HTTPException(422, detail="Idempotency-Key was already used for a different request.")
+    except IdempotencyKeyInProgress:
+        raise HTTPException(409, detail="A request with this Idempotency-Key is still in progress.")
     except ExamNotFound:
         raise HTTPException(404, detail="Exam not found.")
     except SubjectNotFound:
@@ -48,9 +68,13 @@ def create_grade(data: GradeCreate, db: SessionDep, current_user: User=Depends(g
 
 # Update an existing grade (editor or superuser, subject must belong to user)
 @router.put("/update-grade/{grade_id}", response_model=GradeRead, dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
-def update_grade(grade_id: int, new_data: GradeUpdate, db: SessionDep, current_user: User=Depends(get_current_user)):
+def update_grade(grade_id: int, new_data: GradeUpdate, db: SessionDep, response: Response, expected_version: IfMatchDep, current_user: User=Depends(get_current_user)):
     try:
-        return crud.update_grade(db, grade_id, new_data, current_user.id)
+        grade = crud.update_grade(db, grade_id, new_data, current_user.id, expected_version)
+        response.headers["ETag"] = f'"{grade.version}"'
+        return grade
+    except VersionConflict:
+        raise HTTPException(409, detail="Grade was changed by someone else, reload it and try again.")
     except GradeNotFound:
         raise HTTPException(404, detail="Grade not found.")
     except ExamNotFound:
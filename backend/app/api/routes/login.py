@@ -1,37 +1,111 @@
-from datetime import timedelta
-from typing import List, Annotated, Any
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Any
 
+import jwt
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from jwt.exceptions import InvalidTokenError
 
+from app.api.deps import CurrentUser, SessionDep, limit_login_attempts
+from app.core import security
+from app.core.config import settings
+from app.core.revocation import purge_expired
+from app.crud import token as token_crud
 from app.crud import user as crud
+from app.exceptions.token import TokenAlreadyRevoked
 from app.schemas import token as schemas
 from app.schemas.user import User
-from app.api.deps import SessionDep, CurrentUser
-from app.core.config import settings
-from app.core import security
-
 
 router = APIRouter()
 
-@router.post("/", response_model=schemas.Token)
-def login_access_token(
+def _issue_tokens(user) -> schemas.Token:
+    # Everything get_current_user needs, so access tokens validate without a DB lookup
+    claims = {
+        "uid": user.id,
+        "username": user.username,
+        "role": user.role.value,
+        "created_at": user.created_at.isoformat(),
+        # Routes the user's requests to the tenant's shard
+        "tid": user.tenant_id,
+    }
+    return schemas.Token(
+        access_token=security.create_access_token(
+            user.email, expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES), claims=claims
+        ),
+        refresh_token=security.create_refresh_token(
+            user.email, user.id, expires_delta=timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+        ),
+        token_type="bearer",
+    )
+
+def _decode_refresh_token(refresh_token: str) -> dict:
+    try:
+        payload = jwt.decode(refresh_token, settings.SECRET_KEY, algorithms=[security.ALGORITHM])
+    except InvalidTokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    if payload.get("type") != "refresh" or "jti" not in payload or "uid" not in payload:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    return payload
+
+
+@router.post("/", response_model=schemas.Token, dependencies=[Depends(limit_login_attempts)])
+async def login_access_token(
     session: SessionDep, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
 ) -> schemas.Token:
-    user = crud.authenticate_user(db=session, email=form_data.username, password=form_data.password)
+    user = await crud.authenticate_user_async(db=session, email=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect username or password")
     elif user.updated_at:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    return schemas.Token(
-        access_token=security.create_access_token(
-            user.email, expires_delta=access_token_expires
-        ), token_type="bearer"
-    )
+    return _issue_tokens(user)
+
+
+def _revoke_reused(session, user_id: int):
+    # A rotated refresh token was used again, it has probably been stolen
+    token_crud.revoke_user_tokens(session, user_id)
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+
+
+@router.post("/refresh", response_model=schemas.Token)
+def refresh_access_token(session: SessionDep, data: schemas.RefreshRequest) -> schemas.Token:
+    payload = _decode_refresh_token(data.refresh_token)
+    issued_at = datetime.fromtimestamp(payload["iat"], timezone.utc)
+
+    if token_crud.is_token_revoked(session, payload["jti"], payload["uid"], issued_at):
+        _revoke_reused(session, payload["uid"])
+
+    user = crud.get_user(db=session, user_id=payload["uid"])
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    if user.updated_at:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+
+    # Rotate: the presented refresh token can't be used again
+    purge_expired(session)
+    try:
+        token_crud.revoke_token(
+            session, payload["jti"], user.id, expires_at=datetime.fromtimestamp(payload["exp"], timezone.utc)
+        )
+    except TokenAlreadyRevoked:
+        # Rotated by a concurrent request in the meantime
+        _revoke_reused(session, payload["uid"])
+    return _issue_tokens(user)
+
+
+@router.post("/logout", response_model=bool)
+def logout(session: SessionDep, data: schemas.RefreshRequest) -> bool:
+    payload = _decode_refresh_token(data.refresh_token)
+    purge_expired(session)
+    try:
+        token_crud.revoke_token(
+            session, payload["jti"], payload["uid"], expires_at=datetime.fromtimestamp(payload["exp"], timezone.utc)
+        )
+    except TokenAlreadyRevoked:
+        # Logged out already
+        pass
+    return True
 
 
 @router.post("/me", response_model=User)
 def test_access_token(current_user: CurrentUser) -> Any:
     return current_user
-
@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Depends
+from app.api.deps import get_current_active_superuser
+from app.core.metrics import metrics
+
+router = APIRouter()
+
+# Counters and gauges of this worker process
+@router.get("/", dependencies=[Depends(get_current_active_superuser)])
+def get_metrics():
+    return metrics.snapshot()
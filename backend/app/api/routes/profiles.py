@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.api.deps import CurrentUser, get_current_active_superuser
+from app.core.config import settings
+from app.core.profiling import PROFILE_HEADER, create_profile_token, sampler
+
+router = APIRouter(dependencies=[Depends(get_current_active_superuser)])
+
+# Signed value for the X-Profile header, profiling the requests sending it
+@router.post("/token")
+def create_token(current_user: CurrentUser):
+    expires = timedelta(minutes=settings.PROFILING_TOKEN_EXPIRE_MINUTES)
+    return {
+        "header": PROFILE_HEADER.decode(),
+        "token": create_profile_token(current_user.id, expires),
+        "expires_in": int(expires.total_seconds()),
+    }
+
+# Summaries of the recorded profiles, newest first
+@router.get("/")
+def get_profiles():
+    return [profile.summary() for profile in sampler.recent()]
+
+# One profile as collapsed stacks, ready for flamegraph.pl or speedscope
+@router.get("/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: int):
+    profile = sampler.get(profile_id)
+    if profile is None:
+        raise HTTPException(404, detail="Profile not found.")
+    return profile.collapsed()
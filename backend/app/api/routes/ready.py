@@ -0,0 +1,12 @@
+from fastapi import APIRouter, HTTPException
+
+from app.core import warmup
+
+router = APIRouter()
+
+# Readiness probe: 503 until the startup warm-up of this worker is done
+@router.get("/ready")
+def get_ready():
+    if not warmup.state.ready:
+        raise HTTPException(503, detail=warmup.state.error or "Warming up.")
+    return {"status": "ready", "warmup_ms": warmup.state.durations}
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, Query, status
+from app.crud import search as crud
+from app.schemas.search import SearchHit
+from typing import List
+from app.api.deps import ReadSessionDep, get_current_user
+from app.models.user import User
+
+router = APIRouter()
+
+# Ranked full-text / fuzzy search over the subjects and exams visible to the user
+@router.get("/", response_model=List[SearchHit], dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
+def search(
+    db: ReadSessionDep,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: User=Depends(get_current_user),
+):
+    return crud.search(db, q, current_user.id, limit=limit, offset=offset)
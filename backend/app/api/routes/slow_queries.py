@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, status
+
+from app.api.deps import get_current_active_superuser
+from app.core.slow_queries import store
+
+router = APIRouter(dependencies=[Depends(get_current_active_superuser)])
+
+# Statements above SLOW_QUERY_THRESHOLD_MS by fingerprint, most total time first
+@router.get("/")
+def get_slow_queries(limit: int = 50):
+    return [entry.summary() for entry in store.entries()[:limit]]
+
+# Start over, e.g. after deploying a fix
+@router.delete("/", response_model=bool, status_code=status.HTTP_200_OK)
+def clear_slow_queries():
+    store.clear()
+    return True
@@ -1,16 +1,68 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+
+from app.api.deps import (
+    BatchIdsDep,
+    IdempotencyKeyDep,
+    IfMatchDep,
+    ReadSessionDep,
+    SessionDep,
+    get_current_user,
+)
+from app.core.coalesce import coalesce
+from app.core.idempotency import IdempotentRequest
 from app.crud import subject as crud
-from app.schemas.subject import SubjectBase, SubjectCreate, SubjectRead, SubjectUpdate
-from typing import List
-from app.api.deps import SessionDep, get_current_user
+from app.exceptions.concurrency import VersionConflict
+from app.exceptions.idempotency import IdempotencyKeyInProgress, IdempotencyKeyReused
+from app.exceptions.subject import (
+    InvalidSubjectOwner,
+    PermissionDenied,
+    SubjectAlreadyDeleted,
+    SubjectNotFound,
+)
+from app.exceptions.tenant import WrongShard
 from app.models.user import User
-from app.exceptions.subject import *
+from app.schemas.batch import BatchItem
+from app.schemas.subject import (
+    SubjectCreate,
+    SubjectFull,
+    SubjectRead,
+    SubjectUpdate,
+)
 
 router = APIRouter()
 
+# Look up several subjects at once, e.g. /subjects/batch?ids=1,2,3
+@router.get("/batch", response_model=list[BatchItem[SubjectRead]], dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
+def get_subjects_batch(db: ReadSessionDep, ids: BatchIdsDep, current_user: User=Depends(get_current_user)):
+    return crud.get_subjects_by_ids(db, ids, current_user.id)
+
+
+# Get all visible subjects with their exams, grades and aggregates in one request
+@router.get("/full", response_model=list[SubjectFull], dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
+@coalesce(list[SubjectFull])
+def get_subjects_full(db: ReadSessionDep, current_user: User=Depends(get_current_user)):
+    try:
+        return crud.get_subjects_full(db, current_user.id)
+    except PermissionDenied:
+        raise HTTPException(403, detail="Permission denied.")
+
+
+# Get a single subject with its exams, grades and aggregates in one request
+@router.get("/{subject_id}/full", response_model=SubjectFull, dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
+@coalesce(SubjectFull)
+def get_subject_full(db: ReadSessionDep, subject_id: int, current_user: User=Depends(get_current_user)):
+    try:
+        return crud.get_subject_full(db, subject_id, current_user.id)
+    except SubjectNotFound:
+        raise HTTPException(404, detail="Subject not found.")
+    except PermissionDenied:
+        raise HTTPException(403, detail="Permission denied.")
+
+
 # Get a single subject by ID if the user has access
 @router.get("/{subject_id}", response_model=SubjectRead, dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
-def get_subject(db: SessionDep, subject_id: int, current_user: User=Depends(get_current_user)):
+@coalesce(SubjectRead)
+def get_subject(db: ReadSessionDep, subject_id: int, current_user: User=Depends(get_current_user)):
     try:
         return crud.get_subject(db, subject_id, current_user.id)
     except SubjectNotFound:
@@ -20,8 +72,9 @@ def get_subject(db: SessionDep, subject_id: int, current_user: User=Depends(get_
 
 
 # Get all subjects visible to the current user
-@router.get("/", response_model=List[SubjectRead], dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
-def get_subjects(db: SessionDep, current_user: User=Depends(get_current_user)):
+@router.get("/", response_model=list[SubjectRead], dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
+@coalesce(list[SubjectRead])
+def get_subjects(db: ReadSessionDep, current_user: User=Depends(get_current_user)):
     try:
         return crud.get_subjects(db, current_user.id)
     except PermissionDenied:
@@ -30,20 +83,34 @@ def get_subjects(db: SessionDep, current_user: User=Depends(get_current_user)):
 
 # Create a new subject (requires editor or superuser)
 @router.post("/create-subject", response_model=SubjectRead, dependencies=[Depends(get_current_user)], status_code=status.HTTP_201_CREATED)
-def create_subject(db: SessionDep, data: SubjectCreate, current_user: User=Depends(get_current_user)):
+def create_subject(db: SessionDep, data: SubjectCreate, idempotency_key: IdempotencyKeyDep = None, current_user: User=Depends(get_current_user)):
     try:
-        return crud.create_subject(db, data, current_user.id)
+        with IdempotentRequest(db, current_user.id, idempotency_key, "create-subject", data) as request:
+            if request.replay is not None:
+                return request.replay
+            subject = crud.create_subject(db, data, current_user.id)
+            return request.respond(SubjectRead, subject, status.HTTP_201_CREATED)
+    except IdempotencyKeyReused:
+        raise HTTPException(422, detail="Idempotency-Key was already used for a different request.")
+    except IdempotencyKeyInProgress:
+        raise HTTPException(409, detail="A request with this Idempotency-Key is still in progress.")
     except PermissionDenied:
         raise HTTPException(403, detail="Permission denied.")
     except InvalidSubjectOwner:
         raise HTTPException(400, detail="Editors can only create subjects for themselves.")
+    except WrongShard:
+        raise HTTPException(400, detail="The user's school is on another shard, send its tenant id in X-Tenant-ID.")
 
 
 # Update an existing subject (requires editor or superuser)
 @router.put("/update-subject/{subject_id}", response_model=SubjectRead, dependencies=[Depends(get_current_user)], status_code=status.HTTP_201_CREATED)
-def update_subject(db: SessionDep, subject_id: int, new_data: SubjectUpdate, current_user: User=Depends(get_current_user)):
+def update_subject(db: SessionDep, subject_id: int, new_data: SubjectUpdate, response: Response, expected_version: IfMatchDep, current_user: User=Depends(get_current_user)):
     try:
-        return crud.update_subject(db, subject_id, new_data, current_user.id)
+        subject = crud.update_subject(db, subject_id, new_data, current_user.id, expected_version)
+        response.headers["ETag"] = f'"{subject.version}"'
+        return subject
+    except VersionConflict:
+        raise HTTPException(409, detail="Subject was changed by someone else, reload it and try again.")
     except SubjectNotFound:
         raise HTTPException(404, detail="Subject not found.")
     except PermissionDenied:
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, Query, status
+from app.crud import sync as crud
+from app.schemas.sync import SyncChanges
+from app.api.deps import ReadSessionDep, get_current_user
+from app.models.user import User
+
+router = APIRouter()
+
+# Delta sync: everything visible to the user that changed after ``since``
+@router.get("/", response_model=SyncChanges, dependencies=[Depends(get_current_user)], status_code=status.HTTP_200_OK)
+def get_changes(
+    db: ReadSessionDep,
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: User=Depends(get_current_user),
+):
+    return crud.get_changes(db, current_user.id, since, limit=limit)
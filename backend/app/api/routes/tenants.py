@@ -0,0 +1,33 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.crud import tenant as crud
+from app.schemas.tenant import TenantCreate, TenantRead, TenantReport
+from app.api.deps import SessionDep, CurrentUser, get_current_active_superuser
+from app.exceptions.subject import PermissionDenied
+from app.exceptions.tenant import *
+
+
+router = APIRouter(dependencies=[Depends(get_current_active_superuser)])
+
+# All schools with the shard they live on
+@router.get("/", response_model=List[TenantRead], status_code=status.HTTP_200_OK)
+def get_tenants(db: SessionDep):
+    return crud.get_tenants(db)
+
+# Add a school, on the default shard unless another one is given
+@router.post("/", response_model=TenantRead, status_code=status.HTTP_201_CREATED)
+def create_tenant(db: SessionDep, data: TenantCreate, current_user: CurrentUser):
+    try:
+        return crud.create_tenant(db, data, current_user.id)
+    except ShardNotFound:
+        raise HTTPException(422, detail="Shard not configured.")
+    except TenantAlreadyExists:
+        raise HTTPException(409, detail="A tenant with this name already exists.")
+
+# Users, subjects, exams and grades per school, counted on every shard
+@router.get("/report", response_model=List[TenantReport], status_code=status.HTTP_200_OK)
+def get_tenant_report(db: SessionDep, current_user: CurrentUser):
+    try:
+        return crud.get_tenant_report(db, current_user.id)
+    except PermissionDenied:
+        raise HTTPException(403, detail="Permission denied.")
@@ -1,15 +1,21 @@
 from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from app.crud import user as crud
 from app.schemas import user as schemas
 from app.api.deps import SessionDep, CurrentUser, get_current_active_superuser
+from app.core.revocation import revocation_cache
+from app.exceptions.tenant import TenantNotFound
+from app.exceptions.user import UserAlreadyDeactivated, UserNotFound
 
 
 router = APIRouter()
 
 @router.post("/register", dependencies=[Depends(get_current_active_superuser)], response_model=schemas.User)
-def register_user(db: SessionDep, user: schemas.UserCreate):
-    return crud.create_user(db=db, user=user)
+async def register_user(db: SessionDep, user: schemas.UserCreate, current_user: CurrentUser):
+    try:
+        return await crud.create_user(db=db, user=user, owner_id=current_user.id)
+    except TenantNotFound:
+        raise HTTPException(404, detail="Tenant not found.")
 
 @router.get("/{user_id}", response_model=schemas.User)
 def get_user(db: SessionDep, user_id: int):
@@ -18,3 +24,16 @@ def get_user(db: SessionDep, user_id: int):
 @router.get("/", dependencies=[Depends(get_current_active_superuser)], response_model=List[schemas.User])
 def get_users(db: SessionDep):
     return crud.get_users(db=db)
+
+# Deactivate a user, their tokens stop working (requires superuser)
+@router.delete("/deactivate-user/{user_id}", dependencies=[Depends(get_current_active_superuser)], response_model=bool)
+def deactivate_user(db: SessionDep, user_id: int, current_user: CurrentUser):
+    try:
+        crud.deactivate_user(db=db, user_id=user_id, owner_id=current_user.id)
+    except UserNotFound:
+        raise HTTPException(404, detail="User not found.")
+    except UserAlreadyDeactivated:
+        raise HTTPException(400, detail="User is already inactive.")
+    # Other workers pick the revocation up within TOKEN_REVOCATION_REFRESH_SECONDS
+    revocation_cache.refresh(db, force=True)
+    return True
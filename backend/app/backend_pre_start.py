@@ -3,20 +3,21 @@ import logging
 from sqlalchemy import Engine
 from sqlalchemy.orm import Session
 from sqlalchemy import select
-from tenacity import after_log, before_log, retry, stop_after_attempt, wait_fixed
+from tenacity import after_log, before_log, retry, stop_after_delay, wait_exponential
 
 from app.database.session import engine
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-max_tries = 60 * 5  # 5 minutes
-wait_seconds = 1
+max_seconds = 60 * 5  # 5 minutes
 
 
+# Backoff from 0.1 s up to 10 s: a database that is already up is found at
+# once instead of after a fixed 1 s step
 @retry(
-    stop=stop_after_attempt(max_tries),
-    wait=wait_fixed(wait_seconds),
+    stop=stop_after_delay(max_seconds),
+    wait=wait_exponential(multiplier=0.1, max=10),
     before=before_log(logger, logging.INFO),
     after=after_log(logger, logging.WARN),
 )
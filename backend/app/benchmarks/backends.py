@@ -0,0 +1,193 @@
+"""
+Compare the database backends on the standard workload.
+
+Each worker thread acts as one editor: 80 % reads (subject, exam and grade
+lists and a subject lookup) and 20 % writes (new grades, renamed subjects),
+every operation in its own session like a request. Runs against:
+
+- ``sqlite-default``: SQLite with the driver's defaults (as in the tests)
+- ``sqlite``: the tuned embedded mode (DATABASE_BACKEND=sqlite)
+- ``postgres``: the configured Postgres database, or --postgres-url
+
+Usage (run from the backend directory):
+    python -m app.benchmarks.backends --threads 8 --operations 4000
+    python -m app.benchmarks.backends --skip-postgres
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import Engine, create_engine, delete, select
+from sqlalchemy.orm import Session
+
+from app.core import db as _models  # registers all tables on Base.metadata
+from app.core.config import settings
+from app.crud import exam as exam_crud, grade as grade_crud, subject as subject_crud
+from app.database.session import Base
+from app.database.sqlite import create_sqlite_engine
+from app.models.exam import Exam
+from app.models.grade import Grade
+from app.models.grade_enum import GradeEnum
+from app.models.role import Role
+from app.models.subject import Subject
+from app.models.user import User
+from app.schemas.grade import GradeCreate
+from app.schemas.subject import SubjectUpdate
+
+EMAIL_DOMAIN = "backend-bench.invalid"
+WRITE_RATIO = 0.2
+
+
+def seed(engine: Engine, users: int, subjects: int, exams: int) -> list[tuple[int, list[int], list[int]]]:
+    """One (user id, subject ids, exam ids) per editor."""
+    editors = []
+    with Session(engine) as db:
+        for u in range(users):
+            user = User(
+                username=f"backend-bench{u}",
+                email=f"bench{u}@{EMAIL_DOMAIN}",
+                hashed_password="!",
+                role=Role.EDITOR,
+                created_at=datetime.datetime.utcnow(),
+            )
+            db.add(user)
+            db.flush()
+            subject_ids, exam_ids = [], []
+            for s in range(subjects):
+                subject = Subject(user_id=user.id, name=f"Subject {s}")
+                db.add(subject)
+                db.flush()
+                subject_ids.append(subject.id)
+                for e in range(exams):
+                    exam = Exam(subject_id=subject.id, title=f"Exam {e}", date=datetime.datetime(2024, 1, 1))
+                    db.add(exam)
+                    db.flush()
+                    exam_ids.append(exam.id)
+                    db.add(Grade(exam_id=exam.id, exam_date=exam.date, grade=GradeEnum.gut))
+            editors.append((user.id, subject_ids, exam_ids))
+        db.commit()
+    return editors
+
+
+def cleanup(engine: Engine) -> None:
+    with Session(engine) as db:
+        user_ids = select(User.id).where(User.email.like(f"%@{EMAIL_DOMAIN}"))
+        subject_ids = select(Subject.id).where(Subject.user_id.in_(user_ids))
+        exam_ids = select(Exam.id).where(Exam.subject_id.in_(subject_ids))
+        db.execute(delete(Grade).where(Grade.exam_id.in_(exam_ids)))
+        db.execute(delete(Exam).where(Exam.id.in_(exam_ids)))
+        db.execute(delete(Subject).where(Subject.id.in_(subject_ids)))
+        db.execute(delete(User).where(User.id.in_(user_ids)))
+        db.commit()
+
+
+def operation(db: Session, rng: random.Random, user_id: int, subject_ids: list[int], exam_ids: list[int]) -> str:
+    if rng.random() < WRITE_RATIO:
+        if rng.random() < 0.5:
+            grade_crud.create_grade(db, GradeCreate(exam_id=rng.choice(exam_ids), grade=GradeEnum.gut), user_id)
+        else:
+            subject_crud.update_subject(db, rng.choice(subject_ids), SubjectUpdate(name=f"Subject {rng.random():.6f}"), user_id)
+        return "write"
+    read = rng.choice((subject_crud.get_subjects, exam_crud.get_exams, grade_crud.get_grades, None))
+    if read is None:
+        subject_crud.get_subject(db, rng.choice(subject_ids), user_id)
+    else:
+        read(db, user_id)
+    return "read"
+
+
+def run(engine: Engine, editors, operations: int) -> dict[str, float]:
+    latencies: dict[str, list[float]] = {"read": [], "write": []}
+    errors = []
+    lock = threading.Lock()
+    per_thread = operations // len(editors)
+
+    def worker(index: int) -> None:
+        rng = random.Random(index)
+        user_id, subject_ids, exam_ids = editors[index]
+        own = {"read": [], "write": []}
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            try:
+                with Session(engine) as db:
+                    kind = operation(db, rng, user_id, subject_ids, exam_ids)
+            except Exception as e:
+                errors.append(e)
+                continue
+            own[kind].append(time.perf_counter() - start)
+        with lock:
+            for kind, values in own.items():
+                latencies[kind] += values
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(editors))]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    def percentile(values: list[float], q: int) -> float:
+        return statistics.quantiles(values, n=100)[q - 1] * 1000 if len(values) >= 2 else float("nan")
+
+    done = len(latencies["read"]) + len(latencies["write"])
+    return {
+        "ops/s": done / elapsed,
+        "read p50": percentile(latencies["read"], 50),
+        "read p95": percentile(latencies["read"], 95),
+        "write p50": percentile(latencies["write"], 50),
+        "write p95": percentile(latencies["write"], 95),
+        "errors": len(errors),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--operations", type=int, default=4000)
+    parser.add_argument("--subjects", type=int, default=5)
+    parser.add_argument("--exams", type=int, default=5)
+    parser.add_argument("--postgres-url", default=None)
+    parser.add_argument("--skip-postgres", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "sqlite-default": create_engine(
+                f"sqlite:///{os.path.join(tmp, 'default.db')}", connect_args={"check_same_thread": False}
+            ),
+            "sqlite": create_sqlite_engine(
+                os.path.join(tmp, "tuned.db"),
+                cache_size_kib=settings.SQLITE_CACHE_SIZE_KIB,
+                mmap_size=settings.SQLITE_MMAP_SIZE,
+                busy_timeout_ms=settings.SQLITE_BUSY_TIMEOUT_MS,
+                write_timeout=settings.SQLITE_WRITE_TIMEOUT_SECONDS,
+            ),
+        }
+        if not args.skip_postgres:
+            url = args.postgres_url or settings.SQLALCHEMY_DATABASE_URI.unicode_string()
+            backends["postgres"] = create_engine(
+                url, connect_args={"prepare_threshold": settings.POSTGRES_PREPARE_THRESHOLD}
+            )
+
+        columns = ("ops/s", "read p50", "read p95", "write p50", "write p95", "errors")
+        print(f"{'backend':<16}" + "".join(f"{column:>11}" for column in columns) + "   (latencies in ms)")
+        for name, engine in backends.items():
+            Base.metadata.create_all(engine)
+            cleanup(engine)
+            try:
+                editors = seed(engine, args.threads, args.subjects, args.exams)
+                result = run(engine, editors, args.operations)
+            finally:
+                cleanup(engine)
+                engine.dispose()
+            print(f"{name:<16}" + "".join(f"{result[column]:>11.1f}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Per-call overhead of the crud read functions.
+
+Seeds a small dataset and times every read function for an editor and a
+superuser, followed by the id lookups built as ``db.query(...)`` chains
+next to the prebuilt statements of app.crud.statements they replaced.
+The identity map is emptied before every call, as a new request would.
+
+Usage (run from the backend directory; in-memory SQLite unless --url):
+    python -m app.benchmarks.crud --repeat 2000
+    python -m app.benchmarks.crud --url postgresql+psycopg://postgres:pw@localhost/bench
+"""
+import argparse
+import datetime
+import statistics
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.core import db as _models  # registers all tables on Base.metadata
+from app.core.config import settings
+from app.crud import exam as exam_crud, grade as grade_crud, statements, subject as subject_crud
+from app.database.session import Base
+from app.models.exam import Exam
+from app.models.grade import Grade
+from app.models.grade_enum import GradeEnum
+from app.models.role import Role
+from app.models.subject import Subject
+from app.models.user import User
+
+
+def seed(db: Session, subjects: int, exams: int, grades: int) -> tuple[int, int]:
+    users = {}
+    for role in (Role.SUPERUSER, Role.EDITOR):
+        user = User(
+            username=f"crud-bench-{role.value}",
+            email=f"{role.value.lower()}@crud-bench.invalid",
+            hashed_password="!",
+            role=role,
+            created_at=datetime.datetime.utcnow(),
+        )
+        db.add(user)
+        db.flush()
+        users[role] = user.id
+    for s in range(subjects):
+        subject = Subject(user_id=users[Role.EDITOR], name=f"Subject {s}")
+        db.add(subject)
+        db.flush()
+        for e in range(exams):
+            exam = Exam(subject_id=subject.id, title=f"Exam {e}", date=datetime.datetime(2024, 1, 1))
+            db.add(exam)
+            db.flush()
+            db.add_all(Grade(exam_id=exam.id, exam_date=exam.date, grade=GradeEnum.gut) for _ in range(grades))
+    db.commit()
+    return users[Role.SUPERUSER], users[Role.EDITOR]
+
+
+def per_call_us(db: Session, fn, repeat: int) -> float:
+    """Median wall time of one ``fn()`` call in µs."""
+    for _ in range(10):
+        fn()
+        db.expunge_all()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+        db.expunge_all()
+    return statistics.median(timings) * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="sqlite://")
+    parser.add_argument("--subjects", type=int, default=5)
+    parser.add_argument("--exams", type=int, default=5)
+    parser.add_argument("--grades", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.url.startswith("sqlite"):
+        engine = create_engine(args.url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        engine = create_engine(args.url, connect_args={"prepare_threshold": settings.POSTGRES_PREPARE_THRESHOLD})
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as db:
+        superuser_id, editor_id = seed(db, args.subjects, args.exams, args.grades)
+        subject_id = db.query(Subject.id).filter(Subject.user_id == editor_id).first()[0]
+        exam_id = db.query(Exam.id).filter(Exam.subject_id == subject_id).first()[0]
+        grade_id = db.query(Grade.id).filter(Grade.exam_id == exam_id).first()[0]
+
+        cases = []
+        for label, owner_id in (("editor", editor_id), ("superuser", superuser_id)):
+            cases += [
+                (f"get_subject ({label})", lambda o=owner_id: subject_crud.get_subject(db, subject_id, o)),
+                (f"get_subjects ({label})", lambda o=owner_id: subject_crud.get_subjects(db, o)),
+                (f"get_subjects_by_ids ({label})", lambda o=owner_id: subject_crud.get_subjects_by_ids(db, [subject_id], o)),
+                (f"get_subject_full ({label})", lambda o=owner_id: subject_crud.get_subject_full(db, subject_id, o)),
+                (f"get_exam ({label})", lambda o=owner_id: exam_crud.get_exam(db, exam_id, o)),
+                (f"get_exams ({label})", lambda o=owner_id: exam_crud.get_exams(db, o)),
+                (f"get_exams_by_ids ({label})", lambda o=owner_id: exam_crud.get_exams_by_ids(db, [exam_id], o)),
+                (f"get_grade ({label})", lambda o=owner_id: grade_crud.get_grade(db, grade_id, o)),
+                (f"get_grades ({label})", lambda o=owner_id: grade_crud.get_grades(db, o)),
+                (f"get_grades_by_ids ({label})", lambda o=owner_id: grade_crud.get_grades_by_ids(db, [grade_id], o)),
+            ]
+        cases += [
+            ("user by id: query chain", lambda: db.query(User).filter(User.id == editor_id).first()),
+            ("user by id: statement", lambda: db.scalars(statements.USER_BY_ID, {"user_id": editor_id}).first()),
+            ("subject by id: query chain", lambda: db.query(Subject).filter(Subject.id == subject_id).first()),
+            ("subject by id: statement", lambda: db.scalars(statements.SUBJECT_BY_ID, {"subject_id": subject_id}).first()),
+            ("exam by id: query chain", lambda: db.query(Exam).filter(Exam.id == exam_id).first()),
+            ("exam by id: statement", lambda: db.scalars(statements.EXAM_BY_ID, {"exam_id": exam_id}).first()),
+        ]
+
+        print(f"{'call':<34} {'median (µs)':>12}")
+        for name, fn in cases:
+            print(f"{name:<34} {per_call_us(db, fn, args.repeat):>12.1f}")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Compare query-side ownership filtering with Postgres row-level security.
+
+Seeds a few users with subjects, exams and grades, then times the list
+crud functions for an editor in both OWNERSHIP_ENFORCEMENT modes.
+
+Usage (Postgres only, run from the backend directory):
+    python -m app.benchmarks.ownership --users 50 --repeat 200
+"""
+import argparse
+import datetime
+import statistics
+import time
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core import rls
+from app.core.config import settings
+from app.core.db import init_db
+from app.crud import exam as exam_crud, grade as grade_crud, subject as subject_crud
+from app.database.session import engine
+from app.models.exam import Exam
+from app.models.grade import Grade
+from app.models.grade_enum import GradeEnum
+from app.models.role import Role
+from app.models.subject import Subject
+from app.models.user import User
+
+EMAIL_DOMAIN = "ownership-bench.invalid"
+
+
+def seed(db: Session, users: int, subjects: int, exams: int, grades: int) -> list[int]:
+    ids = []
+    for u in range(users):
+        user = User(
+            username=f"bench{u}",
+            email=f"bench{u}@{EMAIL_DOMAIN}",
+            hashed_password="!",
+            role=Role.EDITOR,
+            created_at=datetime.datetime.utcnow(),
+        )
+        db.add(user)
+        db.flush()
+        ids.append(user.id)
+        for s in range(subjects):
+            subject = Subject(user_id=user.id, name=f"Subject {s}")
+            db.add(subject)
+            db.flush()
+            for e in range(exams):
+                exam = Exam(subject_id=subject.id, title=f"Exam {e}", date=datetime.datetime(2024, 1, 1))
+                db.add(exam)
+                db.flush()
+                db.add_all(Grade(exam_id=exam.id, exam_date=exam.date, grade=GradeEnum.gut) for _ in range(grades))
+    db.commit()
+    return ids
+
+
+def cleanup(db: Session) -> None:
+    user_ids = select(User.id).where(User.email.like(f"%@{EMAIL_DOMAIN}"))
+    subject_ids = select(Subject.id).where(Subject.user_id.in_(user_ids))
+    exam_ids = select(Exam.id).where(Exam.subject_id.in_(subject_ids))
+    db.execute(delete(Grade).where(Grade.exam_id.in_(exam_ids)))
+    db.execute(delete(Exam).where(Exam.id.in_(exam_ids)))
+    db.execute(delete(Subject).where(Subject.id.in_(subject_ids)))
+    db.execute(delete(User).where(User.id.in_(user_ids)))
+    db.commit()
+
+
+def measure(mode: str, user_id: int, repeat: int) -> dict[str, float]:
+    settings.OWNERSHIP_ENFORCEMENT = mode
+    results = {}
+    for name, fn in (
+        ("get_subjects", subject_crud.get_subjects),
+        ("get_exams", exam_crud.get_exams),
+        ("get_grades", grade_crud.get_grades),
+    ):
+        timings = []
+        with Session(engine) as db:
+            rls.set_principal(db, user_id, Role.EDITOR)
+            fn(db, user_id)  # warm up
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn(db, user_id)
+                timings.append(time.perf_counter() - start)
+                db.rollback()
+        results[name] = statistics.median(timings) * 1000
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--subjects", type=int, default=5)
+    parser.add_argument("--exams", type=int, default=10)
+    parser.add_argument("--grades", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("Row-level security needs Postgres")
+
+    settings.OWNERSHIP_ENFORCEMENT = "rls"
+    with Session(engine) as db:
+        init_db(db)
+        cleanup(db)
+        user_ids = seed(db, args.users, args.subjects, args.exams, args.grades)
+
+    try:
+        target = user_ids[len(user_ids) // 2]
+        print(f"{'function':<14} {'query (ms)':>11} {'rls (ms)':>11}")
+        query = measure("query", target, args.repeat)
+        policy = measure("rls", target, args.repeat)
+        for name in query:
+            print(f"{name:<14} {query[name]:>11.3f} {policy[name]:>11.3f}")
+    finally:
+        with Session(engine) as db:
+            cleanup(db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Measure cold start: import-time budget and startup stages.
+
+Each stage runs in fresh interpreters, so nothing is cached between
+measurements:
+
+- ``import``: importing app.main, all the factory leaves for later
+- ``app``: building the application (routers, models, middlewares)
+- ``app+engine``: additionally creating the engine, what importing
+  app.main cost before the factory (no connection is opened)
+
+``--report`` prints an ``-X importtime`` breakdown of the ``app+engine``
+stage grouped by package, and ``--budget-ms`` fails if importing
+app.main takes longer.
+
+Usage (run from the backend/app directory):
+    python -m app.benchmarks.startup --repeat 10 --report
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parents[1]
+
+STAGES = {
+    "import": "import app.main",
+    "app": "import app.main; app.main.app",
+    "app+engine": "import app.main; app.main.app; from app.database.session import get_engine; get_engine()",
+}
+
+_TIMED = "import time; start = time.perf_counter(); {code}; print(time.perf_counter() - start)"
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def _run(args: list[str]) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": str(APP_DIR.parent)}
+    # Settings read ../../.env relative to the working directory
+    return subprocess.run(
+        [sys.executable, *args], cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def measure(code: str, repeat: int) -> float:
+    """Median wall time in ms of ``code`` in a fresh interpreter."""
+    timings = [float(_run(["-c", _TIMED.format(code=code)]).stdout.strip()) for _ in range(repeat)]
+    return statistics.median(timings) * 1000
+
+
+def importtime(code: str) -> list[tuple[str, int, int]]:
+    """(module, self µs, cumulative µs) of every import ``code`` triggers."""
+    stderr = _run(["-X", "importtime", "-c", code]).stderr
+    modules = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            modules.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return modules
+
+
+def _package(module: str) -> str:
+    parts = module.split(".")
+    # The app's own modules are grouped one level deeper (app.api, app.crud, ...)
+    return ".".join(parts[:2] if parts[0] == "app" else parts[:1])
+
+
+def report(code: str, top: int) -> None:
+    by_package: dict[str, int] = defaultdict(int)
+    for module, self_us, _ in importtime(code):
+        by_package[_package(module)] += self_us
+    total = sum(by_package.values())
+
+    print(f"\n{'package':<28} {'self (ms)':>10} {'share':>7}")
+    for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"{package:<28} {self_us / 1000:>10.1f} {self_us / total:>7.1%}")
+    print(f"{'total':<28} {total / 1000:>10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--report", action="store_true", help="print the -X importtime breakdown")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if importing app.main is slower")
+    args = parser.parse_args()
+
+    results = {stage: measure(code, args.repeat) for stage, code in STAGES.items()}
+    print(f"{'stage':<12} {'median (ms)':>12}")
+    for stage, ms in results.items():
+        print(f"{stage:<12} {ms:>12.1f}")
+    print(f"\nimport app.main defers {results['app+engine'] - results['import']:.1f} ms until the app is used")
+
+    if args.report:
+        report(STAGES["app+engine"], args.top)
+
+    if args.budget_ms is not None and results["import"] > args.budget_ms:
+        raise SystemExit(f"import app.main took {results['import']:.1f} ms, budget {args.budget_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import re
+from collections import deque
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't be admitted (queue full or wait timed out)."""
+
+
+class ConcurrencyLimit:
+    """
+    Limits the number of in-flight requests of a route group.
+
+    Requests over the limit wait in a bounded FIFO queue. Slots are handed
+    directly to the oldest waiter on release, so queued requests are served
+    in arrival order. A limit of 0 disables the group's limit.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def _publish(self) -> None:
+        metrics.set(f"admission.{self.name}.active", self.active)
+        metrics.set(f"admission.{self.name}.queued", len(self._waiters))
+
+    async def acquire(self) -> None:
+        """
+        Raises:
+            AdmissionRejected: If the queue is full or the wait timed out.
+        """
+        if not self.limit or (self.active < self.limit and not self._waiters):
+            self.active += 1
+            self._publish()
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            metrics.inc(f"admission.{self.name}.rejected")
+            raise AdmissionRejected()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                # The slot was handed over just as we gave up, pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                self._publish()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            metrics.inc(f"admission.{self.name}.timeouts")
+            raise AdmissionRejected()
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot moves to the waiter, active stays the same
+                waiter.set_result(None)
+                self._publish()
+                return
+        self.active -= 1
+        self._publish()
+
+
+# Route groups by (methods, path pattern below API_V1_STR); first match wins.
+# Unmatched requests fall into "default". The SSE change feed is long-lived
+# and never limited. Neither is a batch: each of its sub-requests is
+# admitted in its own group, a batch holding a slot while its sub-requests
+# wait for one could starve them. "auth" are the password and token checks,
+# not every route below /login.
+ROUTE_GROUPS = [
+    ("unlimited", {"GET"}, re.compile(r"^/events/?$")),
+    ("unlimited", {"GET"}, re.compile(r"^/ready$")),
+    ("unlimited", {"POST"}, re.compile(r"^/batch/?$")),
+    ("auth", {"POST"}, re.compile(r"^/login(/|/refresh/?)?$")),
+    ("heavy", {"GET"}, re.compile(r"^/(subjects|exams|grades)/?$")),
+    ("heavy", {"GET"}, re.compile(r"^/(subjects/full|search|sync)/?$")),
+]
+
+
+def route_group(method: str, path: str) -> str:
+    if path.startswith(settings.API_V1_STR):
+        path = path[len(settings.API_V1_STR):]
+    for group, methods, pattern in ROUTE_GROUPS:
+        if method in methods and pattern.match(path):
+            return group
+    return "default"
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware applying per route group concurrency limits.
+
+    Rejected requests get a 503 with a Retry-After header before they reach
+    the threadpool or the database pool.
+    """
+
+    def __init__(self, app, limits: dict[str, int], queue_size: int, timeout: float, retry_after: int):
+        self.app = app
+        self.retry_after = retry_after
+        self.limits = {
+            name: ConcurrencyLimit(name, limit, queue_size, timeout) for name, limit in limits.items()
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limits.get(route_group(scope["method"], scope["path"]))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limit.acquire()
+        except AdmissionRejected:
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({"detail": "Server is busy, please retry later."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
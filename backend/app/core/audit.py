@@ -0,0 +1,201 @@
+"""
+Audit log of all writes to subjects, exams, grades, users and tenants.
+
+The crud functions call ``record`` with the principal and the row's column
+values before and after the change. Entries are kept on the session and
+handed to the ``writer`` when the transaction commits (dropped on rollback,
+also of an atomic batch after its operations committed),
+so a write costs no extra round trip. The writer inserts them in batches
+from a background thread into ``audit_log`` of the primary database.
+
+Conditional updates (If-Match) don't load the row, their entries only have
+the new values; the old ones are the new values of the row's previous entry.
+"""
+import datetime
+import enum
+import functools
+import logging
+import queue
+import threading
+import time
+
+from sqlalchemy import Engine, event, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.database.session import run_after_commit
+from app.models.audit import AuditEntry
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping columns, changed by every write
+_IGNORED_COLUMNS = {"change_seq", "version", "updated_at"}
+# Logged as changed, never with their value
+_REDACTED_COLUMNS = {"hashed_password"}
+REDACTED = "[redacted]"
+
+_WRITE_ATTEMPTS = 3
+
+
+def _jsonable(key: str, value):
+    if key in _REDACTED_COLUMNS:
+        return REDACTED
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def snapshot(obj, keys=None) -> dict:
+    """The column values of a mapped object (only ``keys`` if given), as JSON-compatible values."""
+    return {
+        column.key: _jsonable(column.key, getattr(obj, column.key))
+        for column in obj.__mapper__.column_attrs
+        if column.key not in _IGNORED_COLUMNS and (keys is None or column.key in keys)
+    }
+
+
+def diff(old: dict | None, new: dict | None) -> dict:
+    """
+    ``{column: {"old": ..., "new": ...}}`` of the changed columns.
+
+    Creations only have ``new``, deletions only ``old`` values.
+    """
+    if old is None:
+        return {key: {"new": value} for key, value in new.items()}
+    if new is None:
+        return {key: {"old": value} for key, value in old.items()}
+    return {key: {"old": old.get(key), "new": value} for key, value in new.items() if old.get(key) != value}
+
+
+def record(db: Session, principal_id: int | None, entity: str, entity_id: int, action: str, old: dict | None = None, new: dict | None = None) -> None:
+    """
+    Record a change to be written to the audit log once the session's transaction commits.
+
+    Args:
+        db (Session): Database session performing the write.
+        principal_id (int | None): ID of the user making the change, None for the system.
+        entity (str): Entity type, e.g. "subject", "exam", "grade", "user" or "tenant".
+        entity_id (int): ID of the changed row.
+        action (str): "created", "updated" or "deleted".
+        old (dict | None): ``snapshot`` of the row before the change.
+        new (dict | None): ``snapshot`` of the row after the change, or the changed values.
+    """
+    if not settings.AUDIT_ENABLED:
+        return
+    db.info.setdefault("pending_audit", []).append({
+        "created_at": datetime.datetime.now(datetime.timezone.utc),
+        "principal_id": principal_id,
+        "entity": entity,
+        "entity_id": entity_id,
+        "action": action,
+        "changes": diff(old, new),
+    })
+
+
+@event.listens_for(Session, "after_commit")
+def _submit_pending_entries(session: Session) -> None:
+    entries = session.info.pop("pending_audit", None)
+    if entries:
+        # The primary database, also for sessions bound to a shard
+        engine = session.get_bind(mapper=AuditEntry.__mapper__).engine
+        run_after_commit(session, functools.partial(writer.submit, engine, entries))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_entries(session: Session) -> None:
+    session.info.pop("pending_audit", None)
+
+
+class AuditWriter:
+    """
+    Writes audit entries in batches from a background thread.
+
+    Unlike spans, entries aren't dropped when the queue is full: the
+    committing thread waits up to ``enqueue_timeout`` for room and then
+    writes its entries itself, so a database that can't keep up slows the
+    writes down instead of losing their audit trail. ``shutdown`` writes all
+    queued entries before the process exits.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, enqueue_timeout: float, shutdown_timeout: float):
+        self.batch_size = batch_size
+        self.enqueue_timeout = enqueue_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self._queue: queue.Queue[tuple[Engine, dict] | None] = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, engine: Engine, entries: list[dict]) -> None:
+        if self._thread is None:
+            self._start()
+        for i, entry in enumerate(entries):
+            try:
+                self._queue.put((engine, entry), timeout=self.enqueue_timeout)
+            except queue.Full:
+                metrics.inc("audit.sync_writes")
+                self._write(engine, entries[i:], attempts=1)
+                return
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def shutdown(self) -> None:
+        """Write the queued entries and stop the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=self.shutdown_timeout)
+            if thread.is_alive():
+                logger.error("Audit writer didn't finish, about %s entries are lost", self._queue.qsize())
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=1.0)
+                while True:
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            # Usually all entries go to the primary database
+            by_engine: dict[Engine, list[dict]] = {}
+            for engine, entry in batch:
+                by_engine.setdefault(engine, []).append(entry)
+            for engine, entries in by_engine.items():
+                self._write(engine, entries, attempts=_WRITE_ATTEMPTS)
+
+    def _write(self, engine: Engine, entries: list[dict], attempts: int) -> None:
+        for attempt in range(attempts):
+            try:
+                with engine.begin() as connection:
+                    connection.execute(insert(AuditEntry.__table__), entries)
+                metrics.inc("audit.written", len(entries))
+                return
+            except Exception as e:
+                if attempt + 1 < attempts:
+                    time.sleep(0.5 * 2 ** attempt)
+                else:
+                    metrics.inc("audit.dropped", len(entries))
+                    logger.error("Writing %s audit entries failed: %s", len(entries), e)
+
+
+writer = AuditWriter(
+    max_queue=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    enqueue_timeout=settings.AUDIT_ENQUEUE_TIMEOUT_SECONDS,
+    shutdown_timeout=settings.AUDIT_SHUTDOWN_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,150 @@
+import asyncio
+import functools
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.database.replicas import last_write, replica_router
+from app.database.shards import DEFAULT_SHARD
+from app.models.role import Role
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers with the
+    same key wait for it and share its result (or exception).
+
+    Sync callers (threadpool) and async callers (event loop) are tracked
+    separately and never wait for each other.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._async_calls: dict[Hashable, asyncio.Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], name: str = "call") -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.inc(f"coalesce.{name}.shared")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.inc(f"coalesce.{name}.executed")
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]], name: str = "call") -> Any:
+        future = self._async_calls.get(key)
+        if future is not None:
+            metrics.inc(f"coalesce.{name}.shared")
+            # Shielded so a disconnecting follower doesn't cancel the leader
+            return await asyncio.shield(future)
+
+        metrics.inc(f"coalesce.{name}.executed")
+        future = self._async_calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark it retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._async_calls[key]
+
+
+flight = SingleFlight()
+
+
+def _principal_scope(user, db: Session | None) -> str:
+    # Superusers see the same rows of a shard, so their reads can be shared
+    if user.role == Role.SUPERUSER:
+        shard = db.info.get("shard", DEFAULT_SHARD) if db is not None else DEFAULT_SHARD
+        return f"superuser:{shard}"
+    return f"user:{user.id}"
+
+
+def coalesce(schema: Any):
+    """
+    Share one execution between identical concurrent calls of a read route.
+
+    Calls are identical if they have the same principal scope (the user, or
+    all superusers on the same shard) and the same parameters. The leader's result is
+    converted to ``schema`` while its session is still open, so followers
+    never touch ORM objects of another session. Clients that wrote within the
+    replica lag window are not coalesced, to keep read-your-writes.
+
+    The route must take the user as ``current_user``.
+    """
+    adapter = TypeAdapter(schema)
+
+    def decorator(fn):
+        name = fn.__name__
+
+        def key_for(kwargs: dict) -> tuple | None:
+            user = kwargs["current_user"]
+            if not settings.COALESCE_READS or replica_router.recently_wrote(last_write()):
+                return None
+            params = tuple(sorted(
+                (k, repr(v)) for k, v in kwargs.items()
+                if k != "current_user" and not isinstance(v, Session)
+            ))
+            db = next((v for v in kwargs.values() if isinstance(v, Session)), None)
+            return (fn.__module__, name, _principal_scope(user, db), params)
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(**kwargs):
+                async def run():
+                    return adapter.validate_python(await fn(**kwargs), from_attributes=True)
+
+                key = key_for(kwargs)
+                if key is None:
+                    return await fn(**kwargs)
+                return await flight.do_async(key, run, name)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(**kwargs):
+            key = key_for(kwargs)
+            if key is None:
+                return fn(**kwargs)
+            return flight.do(key, lambda: adapter.validate_python(fn(**kwargs), from_attributes=True), name)
+
+        return wrapper
+
+    return decorator
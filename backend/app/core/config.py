@@ -1,5 +1,6 @@
-import warnings
+import os
 import secrets
+import warnings
 from typing import Literal
 
 from pydantic import (
@@ -7,10 +8,9 @@ from pydantic import (
     computed_field,
     model_validator,
 )
-from typing_extensions import Self
 from pydantic_core import MultiHostUrl
-from pydantic import EmailStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing_extensions import Self
 
 
 class Settings(BaseSettings):
@@ -22,17 +22,151 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
     SECRET_KEY: str = secrets.token_urlsafe(32)
+    # Access tokens are validated without a database lookup, keep them short-lived
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     # 60 minutes * 24 hours * 8 days = 8 days
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # How often the in-memory token revocation set is refreshed
+    TOKEN_REVOCATION_REFRESH_SECONDS: float = 5.0
+    # Refreshes re-read revocations this much older than the newest one seen,
+    # so ones committed late or by a worker with a slower clock aren't missed
+    TOKEN_REVOCATION_OVERLAP_SECONDS: float = 60.0
+    # How often revocations of tokens that expired anyway are deleted
+    TOKEN_REVOCATION_PURGE_INTERVAL_SECONDS: float = 300.0
+
+    # bcrypt cost factor; existing hashes are upgraded on the next login
+    BCRYPT_ROUNDS: int = 12
+    # Processes for password hashing, 0 runs it on a single dedicated thread
+    PASSWORD_HASH_WORKERS: int = os.cpu_count() or 1
+    # Concurrent hash/verify jobs, further logins wait in a queue
+    PASSWORD_HASH_MAX_CONCURRENCY: int = (os.cpu_count() or 1) * 2
+
+    # Login throttling (token buckets per e-mail address and per client IP)
+    LOGIN_RATE_LIMIT_EMAIL_BURST: int = 5
+    LOGIN_RATE_LIMIT_EMAIL_PER_MINUTE: float = 2
+    # Generous, a whole school may log in from behind one NAT address
+    LOGIN_RATE_LIMIT_IP_BURST: int = 100
+    LOGIN_RATE_LIMIT_IP_PER_MINUTE: float = 120
+    # Also enforce the budgets across workers through Postgres
+    LOGIN_RATE_LIMIT_SHARED: bool = False
+
+    # Admission control: concurrent requests per route group (see
+    # app.core.admission.ROUTE_GROUPS), 0 disables the group's limit
+    ADMISSION_CONCURRENCY: dict[str, int] = {"heavy": 8, "auth": 16, "default": 32}
+    # Requests over the limit wait in a queue of this size per group ...
+    ADMISSION_QUEUE_SIZE: int = 64
+    # ... for at most this long, then get a 503
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+    # Share one query between identical concurrent reads (see app.core.coalesce)
+    COALESCE_READS: bool = True
+    # Idempotency-Key support of the create routes (see app.core.idempotency)
+    IDEMPOTENCY_TTL_SECONDS: int = 60 * 60 * 24
+    # Claims of requests still running expire after this long, so the key of
+    # a request that crashed can be retried. Longer than any create request
+    IDEMPOTENCY_LEASE_SECONDS: int = 60
+    IDEMPOTENCY_CACHE_SIZE: int = 10_000
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: float = 300.0
+    # Tracing (see app.core.tracing): a share of requests is sampled at the
+    # head, requests with a sampled W3C traceparent are always traced
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATE: float = 0.01
+    # OTLP/JSON lines file, unless spans are POSTed to an OTLP/HTTP collector
+    # such as http://localhost:4318/v1/traces
+    TRACING_EXPORT_PATH: str | None = "traces.jsonl"
+    TRACING_OTLP_ENDPOINT: str | None = None
+    # Worker threads running sync endpoints and dependencies (anyio default: 40)
+    THREADPOOL_SIZE: int = 40
+    # Request profiling (see app.core.profiling): requests with a signed
+    # X-Profile header, plus a share of all requests, are sampled every
+    # PROFILING_INTERVAL_MS; the last PROFILING_BUFFER_SIZE profiles are kept
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_INTERVAL_MS: float = 5.0
+    PROFILING_BUFFER_SIZE: int = 50
+    PROFILING_TOKEN_EXPIRE_MINUTES: int = 60
+    # Slow-query log (see app.core.slow_queries): statements slower than the
+    # threshold are aggregated by fingerprint, a sample of them also gets its
+    # plan (EXPLAIN, without ANALYZE) on Postgres
+    SLOW_QUERY_THRESHOLD_MS: float | None = 200.0
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = 0.1
+    SLOW_QUERY_STORE_SIZE: int = 200
+    # Startup warm-up (see app.core.warmup), GET /ready answers 503 until done.
+    # Pool connections to open up front, default: the pool size
+    WARMUP_ENABLED: bool = True
+    WARMUP_POOL_CONNECTIONS: int | None = None
+    WARMUP_CONNECT_TIMEOUT_SECONDS: float = 300.0
+    # Audit log (see app.core.audit): entries are written in batches of up to
+    # AUDIT_BATCH_SIZE by a background thread. A commit waits up to
+    # AUDIT_ENQUEUE_TIMEOUT_SECONDS for room in a full queue, then writes its
+    # entries itself
+    AUDIT_ENABLED: bool = True
+    AUDIT_QUEUE_SIZE: int = 10_000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_ENQUEUE_TIMEOUT_SECONDS: float = 1.0
+    AUDIT_SHUTDOWN_TIMEOUT_SECONDS: float = 30.0
 
     PROJECT_NAME: str
-    POSTGRES_SERVER: str
+    # "sqlite" runs on an embedded database file (see app.database.sqlite),
+    # for single-node deployments without Postgres
+    DATABASE_BACKEND: Literal["postgres", "sqlite"] = "postgres"
+    SQLITE_PATH: str = "gradetracker.db"
+    SQLITE_CACHE_SIZE_KIB: int = 64 * 1024
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    # How long a write waits for its turn in the single-writer queue
+    SQLITE_WRITE_TIMEOUT_SECONDS: float = 30.0
+    # Required with DATABASE_BACKEND=postgres
+    POSTGRES_SERVER: str = ""
     POSTGRES_PORT: int = 5432
-    POSTGRES_USER: str
+    POSTGRES_USER: str = ""
     POSTGRES_PASSWORD: str = "Kennwort1"
     POSTGRES_DB: str = ""
+    # Executions per connection before psycopg prepares a statement
+    # server-side (psycopg default: 5), None disables prepared statements
+    POSTGRES_PREPARE_THRESHOLD: int | None = 1
+
+    # Exams and grades are range-partitioned by school year on Postgres (see
+    # app.database.partitions). Partitions are created PARTITION_YEARS_AHEAD
+    # school years in advance; with PARTITION_RETENTION_YEARS, older school
+    # years are detached and kept as standalone tables for archiving.
+    # School years start on the 1st of SCHOOL_YEAR_START_MONTH (1-12)
+    SCHOOL_YEAR_START_MONTH: int = 8
+    PARTITION_YEARS_AHEAD: int = 1
+    PARTITION_RETENTION_YEARS: int | None = None
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: float = 24 * 3600
+
+    # Optional read replicas for GET endpoints, e.g.
+    # READ_REPLICA_URLS='["postgresql+psycopg://postgres:pw@replica1:5432/app-grade-tracker"]'
+    READ_REPLICA_URLS: list[str] = []
+    # Reads of a user go to the primary for this long after the user wrote
+    READ_REPLICA_LAG_SECONDS: float = 5.0
+    READ_REPLICA_HEALTH_CHECK_SECONDS: float = 10.0
 
-    FIRST_SUPERUSER_EMAIL: EmailStr = "admin@admin.com"
+    # Tenant sharding (see app.database.shards): subjects, exams and grades
+    # of a school live on the shard named by its tenant, e.g.
+    # SHARD_URLS='{"shard-1": "postgresql+psycopg://postgres:pw@shard1:5432/app-grade-tracker"}'.
+    # The primary database is shard "default" and keeps users and tenants.
+    # Only append shards, the position is the shard's id offset
+    SHARD_URLS: dict[str, str] = {}
+    SHARD_MAP_REFRESH_SECONDS: float = 5.0
+    # Ids of sharded tables are unique across up to this many shards
+    SHARD_ID_STRIDE: int = 16
+
+    # Where subject/exam/grade ownership is enforced on reads: "query" adds
+    # owner filters to the crud queries, "rls" leaves it to Postgres row-level
+    # security policies (see app.core.rls, ignored on other databases)
+    OWNERSHIP_ENFORCEMENT: Literal["query", "rls"] = "query"
+
+    # Server-Sent Events change feed
+    EVENTS_PG_NOTIFY: bool = True
+    # Most changes replayed to a reconnecting client, beyond it has to refetch
+    EVENTS_REPLAY_LIMIT: int = 1000
+    EVENTS_SUBSCRIBER_QUEUE_SIZE: int = 256
+    EVENTS_KEEPALIVE_SECONDS: float = 15.0
+
+    # Validated by UserCreate when init_db creates the superuser, EmailStr here
+    # would load email-validator on every import of the settings
+    FIRST_SUPERUSER_EMAIL: str = "admin@admin.com"
     FIRST_SUPERUSER: str
     FIRST_SUPERUSER_PASSWORD: str
 
@@ -47,8 +181,8 @@ class Settings(BaseSettings):
             port=self.POSTGRES_PORT,
             path=self.POSTGRES_DB,
         )
-    
-    
+
+
     def _check_default_secret(self, var_name: str, value: str | None) -> None:
         if value == "changethis":
             message = (
@@ -64,5 +198,17 @@ class Settings(BaseSettings):
     def _enforce_non_default_secrets(self) -> Self:
         self._check_default_secret("POSTGRES_PASSWORD", self.POSTGRES_PASSWORD)
         return self
-    
-settings = Settings()
\ No newline at end of file
+
+    @model_validator(mode="after")
+    def _check_database_backend(self) -> Self:
+        if self.DATABASE_BACKEND == "postgres" and not (self.POSTGRES_SERVER and self.POSTGRES_USER):
+            raise ValueError("POSTGRES_SERVER and POSTGRES_USER are required with DATABASE_BACKEND=postgres")
+        if self.DATABASE_BACKEND == "sqlite" and self.LOGIN_RATE_LIMIT_SHARED:
+            raise ValueError("LOGIN_RATE_LIMIT_SHARED needs DATABASE_BACKEND=postgres")
+        if self.DATABASE_BACKEND == "sqlite" and self.SHARD_URLS:
+            raise ValueError("SHARD_URLS needs DATABASE_BACKEND=postgres")
+        if "default" in self.SHARD_URLS or len(self.SHARD_URLS) >= self.SHARD_ID_STRIDE:
+            raise ValueError('SHARD_URLS can\'t name a shard "default" and needs fewer shards than SHARD_ID_STRIDE')
+        return self
+
+settings = Settings()
@@ -1,17 +1,91 @@
-from sqlalchemy import select
+import asyncio
+
+from sqlalchemy import Column, Connection, Engine, inspect, select, text
 from sqlalchemy.orm import Session
 
-from .config import settings
-from app.database.session import engine
+from app.core import rls, security
+from app.crud import user as crud
+from app.database import partitions
+from app.database.session import Base
+from app.database.shards import prepare_shard, shard_router
 
 # models must be imported and registered from app.models to create the tables
-from app.database.session import Base, engine
-from app.schemas import user as schemas
-from app.crud import user as crud
-from app.models.user import User
+from app.models import (
+  audit,  # noqa: F401 audit log of subject, exam and grade writes
+  idempotency,  # noqa: F401 stored responses of Idempotency-Key requests
+  rate_limit,  # noqa: F401 shared login throttling buckets
+  search,  # noqa: F401 registers the full-text search indexes
+  sync,  # change sequence and tombstones for delta sync
+  tenant,  # noqa: F401 schools and their shard
+  token_revocation,  # revoked refresh tokens
+)
+from app.models.exam import Exam  # noqa: F401
+from app.models.grade import Grade
 from app.models.role import Role
-from app.models.exam import Exam
-from app.models.subject import Subject
+from app.models.subject import Subject  # noqa: F401
+from app.models.user import User
+from app.schemas import user as schemas
+
+from .config import settings
+
+
+def _add_column(connection: Connection, column: Column) -> None:
+  # As nullable column, with its indexes, unless it exists already
+  table = column.table
+  if column.name in {existing["name"] for existing in inspect(connection).get_columns(table.name)}:
+    return
+  column_type = column.type.compile(dialect=connection.dialect)
+  connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+  for index in table.indexes:
+    if column.name in index.columns:
+      index.create(connection, checkfirst=True)
+
+
+def _upgrade_schema(engine: Engine) -> None:
+  # create_all only creates missing tables, bring the existing ones up to date
+  with engine.begin() as connection:
+    # Revoking a token twice conflicts (was a plain index)
+    connection.execute(text("DROP INDEX IF EXISTS ix_token_revocations_jti"))
+    for index in token_revocation.TokenRevocation.__table__.indexes:
+      index.create(connection, checkfirst=True)
+
+    # Delta sync
+    for model in sync.SYNCED_MODELS:
+      _add_column(connection, model.__table__.c.change_seq)
+    sync.backfill_change_seq(connection)
+
+    # Partition key of grades (see app.database.partitions), copied from the exams
+    _add_column(connection, Grade.__table__.c.exam_date)
+    connection.execute(text(
+      "UPDATE grades SET exam_date = (SELECT date FROM exams WHERE exams.id = grades.exam_id) "
+      "WHERE exam_date IS NULL"
+    ))
+    if connection.dialect.name == "postgresql":
+      connection.execute(text("ALTER TABLE grades ALTER COLUMN exam_date SET NOT NULL"))
+      # Keeps exam_date in step with the exam's date; SQLite can't add
+      # constraints to an existing table
+      if "fk_grades_exam" not in {fk["name"] for fk in inspect(connection).get_foreign_keys("grades")}:
+        connection.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_exams_id_date ON exams (id, date)"))
+        connection.execute(text(
+          "ALTER TABLE grades ADD CONSTRAINT fk_grades_exam FOREIGN KEY (exam_id, exam_date) "
+          "REFERENCES exams (id, date) ON UPDATE CASCADE DEFERRABLE"
+        ))
+
+
+def _init_schema(engine: Engine) -> None:
+  # Create tables
+  Base.metadata.create_all(bind=engine)
+  _upgrade_schema(engine)
+
+  # School year partitions of exams and grades
+  if engine.dialect.name == "postgresql":
+    with engine.begin() as connection:
+      partitions.maintain(connection)
+
+  # Ownership policies for OWNERSHIP_ENFORCEMENT=rls
+  if settings.OWNERSHIP_ENFORCEMENT == "rls" and engine.dialect.name == "postgresql":
+    with engine.begin() as connection:
+      rls.apply_policies(connection)
 
 
 def init_db(session: Session) -> None:
@@ -21,8 +95,13 @@ def init_db(session: Session) -> None:
   Args:
     session (Session): The database session used to interact with the database.
   """
-  # Create tables
-  Base.metadata.create_all(bind=engine) 
+  # Every shard has the full schema, the primary database is shard "default"
+  for shard in shard_router.names:
+    engine = shard_router.engine(shard)
+    _init_schema(engine)
+    if shard_router.enabled:
+      with engine.begin() as connection:
+        prepare_shard(connection, shard_router.offset(shard), settings.SHARD_ID_STRIDE)
 
   # Create superuser
   superuser = session.execute(select(User).where(User.email == settings.FIRST_SUPERUSER_EMAIL)).first()
@@ -33,5 +112,9 @@ def init_db(session: Session) -> None:
       password=settings.FIRST_SUPERUSER_PASSWORD,
       role=Role.SUPERUSER
     )
-    user = crud.create_superuser(db=session, user=user_in)
+    # Hashed in the password pool like every password, started just for this
+    try:
+      asyncio.run(crud.create_superuser(db=session, user=user_in))
+    finally:
+      security.shutdown_password_pool()
 
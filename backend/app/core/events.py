@@ -0,0 +1,218 @@
+import asyncio
+import functools
+import json
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.session import run_after_commit
+from app.models.sync import CHANGE_SEQ_KEY
+
+logger = logging.getLogger(__name__)
+
+# Postgres NOTIFY channel used for cross-worker fan-out
+NOTIFY_CHANNEL = "gradetracker_events"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    seq: int
+    entity: str
+    entity_id: int
+    operation: str
+    owner_id: int
+
+
+class Subscriber:
+    """A connected client of the change feed."""
+
+    def __init__(self, user_id: int, is_superuser: bool, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.user_id = user_id
+        self.is_superuser = is_superuser
+        self.loop = loop
+        self.queue: asyncio.Queue[ChangeEvent | None] = asyncio.Queue(maxsize=queue_size)
+
+    def can_see(self, change: ChangeEvent) -> bool:
+        return self.is_superuser or change.owner_id == self.user_id
+
+    def _put(self, change: ChangeEvent) -> None:
+        try:
+            self.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            # Client is too slow, make it reconnect and refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class EventBus:
+    """
+    In-process pub/sub of entity changes.
+
+    Events carry the global change sequence of their write (see
+    app.models.sync) as their id, the same in every worker, so a client
+    reconnecting to any worker gets the changes it missed replayed from
+    the database (app.crud.sync.get_change_events).
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers: set[Subscriber] = set()
+        self._lock = threading.Lock()
+
+    def publish(self, seq: int, entity: str, entity_id: int, operation: str, owner_id: int) -> ChangeEvent:
+        change = ChangeEvent(seq, entity, entity_id, operation, owner_id)
+        with self._lock:
+            subscribers = [s for s in self._subscribers if s.can_see(change)]
+
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber._put, change)
+        return change
+
+    def subscribe(self, user_id: int, is_superuser: bool) -> Subscriber:
+        subscriber = Subscriber(user_id, is_superuser, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+
+
+bus = EventBus(queue_size=settings.EVENTS_SUBSCRIBER_QUEUE_SIZE)
+
+
+def _use_notify(db: Session) -> bool:
+    return settings.EVENTS_PG_NOTIFY and db.get_bind().dialect.name == "postgresql"
+
+
+def record_change(db: Session, entity: str, entity_id: int, operation: str, owner_id: int) -> None:
+    """
+    Record a change to be published once the session's transaction commits.
+
+    The event carries the change sequence of the transaction's last write.
+    On Postgres a NOTIFY is issued inside the transaction so every worker
+    (including this one) receives it on commit. Otherwise the change is
+    published to the in-process bus after commit.
+
+    Args:
+        db (Session): Database session performing the write.
+        entity (str): Entity type, e.g. "subject", "exam" or "grade".
+        entity_id (int): ID of the changed row.
+        operation (str): "created", "updated" or "deleted".
+        owner_id (int): ID of the user owning the subject of the row.
+    """
+    db.info.setdefault("recorded_changes", []).append((entity, entity_id, operation, owner_id))
+
+
+@event.listens_for(Session, "before_commit")
+def _stamp_recorded_changes(session: Session) -> None:
+    changes = session.info.pop("recorded_changes", None)
+    if not changes:
+        return
+    # The sequence is handed out by the flush, commit would flush next anyway
+    session.flush()
+    seq = session.info.get(CHANGE_SEQ_KEY)
+    if seq is None:
+        # Nothing was written
+        return
+    if _use_notify(session):
+        for entity, entity_id, operation, owner_id in changes:
+            payload = json.dumps(
+                {"seq": seq, "entity": entity, "entity_id": entity_id, "operation": operation, "owner_id": owner_id}
+            )
+            session.execute(select(func.pg_notify(NOTIFY_CHANNEL, payload)))
+    else:
+        session.info.setdefault("pending_changes", []).extend((seq, *change) for change in changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_changes(session: Session) -> None:
+    session.info.pop(CHANGE_SEQ_KEY, None)
+    changes = session.info.pop("pending_changes", None)
+    if changes:
+        run_after_commit(session, functools.partial(_publish, changes))
+
+
+def _publish(changes: list[tuple]) -> None:
+    for change in changes:
+        bus.publish(*change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_changes(session: Session) -> None:
+    session.info.pop(CHANGE_SEQ_KEY, None)
+    session.info.pop("recorded_changes", None)
+    session.info.pop("pending_changes", None)
+
+
+def format_sse(change: ChangeEvent) -> str:
+    data = asdict(change)
+    del data["seq"], data["owner_id"]
+    return f"id: {change.seq}\nevent: change\ndata: {json.dumps(data)}\n\n"
+
+
+class NotifyListener:
+    """Background thread feeding Postgres NOTIFY payloads into the local bus."""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="events-listener", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        import psycopg
+
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.dsn, autocommit=True) as connection:
+                    connection.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    backoff = 1.0
+                    while not self._stop.is_set():
+                        for notify in connection.notifies(timeout=1.0):
+                            change = json.loads(notify.payload)
+                            bus.publish(
+                                change["seq"], change["entity"], change["entity_id"], change["operation"],
+                                change["owner_id"],
+                            )
+            except Exception as e:
+                logger.warning("Change feed listener disconnected: %s", e)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+
+_listeners: list[NotifyListener] = []
+
+
+def start_listener() -> None:
+    """Start a NOTIFY listener for every shard on Postgres (the primary database without sharding)."""
+    from app.database.shards import shard_router
+
+    if not settings.EVENTS_PG_NOTIFY or _listeners:
+        return
+    for shard in shard_router.names:
+        engine = shard_router.engine(shard)
+        if engine.dialect.name == "postgresql":
+            dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+            _listeners.append(NotifyListener(dsn))
+    for listener in _listeners:
+        listener.start()
+
+
+def stop_listener() -> None:
+    while _listeners:
+        _listeners.pop().stop()
@@ -0,0 +1,155 @@
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.crud import idempotency as crud
+from app.database.session import run_after_commit
+from app.exceptions.idempotency import IdempotencyKeyInProgress, IdempotencyKeyReused
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+class ResponseCache:
+    """
+    In-memory LRU of completed idempotent responses in front of the table.
+
+    Entries expire with their key, so the cache never answers for a key
+    the table would no longer know.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple[int, str], tuple[float, str, int, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, key: str) -> tuple[str, int, str] | None:
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[(user_id, key)]
+                return None
+            self._entries.move_to_end((user_id, key))
+            return entry[1:]
+
+    def put(self, user_id: int, key: str, expires_at: float, fingerprint: str, status_code: int, body: str) -> None:
+        if not self.max_size:
+            return
+        with self._lock:
+            self._entries[(user_id, key)] = (expires_at, fingerprint, status_code, body)
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+cache = ResponseCache(settings.IDEMPOTENCY_CACHE_SIZE)
+_purged_at = time.monotonic()
+
+
+def _fingerprint(scope: str, payload: BaseModel) -> str:
+    return hashlib.sha256(f"{scope}\n{payload.model_dump_json()}".encode()).hexdigest()
+
+
+def _replay(status_code: int, body: str) -> JSONResponse:
+    metrics.inc("idempotency.replayed")
+    return JSONResponse(status_code=status_code, content=json.loads(body), headers={REPLAY_HEADER: "true"})
+
+
+class IdempotentRequest:
+    """
+    Context manager around a create request with an optional Idempotency-Key.
+
+    On enter, a known key yields ``replay`` (the original response) without
+    running anything else; an unknown key is claimed for
+    IDEMPOTENCY_LEASE_SECONDS. ``respond`` stores the response and keeps it
+    for IDEMPOTENCY_TTL_SECONDS. Leaving the block with an exception before
+    ``respond`` releases the claim so the client can retry. The claim, the
+    write and the response are separate transactions: if the process dies
+    in between, the key answers 409 until the lease lapses; if storing the
+    response fails after the write committed, the claim is kept (a retry
+    would write again) and lapses the same way.
+
+    Raises:
+        IdempotencyKeyReused: If the key was used for a different request.
+        IdempotencyKeyInProgress: If the original request is still running.
+    """
+
+    def __init__(self, db: Session, user_id: int, key: str | None, scope: str, payload: BaseModel):
+        self.db = db
+        self.user_id = user_id
+        self.key = key
+        self.fingerprint = _fingerprint(scope, payload)
+        self.replay: JSONResponse | None = None
+        self._claimed = False
+        self._written = False
+
+    def __enter__(self) -> "IdempotentRequest":
+        if self.key is None:
+            return self
+
+        cached = cache.get(self.user_id, self.key)
+        if cached is not None:
+            fingerprint, status_code, body = cached
+            if fingerprint != self.fingerprint:
+                raise IdempotencyKeyReused()
+            self.replay = _replay(status_code, body)
+            return self
+
+        stored = crud.get_idempotency_key(self.db, self.user_id, self.key)
+        if stored is not None:
+            if stored.fingerprint != self.fingerprint:
+                raise IdempotencyKeyReused()
+            if stored.status_code is None:
+                raise IdempotencyKeyInProgress()
+            expires_at = time.time() + (stored.expires_at - datetime.utcnow()).total_seconds()
+            cache.put(self.user_id, self.key, expires_at, stored.fingerprint, stored.status_code, stored.response)
+            self.replay = _replay(stored.status_code, stored.response)
+            return self
+
+        global _purged_at
+        if time.monotonic() - _purged_at >= settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS:
+            _purged_at = time.monotonic()
+            crud.purge_expired_idempotency_keys(self.db)
+
+        lease_ends_at = datetime.utcnow() + timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+        crud.claim_idempotency_key(self.db, self.user_id, self.key, self.fingerprint, lease_ends_at)
+        self._claimed = True
+        return self
+
+    def respond(self, schema: type[BaseModel], obj, status_code: int) -> JSONResponse:
+        """Serialize ``obj`` with ``schema``, remember it for the key and return it."""
+        content = jsonable_encoder(schema.model_validate(obj, from_attributes=True))
+        if self._claimed:
+            # Called once the write committed
+            self._written = True
+            body = json.dumps(content)
+            expires_at = datetime.utcnow() + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+            crud.complete_idempotency_key(self.db, self.user_id, self.key, status_code, body, expires_at)
+            # Not before an atomic batch commits, a rolled back write must not be replayed
+            run_after_commit(self.db, functools.partial(
+                cache.put, self.user_id, self.key, time.time() + settings.IDEMPOTENCY_TTL_SECONDS,
+                self.fingerprint, status_code, body,
+            ))
+            self._claimed = False
+        return JSONResponse(status_code=status_code, content=content)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None and self._claimed and not self._written:
+            self.db.rollback()
+            crud.release_idempotency_key(self.db, self.user_id, self.key)
@@ -0,0 +1,35 @@
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry (counters and gauges).
+
+    Values are per worker process and exposed through GET /metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def set(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def add(self, name: str, value: float) -> None:
+        """Move a gauge up or down by ``value``."""
+        with self._lock:
+            self._gauges[name] = self._gauges.get(name, 0) + value
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {"counters": dict(self._counters), "gauges": dict(self._gauges)}
+
+
+metrics = Metrics()
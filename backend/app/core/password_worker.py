@@ -0,0 +1,32 @@
+"""
+Password hashing functions executed in the password process pool.
+
+Kept free of app imports so spawned workers start quickly.
+"""
+from functools import lru_cache
+
+from passlib.context import CryptContext
+
+
+@lru_cache
+def _context(rounds: int) -> CryptContext:
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+def warm_up(rounds: int) -> None:
+    _context(rounds)
+
+
+def hash_password(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str, rounds: int) -> tuple[bool, str | None]:
+    """
+    Verify a password and rehash it if it was hashed with other settings.
+
+    Returns:
+        tuple[bool, str | None]: Whether the password matches, and the new
+        hash if the stored one should be replaced.
+    """
+    return _context(rounds).verify_and_update(plain_password, hashed_password)
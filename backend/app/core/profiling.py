@@ -0,0 +1,207 @@
+import contextvars
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+import jwt
+from jwt.exceptions import InvalidTokenError
+
+from app.core import security
+from app.core.config import settings
+from app.core.metrics import metrics
+
+PROFILE_HEADER = b"x-profile"
+
+
+@dataclass
+class Profile:
+    id: int
+    method: str
+    path: str
+    started_at: datetime
+    duration_ms: float = 0.0
+    status_code: int | None = None
+    samples: Counter = field(default_factory=Counter)
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "status_code": self.status_code,
+            "samples": sum(self.samples.values()),
+        }
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed stack format, for flamegraph.pl or speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+# Set for the duration of a profiled request; worker threads of the
+# threadpool see it through the copied context
+_active: contextvars.ContextVar[Profile | None] = contextvars.ContextVar("active_profile", default=None)
+
+
+def _frame_context(frame) -> contextvars.Context | None:
+    """
+    Find the context a thread is currently running code in.
+
+    Both asyncio's Handle._run (the running task) and anyio's worker threads
+    call ``Context.run`` from a Python frame holding the context, so the
+    innermost such frame tells which request the stack belongs to.
+    """
+    while frame is not None:
+        f_locals = frame.f_locals
+        context = f_locals.get("context")
+        if isinstance(context, contextvars.Context):
+            return context
+        context = getattr(f_locals.get("self"), "_context", None)
+        if isinstance(context, contextvars.Context):
+            return context
+        frame = frame.f_back
+    return None
+
+
+_prefix_dirs = sorted({os.path.dirname(p) for p in sys.path if p}, key=len, reverse=True)
+
+
+def _frame_name(code) -> str:
+    filename = code.co_filename
+    for prefix in _prefix_dirs:
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):].lstrip(os.sep)
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler:
+    """
+    Statistical profiler for the requests being profiled.
+
+    While at least one request is profiled, a background thread captures the
+    stacks of all threads every ``interval`` seconds and attributes each to
+    the profiled request whose context the thread is running, covering the
+    event loop and the threadpool (dependencies, validation, ORM, crud).
+    """
+
+    def __init__(self, interval: float, buffer_size: int):
+        self.interval = interval
+        self.profiles: deque[Profile] = deque(maxlen=buffer_size)
+        self._ids = itertools.count(1)
+        self._running: set[int] = set()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self, method: str, path: str) -> Profile:
+        profile = Profile(next(self._ids), method, path, datetime.now(timezone.utc))
+        with self._lock:
+            self._running.add(profile.id)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        return profile
+
+    def finish(self, profile: Profile) -> None:
+        with self._lock:
+            self._running.discard(profile.id)
+            self.profiles.append(profile)
+        metrics.inc("profiling.profiles")
+
+    def recent(self) -> list[Profile]:
+        """The recorded profiles, newest first."""
+        # A copy, finish() may append while the caller iterates
+        with self._lock:
+            return list(reversed(self.profiles))
+
+    def get(self, profile_id: int) -> Profile | None:
+        with self._lock:
+            return next((p for p in self.profiles if p.id == profile_id), None)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._running:
+                    self._thread = None
+                    return
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                context = _frame_context(frame)
+                profile = context.get(_active) if context is not None else None
+                if profile is not None:
+                    profile.samples[_collapse(frame)] += 1
+            time.sleep(self.interval)
+
+
+sampler = Sampler(settings.PROFILING_INTERVAL_MS / 1000, settings.PROFILING_BUFFER_SIZE)
+
+
+def create_profile_token(user_id: int, expires_delta: timedelta) -> str:
+    """Signed value for the X-Profile header, handed out to superusers."""
+    expire = datetime.now(timezone.utc) + expires_delta
+    return jwt.encode(
+        {"exp": expire, "sub": str(user_id), "type": "profile"}, settings.SECRET_KEY, algorithm=security.ALGORITHM
+    )
+
+
+def _has_valid_token(scope) -> bool:
+    token = dict(scope["headers"]).get(PROFILE_HEADER)
+    if not token:
+        return False
+    try:
+        payload = jwt.decode(token.decode("latin-1"), settings.SECRET_KEY, algorithms=[security.ALGORITHM])
+    except InvalidTokenError:
+        return False
+    return payload.get("type") == "profile"
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests carrying a valid X-Profile token, plus a random share
+    (PROFILING_SAMPLE_RATE) of all requests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (
+            _has_valid_token(scope)
+            or (settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile = sampler.start(scope["method"], scope["path"])
+        token = _active.set(profile)
+        started = time.perf_counter()
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", str(profile.id).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            _active.reset(token)
+            sampler.finish(profile)
@@ -0,0 +1,177 @@
+import threading
+import time
+
+from sqlalchemy import Engine, text
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.rate_limit import RateLimitBucket
+
+
+class TokenBucketLimiter:
+    """
+    In-memory token buckets keyed by string.
+
+    Each bucket is a ``(tokens, updated_at)`` tuple. Buckets that have
+    refilled completely carry no information and are evicted periodically.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float, evict_interval: float = 60.0):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.evict_interval = evict_interval
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._evicted_at = time.monotonic()
+
+    def acquire(self, key: str) -> float:
+        """
+        Take a token from the bucket of ``key``.
+
+        Returns:
+            float: 0 if the token was granted, otherwise the seconds until one is available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._evicted_at >= self.evict_interval:
+                self._evict(now)
+
+            tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.refill_per_second)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / self.refill_per_second
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+
+    def refund(self, key: str) -> None:
+        """Give back a token taken from the bucket of ``key``."""
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated_at = self._buckets[key]
+                self._buckets[key] = (min(self.capacity, tokens + 1), updated_at)
+
+    def _evict(self, now: float) -> None:
+        full_after = self.capacity / self.refill_per_second
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < full_after
+        }
+        self._evicted_at = now
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class PostgresTokenBucketStore:
+    """
+    Token buckets stored in Postgres so all workers share one budget.
+
+    Refill and consumption happen in a single upsert. Rejected attempts also
+    cost a token, bounded at -1, which slows down clients hammering the endpoint.
+    """
+
+    _UPSERT = text(f"""
+        INSERT INTO {RateLimitBucket.__tablename__} AS b (key, tokens, updated_at)
+        VALUES (:key, :capacity - 1, now())
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = greatest(
+                least(:capacity, b.tokens + extract(epoch FROM now() - b.updated_at) * :rate) - 1,
+                -1
+            ),
+            updated_at = now()
+        RETURNING tokens
+    """)
+
+    def __init__(self, engine: Engine, capacity: float, refill_per_second: float):
+        self.engine = engine
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+
+    def acquire(self, key: str) -> float:
+        with self.engine.begin() as connection:
+            tokens = connection.execute(
+                self._UPSERT, {"key": key, "capacity": self.capacity, "rate": self.refill_per_second}
+            ).scalar_one()
+        if tokens >= 0:
+            return 0.0
+        return (1 - tokens) / self.refill_per_second
+
+    def purge(self) -> None:
+        """Delete buckets that have refilled completely."""
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    f"DELETE FROM {RateLimitBucket.__tablename__} "
+                    "WHERE updated_at < now() - make_interval(secs => :seconds)"
+                ),
+                {"seconds": self.capacity / self.refill_per_second},
+            )
+
+
+def _per_second(per_minute: float) -> float:
+    return per_minute / 60
+
+
+email_limiter = TokenBucketLimiter(
+    settings.LOGIN_RATE_LIMIT_EMAIL_BURST, _per_second(settings.LOGIN_RATE_LIMIT_EMAIL_PER_MINUTE)
+)
+ip_limiter = TokenBucketLimiter(
+    settings.LOGIN_RATE_LIMIT_IP_BURST, _per_second(settings.LOGIN_RATE_LIMIT_IP_PER_MINUTE)
+)
+_shared_stores: tuple[PostgresTokenBucketStore, PostgresTokenBucketStore] | None = None
+_shared_purged_at = time.monotonic()
+
+
+def _get_shared_stores() -> tuple[PostgresTokenBucketStore, PostgresTokenBucketStore]:
+    global _shared_stores
+    if _shared_stores is None:
+        from app.database.session import engine
+
+        _shared_stores = (
+            PostgresTokenBucketStore(engine, email_limiter.capacity, email_limiter.refill_per_second),
+            PostgresTokenBucketStore(engine, ip_limiter.capacity, ip_limiter.refill_per_second),
+        )
+    return _shared_stores
+
+
+def check_login_attempt(email: str, ip: str | None) -> float:
+    """
+    Consume a login attempt for the e-mail address and the client IP.
+
+    The in-memory buckets are checked first, so floods are rejected without
+    touching the database. With LOGIN_RATE_LIMIT_SHARED the Postgres buckets
+    then enforce the budget across all workers.
+
+    Returns:
+        float: 0 if the attempt is allowed, otherwise the seconds to wait.
+    """
+    # The IP is checked first, so attempts rejected for their IP don't use up
+    # the budget of the targeted account
+    email_key = f"email:{email.strip().lower()}"
+    checks = [(ip_limiter, f"ip:{ip}")] if ip else []
+    checks.append((email_limiter, email_key))
+
+    for limiter, key in checks:
+        retry_after = limiter.acquire(key)
+        if retry_after:
+            metrics.inc("login_rate_limit.rejected")
+            return retry_after
+
+    if settings.LOGIN_RATE_LIMIT_SHARED:
+        global _shared_purged_at
+        stores = dict(zip((email_limiter, ip_limiter), _get_shared_stores(), strict=True))
+        if time.monotonic() - _shared_purged_at >= email_limiter.evict_interval:
+            _shared_purged_at = time.monotonic()
+            for store in stores.values():
+                store.purge()
+
+        for limiter, key in checks:
+            retry_after = stores[limiter].acquire(key)
+            if retry_after:
+                if limiter is ip_limiter:
+                    email_limiter.refund(email_key)
+                metrics.inc("login_rate_limit.rejected")
+                return retry_after
+
+    metrics.set("login_rate_limit.buckets", len(email_limiter) + len(ip_limiter))
+    return 0.0
@@ -0,0 +1,89 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.token import get_revocations_since, purge_expired_revocations
+
+
+def _timestamp(value: datetime | None) -> float | None:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class RevocationCache:
+    """
+    In-memory copy of the token_revocations table.
+
+    Refreshed incrementally at most once per ``refresh_interval`` seconds,
+    so validating an access token normally needs no database access at all.
+    Ids don't become visible in commit order, so a refresh re-reads the
+    revocations of the last ``overlap`` before the newest one seen instead
+    of the rows above the highest id; reading a row twice is harmless.
+    """
+
+    def __init__(self, refresh_interval: float, overlap: float):
+        self.refresh_interval = refresh_interval
+        self.overlap = timedelta(seconds=overlap)
+        self._jtis: dict[str, float | None] = {}
+        self._users: dict[int, float] = {}
+        self._last_revoked_at: datetime | None = None
+        self._refreshed_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._jtis, self._users = {}, {}
+            self._last_revoked_at = None
+            self._refreshed_at = float("-inf")
+
+    def refresh(self, db: Session, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            if not force and now - self._refreshed_at < self.refresh_interval:
+                return
+            since = None if self._last_revoked_at is None else self._last_revoked_at - self.overlap
+            for row in get_revocations_since(db, since):
+                if row.jti:
+                    self._jtis[row.jti] = _timestamp(row.expires_at)
+                else:
+                    revoked_at = _timestamp(row.revoked_at)
+                    self._users[row.user_id] = max(self._users.get(row.user_id, 0.0), revoked_at)
+                self._last_revoked_at = row.revoked_at
+            # Forget revoked tokens that have expired anyway
+            wall_now = time.time()
+            self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp is None or exp > wall_now}
+            self._refreshed_at = now
+
+    def is_revoked(self, payload: dict) -> bool:
+        jti = payload.get("jti")
+        if jti and jti in self._jtis:
+            return True
+        revoked_at = self._users.get(payload.get("uid"))
+        return revoked_at is not None and payload.get("iat", 0) <= revoked_at
+
+
+revocation_cache = RevocationCache(
+    settings.TOKEN_REVOCATION_REFRESH_SECONDS, settings.TOKEN_REVOCATION_OVERLAP_SECONDS
+)
+_purged_at = time.monotonic()
+
+
+def purge_expired(db: Session) -> None:
+    """
+    Delete revocations of expired tokens, at most once per TOKEN_REVOCATION_PURGE_INTERVAL_SECONDS.
+
+    Called where refresh tokens are revoked, so the table is kept small
+    without a background job.
+    """
+    global _purged_at
+    if time.monotonic() - _purged_at >= settings.TOKEN_REVOCATION_PURGE_INTERVAL_SECONDS:
+        _purged_at = time.monotonic()
+        purge_expired_revocations(db)
@@ -0,0 +1,90 @@
+from sqlalchemy import Connection, event, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.role import Role
+
+# Role the principal's transactions switch to. Unlike the (owner or super-)
+# user the app logs in with, it is subject to the row-level security policies.
+RLS_ROLE = "gradetracker_rls"
+
+# Enum(Role) stores member names, so the GUC holds e.g. "SUPERUSER"
+_IS_SUPERUSER = f"current_setting('app.user_role', true) = '{Role.SUPERUSER.name}'"
+_USER_ID = "nullif(current_setting('app.user_id', true), '')::int"
+
+POLICIES = {
+    "subjects": f"{_IS_SUPERUSER} OR user_id = {_USER_ID}",
+    "exams": (
+        f"{_IS_SUPERUSER} OR EXISTS ("
+        f"SELECT 1 FROM subjects s WHERE s.id = exams.subject_id AND s.user_id = {_USER_ID})"
+    ),
+    "grades": (
+        f"{_IS_SUPERUSER} OR EXISTS ("
+        "SELECT 1 FROM exams e JOIN subjects s ON s.id = e.subject_id "
+        # e.date: only the exam's school year partition is searched
+        f"WHERE e.id = grades.exam_id AND e.date = grades.exam_date AND s.user_id = {_USER_ID})"
+    ),
+}
+
+
+def apply_policies(connection: Connection) -> None:
+    """
+    Create the restricted role and the ownership policies (Postgres only).
+
+    RLS is enabled but not forced, so sessions without a principal (init
+    scripts, background jobs) keep running as the unrestricted login user.
+    The policies rely on the indexes on subjects.user_id, exams.subject_id
+    and grades.exam_id.
+    """
+    connection.exec_driver_sql(
+        f"DO $$ BEGIN "
+        f"IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = '{RLS_ROLE}') "
+        f"THEN CREATE ROLE {RLS_ROLE} NOLOGIN; END IF; END $$"
+    )
+    connection.exec_driver_sql(f"GRANT {RLS_ROLE} TO CURRENT_USER")
+    connection.exec_driver_sql(
+        f"GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA public TO {RLS_ROLE}"
+    )
+    connection.exec_driver_sql(f"GRANT USAGE, SELECT ON ALL SEQUENCES IN SCHEMA public TO {RLS_ROLE}")
+
+    for table, condition in POLICIES.items():
+        connection.exec_driver_sql(f"DROP POLICY IF EXISTS {table}_owner ON {table}")
+        connection.exec_driver_sql(
+            f"CREATE POLICY {table}_owner ON {table} TO {RLS_ROLE} "
+            f"USING ({condition}) WITH CHECK ({condition})"
+        )
+        connection.exec_driver_sql(f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY")
+
+
+def is_active(db: Session) -> bool:
+    """True if ownership of the session's reads is enforced by the database."""
+    return "rls_principal" in db.info
+
+
+def _apply(connection: Connection, user_id: int, role: Role) -> None:
+    connection.exec_driver_sql(f"SET LOCAL ROLE {RLS_ROLE}")
+    connection.execute(select(
+        func.set_config("app.user_id", str(user_id), True),
+        func.set_config("app.user_role", role.name, True),
+    ))
+
+
+def set_principal(db: Session, user_id: int, role: Role) -> None:
+    """
+    Bind the principal to the session in OWNERSHIP_ENFORCEMENT=rls mode.
+
+    Every transaction of the session then switches to the restricted role
+    and carries the user's id and role as transaction-local settings.
+    """
+    if settings.OWNERSHIP_ENFORCEMENT != "rls" or db.get_bind().dialect.name != "postgresql":
+        return
+    db.info["rls_principal"] = (user_id, Role(role))
+    if db.in_transaction():
+        _apply(db.connection(), user_id, Role(role))
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_principal(session: Session, _transaction, connection: Connection) -> None:
+    principal = session.info.get("rls_principal")
+    if principal is not None:
+        _apply(connection, *principal)
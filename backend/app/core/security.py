@@ -1,49 +1,135 @@
+import asyncio
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
 import jwt
-from passlib.context import CryptContext
 
+from app.core import password_worker
 from app.core.config import settings
-
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.metrics import metrics
 
 # Algorithm used for JWT encoding
 ALGORITHM = "HS256"
 
-def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
+def create_access_token(subject: str | Any, expires_delta: timedelta, claims: dict[str, Any] | None = None) -> str:
     """
     Create an access token.
 
     Args:
         subject (str | Any): The subject for whom the access token is being created.
         expires_delta (timedelta): The duration for which the access token will be valid.
+        claims (dict[str, Any] | None): Additional claims, e.g. the user data needed
+            to validate the token without a database lookup.
 
     Returns:
         str: The generated access token.
     """
-    expire = datetime.now(timezone.utc) + expires_delta
-    to_encode = {"exp": expire, "sub": str(subject)}
+    now = datetime.now(timezone.utc)
+    to_encode = {
+        **(claims or {}),
+        "exp": now + expires_delta,
+        "iat": now,
+        "sub": str(subject),
+        "type": "access",
+        "jti": uuid.uuid4().hex,
+    }
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def create_refresh_token(subject: str | Any, user_id: int, expires_delta: timedelta) -> str:
     """
-    Verify a plain password against a hashed password.
+    Create a refresh token.
+
+    Args:
+        subject (str | Any): The subject for whom the refresh token is being created.
+        user_id (int): ID of the user, used for revocation checks.
+        expires_delta (timedelta): The duration for which the refresh token will be valid.
+
+    Returns:
+        str: The generated refresh token.
+    """
+    now = datetime.now(timezone.utc)
+    to_encode = {
+        "exp": now + expires_delta,
+        "iat": now,
+        "sub": str(subject),
+        "uid": user_id,
+        "type": "refresh",
+        "jti": uuid.uuid4().hex,
+    }
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+
+# Dedicated pool for bcrypt, so password checks neither hold the GIL for the
+# rest of the app nor occupy the shared anyio threadpool.
+_password_pool: ProcessPoolExecutor | ThreadPoolExecutor | None = None
+_password_semaphore: asyncio.Semaphore | None = None
+
+
+def _get_password_pool() -> ProcessPoolExecutor | ThreadPoolExecutor:
+    global _password_pool
+    if _password_pool is None:
+        if settings.PASSWORD_HASH_WORKERS > 0:
+            _password_pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        else:
+            _password_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="password-hash")
+    return _password_pool
+
+
+def _get_password_semaphore() -> asyncio.Semaphore:
+    global _password_semaphore
+    if _password_semaphore is None:
+        _password_semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_CONCURRENCY)
+    return _password_semaphore
+
+
+async def _run_in_password_pool(fn, *args):
+    loop = asyncio.get_running_loop()
+    metrics.add("password_hash.waiting", 1)
+    acquired = False
+    try:
+        async with _get_password_semaphore():
+            acquired = True
+            metrics.add("password_hash.waiting", -1)
+            metrics.add("password_hash.in_flight", 1)
+            started = time.perf_counter()
+            try:
+                return await loop.run_in_executor(_get_password_pool(), fn, *args)
+            finally:
+                metrics.add("password_hash.in_flight", -1)
+                metrics.inc("password_hash.completed")
+                metrics.inc("password_hash.seconds", time.perf_counter() - started)
+    finally:
+        if not acquired:
+            metrics.add("password_hash.waiting", -1)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Verify a password in the password pool.
 
     Args:
         plain_password (str): The plain password to verify.
         hashed_password (str): The hashed password to verify against.
 
     Returns:
-        bool: True if the password matches, False otherwise.
+        tuple[bool, str | None]: Whether the password matches, and a new hash
+        if the stored one uses an outdated scheme or BCRYPT_ROUNDS changed.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return await _run_in_password_pool(
+        password_worker.verify_and_update, plain_password, hashed_password, settings.BCRYPT_ROUNDS
+    )
 
-def get_password_hash(password: str) -> str:
+
+async def get_password_hash_async(password: str) -> str:
     """
-    Hash a password.
+    Hash a password in the password pool.
 
     Args:
         password (str): The password to hash.
@@ -51,4 +137,21 @@ def get_password_hash(password: str) -> str:
     Returns:
         str: The hashed password.
     """
-    return pwd_context.hash(password)
+    return await _run_in_password_pool(password_worker.hash_password, password, settings.BCRYPT_ROUNDS)
+
+
+def start_password_pool() -> None:
+    """Start the password workers and load passlib in them, ahead of the first login."""
+    pool = _get_password_pool()
+    workers = settings.PASSWORD_HASH_WORKERS if isinstance(pool, ProcessPoolExecutor) else 1
+    futures = [pool.submit(password_worker.warm_up, settings.BCRYPT_ROUNDS) for _ in range(workers)]
+    for future in futures:
+        future.result()
+
+
+def shutdown_password_pool() -> None:
+    global _password_pool, _password_semaphore
+    if _password_pool is not None:
+        _password_pool.shutdown(wait=False, cancel_futures=True)
+        _password_pool = None
+    _password_semaphore = None
@@ -0,0 +1,216 @@
+import contextvars
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from sqlalchemy import Engine, event
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.tracing import route_template
+
+logger = logging.getLogger(__name__)
+
+# Distinct routes remembered per statement
+MAX_ROUTES = 20
+# Repr of the parameters is cut to this length
+MAX_PARAMETERS_LENGTH = 500
+# EXPLAINs waiting for the explain thread, further samples are skipped
+MAX_PENDING_EXPLAINS = 4
+
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<!:):\w+|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \((?:\?, )*\?\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+# Statements EXPLAIN accepts
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+def normalize(statement: str) -> str:
+    """Replace literals and bound parameters with ``?`` and collapse IN lists and whitespace."""
+    normalized = _PLACEHOLDER.sub("?", _WHITESPACE.sub(" ", statement).strip())
+    return _IN_LIST.sub("IN (...)", normalized)
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+@dataclass
+class SlowQuery:
+    fingerprint: str
+    statement: str
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_seen: datetime | None = None
+    last_parameters: str | None = None
+    routes: Counter = field(default_factory=Counter)
+    explain: str | None = None
+
+    def summary(self) -> dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "statement": self.statement,
+            "calls": self.calls,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.calls, 3),
+            "max_ms": round(self.max_ms, 3),
+            "last_seen": self.last_seen,
+            "last_parameters": self.last_parameters,
+            "routes": dict(self.routes.most_common()),
+            "explain": self.explain,
+        }
+
+
+class SlowQueryLog:
+    """
+    Slow statements aggregated by fingerprint.
+
+    Holds at most ``max_size`` fingerprints, evicting the one not seen for
+    the longest time.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, SlowQuery] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, parameters, duration_ms: float, route: str | None) -> SlowQuery:
+        normalized = normalize(statement)
+        key = fingerprint(normalized)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = SlowQuery(key, normalized)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(key)
+            entry.calls += 1
+            entry.total_ms += duration_ms
+            entry.max_ms = max(entry.max_ms, duration_ms)
+            entry.last_seen = datetime.now(timezone.utc)
+            entry.last_parameters = repr(parameters)[:MAX_PARAMETERS_LENGTH]
+            if route is not None and (route in entry.routes or len(entry.routes) < MAX_ROUTES):
+                entry.routes[route] += 1
+        metrics.inc("slow_queries.recorded")
+        return entry
+
+    def set_explain(self, key: str, plan: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._entries[key].explain = plan
+
+    def entries(self) -> list[SlowQuery]:
+        with self._lock:
+            return sorted(self._entries.values(), key=lambda entry: entry.total_ms, reverse=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+store = SlowQueryLog(settings.SLOW_QUERY_STORE_SIZE)
+
+# ASGI scope of the request running the statement, the router fills in the
+# matched route after the middleware set it
+_origin: contextvars.ContextVar[dict | None] = contextvars.ContextVar("query_origin", default=None)
+
+_explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def _origin_route() -> str | None:
+    scope = _origin.get()
+    if scope is None:
+        return None
+    return f"{scope['method']} {route_template(scope) or scope['path']}"
+
+
+def _should_explain(conn, statement: str, executemany: bool) -> bool:
+    # Plain EXPLAIN only plans the statement, never runs it: ANALYZE would run
+    # side effects (pg_notify(), FOR UPDATE locks, writes) a second time
+    return (
+        conn.dialect.name == "postgresql"
+        and not executemany
+        and statement.lstrip().upper().startswith(_EXPLAINABLE)
+        and random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+    )
+
+
+def _explain(engine: Engine, key: str, statement: str, parameters) -> None:
+    global _pending
+    try:
+        with engine.connect() as conn:
+            conn.execution_options(slow_query_explain=True)
+            rows = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters).all()
+            conn.rollback()
+        store.set_explain(key, "\n".join(row[0] for row in rows))
+        metrics.inc("slow_queries.explained")
+    except Exception as e:
+        logger.warning("EXPLAIN of slow query %s failed: %s", key, e)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+def _schedule_explain(engine: Engine, key: str, statement: str, parameters) -> None:
+    global _pending
+    with _pending_lock:
+        if _pending >= MAX_PENDING_EXPLAINS:
+            return
+        _pending += 1
+    _explainer.submit(_explain, engine, key, statement, parameters)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, _cursor, _statement, _parameters, _context, _executemany):
+    if settings.SLOW_QUERY_THRESHOLD_MS is not None:
+        conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_slow_query(conn, _cursor, statement, parameters, _context, executemany):
+    started = conn.info.get("slow_query_started")
+    if not started:
+        return
+    duration_ms = (time.perf_counter() - started.pop()) * 1000
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold is None or duration_ms < threshold or conn.get_execution_options().get("slow_query_explain"):
+        return
+
+    entry = store.record(statement, parameters, duration_ms, _origin_route())
+    if entry.explain is None and _should_explain(conn, statement, executemany):
+        _schedule_explain(conn.engine, entry.fingerprint, statement, parameters)
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_timer(context):
+    started = context.connection.info.get("slow_query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+class QueryOriginMiddleware:
+    """Makes the request available to the slow-query log as the origin of its statements."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _origin.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _origin.reset(token)
@@ -0,0 +1,326 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass, field
+
+from sqlalchemy import Engine, event
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+# OTLP status codes
+STATUS_OK, STATUS_ERROR = 1, 2
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    name: str
+    kind: int = KIND_INTERNAL
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: dict = field(default_factory=dict)
+    status: int = STATUS_OK
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": {"intValue": str(value)} if isinstance(value, int) else {"stringValue": str(value)}}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+# The active span of the request; only set for sampled requests, so unsampled
+# requests pay a single contextvar lookup per instrumented call
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+class SpanExporter:
+    """
+    Exports finished spans in batches from a background thread.
+
+    Batches are written as OTLP/JSON ``ExportTraceServiceRequest`` documents,
+    one per line to a file or POSTed to an OTLP/HTTP collector. Spans are
+    dropped (and counted) when the queue is full rather than slowing down
+    requests.
+    """
+
+    def __init__(self, path: str | None, endpoint: str | None, max_queue: int = 10_000, batch_size: int = 512):
+        self.path = path
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self._queue: queue.Queue[Span | None] = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            metrics.inc("tracing.dropped_spans")
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def shutdown(self) -> None:
+        """Flush the queued spans and stop the thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=1.0)
+                while True:
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: list[Span]) -> None:
+        document = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": settings.PROJECT_NAME}},
+            ]},
+            "scopeSpans": [{"scope": {"name": "app"}, "spans": [span.to_otlp() for span in batch]}],
+        }]})
+        try:
+            if self.endpoint:
+                request = urllib.request.Request(
+                    self.endpoint, data=document.encode(), headers={"Content-Type": "application/json"}
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+            elif self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(document + "\n")
+            metrics.inc("tracing.exported_spans", len(batch))
+        except Exception as e:
+            metrics.inc("tracing.dropped_spans", len(batch))
+            logger.warning("Exporting %s spans failed: %s", len(batch), e)
+
+
+exporter = SpanExporter(settings.TRACING_EXPORT_PATH, settings.TRACING_OTLP_ENDPOINT)
+
+
+def parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+    """
+    Parse a W3C ``traceparent`` header.
+
+    Returns:
+        tuple[str, str, bool] | None: Trace ID, parent span ID and the sampled
+        flag, or None if the header is missing or invalid.
+    """
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def should_sample(parent: tuple[str, str, bool] | None) -> bool:
+    """Head-based sampling: follow the caller's decision, else sample at TRACING_SAMPLE_RATE."""
+    if parent is not None:
+        return parent[2]
+    return settings.TRACING_SAMPLE_RATE > 0 and random.random() < settings.TRACING_SAMPLE_RATE
+
+
+class _SpanScope:
+    def __init__(self, span: Span):
+        self.span = span
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.span.status = STATUS_ERROR
+            self.span.attributes["exception.type"] = exc_type.__name__
+        self.span.end_ns = time.time_ns()
+        _current.reset(self._token)
+        exporter.export(self.span)
+
+
+def start_root_span(name: str, parent: tuple[str, str, bool] | None, kind: int = KIND_SERVER) -> _SpanScope:
+    trace_id, parent_id = (parent[0], parent[1]) if parent else (secrets.token_hex(16), None)
+    return _SpanScope(Span(trace_id, secrets.token_hex(8), parent_id, name, kind))
+
+
+def start_span(name: str, kind: int = KIND_INTERNAL, **attributes) -> _SpanScope | None:
+    """Start a child of the current span, or return None if the request isn't sampled."""
+    parent = _current.get()
+    if parent is None:
+        return None
+    return _SpanScope(Span(parent.trace_id, secrets.token_hex(8), parent.span_id, name, kind, attributes=attributes))
+
+
+def traced(name: str | None = None):
+    """
+    Decorator recording a span around every call of a sampled request.
+
+    Keeps the signature (FastAPI dependencies) and works for sync and
+    async functions.
+    """
+    def decorator(fn):
+        span_name = name or f"{fn.__module__.removeprefix('app.')}.{fn.__name__}"
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                scope = start_span(span_name)
+                if scope is None:
+                    return await fn(*args, **kwargs)
+                with scope:
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            scope = start_span(span_name)
+            if scope is None:
+                return fn(*args, **kwargs)
+            with scope:
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of each sampled request.
+
+    Continues the trace of an incoming ``traceparent`` header and returns
+    the request's own ``traceparent`` so clients can correlate.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if not settings.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        if not should_sample(parent):
+            await self.app(scope, receive, send)
+            return
+
+        with start_root_span(f"{scope['method']} {scope['path']}", parent) as span:
+            span.attributes.update({"http.request.method": scope["method"], "url.path": scope["path"]})
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    span.attributes["http.response.status_code"] = message["status"]
+                    if message["status"] >= 500:
+                        span.status = STATUS_ERROR
+                    message["headers"] = [*message.get("headers", []), (b"traceparent", span.traceparent.encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                route = route_template(scope)
+                if route is not None:
+                    span.name = f"{scope['method']} {route}"
+                    span.attributes["http.route"] = route
+
+
+def route_template(scope) -> str | None:
+    """Path template of the matched route, e.g. /api/v1/subjects/{subject_id}."""
+    # Set by the router once the request was matched, relative to the router prefixes
+    route = getattr(scope.get("route"), "path", None)
+    if not route:
+        return None
+    try:
+        rendered = route.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return route
+    path = scope["path"]
+    return path[: len(path) - len(rendered)] + route if path.endswith(rendered) else route
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement_span(conn, _cursor, statement, _parameters, _context, _executemany):
+    scope = start_span(f"SQL {statement.split(None, 1)[0].upper()}" if statement else "SQL", KIND_CLIENT)
+    if scope is not None:
+        scope.span.attributes.update({"db.system": conn.dialect.name, "db.statement": statement[:2000]})
+        scope.__enter__()
+        conn.info.setdefault("trace_scopes", []).append(scope)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_statement_span(conn, _cursor, _statement, _parameters, _context, _executemany):
+    scopes = conn.info.get("trace_scopes")
+    if scopes:
+        scopes.pop().__exit__(None, None, None)
+
+
+@event.listens_for(Engine, "handle_error")
+def _fail_statement_span(context):
+    scopes = context.connection.info.get("trace_scopes") if context.connection is not None else None
+    if scopes:
+        error = context.original_exception
+        scopes.pop().__exit__(type(error), error, None)
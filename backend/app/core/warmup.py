@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+
+from sqlalchemy import Connection, Engine, select
+from sqlalchemy.orm import Session
+from tenacity import Retrying, before_sleep_log, stop_after_delay, wait_exponential
+
+from app.core import security
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.revocation import revocation_cache
+from app.crud import exam as exam_crud
+from app.crud import grade as grade_crud
+from app.crud import subject as subject_crud
+from app.crud import user as user_crud
+from app.exceptions.exam import ExamNotFound
+from app.exceptions.grade import GradeNotFound
+from app.exceptions.subject import SubjectNotFound
+from app.models.role import Role
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Pause between connect attempts of the warm-up, each backing off on its own
+_RECONNECT_SECONDS = 10.0
+
+
+def connect_with_backoff(engine: Engine, timeout: float) -> None:
+    """
+    Wait until the database accepts connections.
+
+    Retries with exponential backoff (0.1 s doubling up to 10 s) instead of
+    a fixed interval, so a database that is already up is found at once.
+
+    Raises:
+        Exception: The last connection error if ``timeout`` seconds passed.
+    """
+    retrying = Retrying(
+        stop=stop_after_delay(timeout),
+        wait=wait_exponential(multiplier=0.1, max=10),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        reraise=True,
+    )
+    for attempt in retrying:
+        with attempt:
+            with engine.connect() as connection:
+                connection.execute(select(1))
+
+
+def open_pool(engine: Engine, count: int | None = None) -> list[Connection]:
+    """
+    Check out ``count`` connections at once (default: the pool size).
+
+    Holding them together forces the pool to open a new connection for each,
+    returning them leaves the pool filled.
+    """
+    if count is None:
+        size = getattr(engine.pool, "size", None)
+        count = size() if size is not None else 1
+    return [engine.connect() for _ in range(count)]
+
+
+def run_hot_statements(db: Session) -> None:
+    """
+    Run the statements behind the most frequent requests once.
+
+    Compiles them into the engine's statement cache. Uses one existing user
+    per role, so both the superuser and the owner-filtered variants are
+    covered; lists are only read for non-superusers to keep the warm-up
+    cheap on large databases.
+    """
+    user_crud.get_user_by_email(db=db, email=settings.FIRST_SUPERUSER_EMAIL)
+    for role in Role:
+        user = db.query(User).filter(User.role == role).first()
+        if user is None:
+            continue
+        for get, not_found in (
+            (subject_crud.get_subject, SubjectNotFound),
+            (exam_crud.get_exam, ExamNotFound),
+            (grade_crud.get_grade, GradeNotFound),
+        ):
+            try:
+                get(db, 0, user.id)
+            except not_found:
+                pass
+        if role != Role.SUPERUSER:
+            subject_crud.get_subjects(db, user.id)
+            exam_crud.get_exams(db, user.id)
+            grade_crud.get_grades(db, user.id)
+
+
+class WarmUp:
+    """
+    Startup warm-up of a worker, gating GET /ready.
+
+    Waits for the database, fills the connection pool, runs the hot
+    statements on every pooled connection and loads the token revocation
+    cache and the password workers. Runs in a background thread so the
+    worker already answers liveness checks meanwhile.
+
+    Without a database the worker isn't ready, connecting is retried until
+    it succeeds or ``stop`` is called. Once the database is reachable, a
+    failing later step only costs the warm-up: the worker becomes ready
+    anyway and ``error`` tells what failed.
+    """
+
+    def __init__(self):
+        self.error: str | None = None
+        self.durations: dict[str, float] = {}
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def mark_ready(self) -> None:
+        self._ready.set()
+
+    def start(self, engine: Engine) -> None:
+        self._thread = threading.Thread(target=self.run, args=(engine,), name="warm-up", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def reset(self) -> None:
+        self.error = None
+        self.durations = {}
+        self._ready.clear()
+        self._stopping.clear()
+
+    def _step(self, name: str, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        self.durations[name] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+    def _fail(self, error: str) -> None:
+        self.error = error
+        metrics.inc("warmup.failed")
+        logger.exception(error)
+
+    def run(self, engine: Engine) -> None:
+        while not self._stopping.is_set():
+            self.durations = {}
+            try:
+                self._step("connect", connect_with_backoff, engine, settings.WARMUP_CONNECT_TIMEOUT_SECONDS)
+            except Exception as e:
+                self._fail(f"Database unreachable: {e}")
+                self._stopping.wait(_RECONNECT_SECONDS)
+                continue
+            try:
+                connections = self._step("open_pool", open_pool, engine, settings.WARMUP_POOL_CONNECTIONS)
+                try:
+                    self._step("statements", self._warm_connections, connections)
+                finally:
+                    for connection in connections:
+                        connection.close()
+                self._step("caches", self._warm_caches, engine)
+            except Exception as e:
+                # The database is up, serve requests without (all of) the warm-up
+                self._fail(f"Warm-up failed: {e}")
+                self._ready.set()
+                return
+            self.error = None
+            metrics.set("warmup.seconds", sum(self.durations.values()) / 1000)
+            logger.info("Warm-up done: %s", self.durations)
+            self._ready.set()
+            return
+
+    @staticmethod
+    def _warm_connections(connections: list[Connection]) -> None:
+        # Often enough for psycopg to prepare them on every connection
+        runs = 1
+        if connections and connections[0].dialect.driver == "psycopg" and settings.POSTGRES_PREPARE_THRESHOLD is not None:
+            runs = settings.POSTGRES_PREPARE_THRESHOLD + 1
+        for connection in connections:
+            with Session(bind=connection) as db:
+                for _ in range(runs):
+                    run_hot_statements(db)
+            connection.rollback()
+
+    @staticmethod
+    def _warm_caches(engine: Engine) -> None:
+        with Session(engine) as db:
+            revocation_cache.refresh(db, force=True)
+        security.start_password_pool()
+
+
+state = WarmUp()
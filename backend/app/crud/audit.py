@@ -0,0 +1,63 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.audit import AuditEntry
+from app.models.role import Role
+from app.exceptions.subject import PermissionDenied
+from app.core.tracing import traced
+from app.crud import statements
+
+
+@traced()
+def get_audit_log(
+    db: Session,
+    owner_id: int,
+    entity: str | None = None,
+    entity_id: int | None = None,
+    principal_id: int | None = None,
+    before: int | None = None,
+    limit: int = 100,
+):
+    """
+    Retrieve a page of the audit log, newest entries first.
+
+    Pages are keyed by entry id, so new entries don't shift later pages.
+    Entries are written shortly after their change commits, the last moment
+    may not be in the log yet.
+
+    Args:
+        db (Session): Database session (of the primary database).
+        owner_id (int): ID of the current user.
+        entity (str | None): Only entries of this entity type.
+        entity_id (int | None): Only entries of this row.
+        principal_id (int | None): Only changes made by this user.
+        before (int | None): ``next_before`` of the previous page.
+        limit (int): Maximum number of entries to return.
+
+    Raises:
+        PermissionDenied: If the user is not a superuser.
+
+    Returns:
+        dict: The entries, next_before and has_more.
+    """
+    current_user = statements.get_principal(db, owner_id)
+    if current_user.role != Role.SUPERUSER:
+        raise PermissionDenied()
+
+    stmt = select(AuditEntry).order_by(AuditEntry.id.desc()).limit(limit + 1)
+    if entity is not None:
+        stmt = stmt.where(AuditEntry.entity == entity)
+    if entity_id is not None:
+        stmt = stmt.where(AuditEntry.entity_id == entity_id)
+    if principal_id is not None:
+        stmt = stmt.where(AuditEntry.principal_id == principal_id)
+    if before is not None:
+        stmt = stmt.where(AuditEntry.id < before)
+
+    entries = db.scalars(stmt).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    return {
+        "entries": entries,
+        "next_before": entries[-1].id if has_more else None,
+        "has_more": has_more,
+    }
@@ -0,0 +1,36 @@
+from app.schemas.batch import BatchStatus
+from app.core.tracing import traced
+
+# Upper bound for ids per batch lookup, keeps the IN (...) list reasonable
+MAX_BATCH_IDS = 100
+
+
+@traced()
+def resolve_batch(ids: list[int], rows, owner_id: int, is_superuser: bool):
+    """
+    Turn the rows of a batch lookup into one result per requested id.
+
+    Args:
+        ids (list[int]): Requested IDs, in request order.
+        rows: Iterable of (object, owning user id) tuples from a single IN query.
+        owner_id (int): ID of the current user.
+        is_superuser (bool): Whether the current user may see every object.
+
+    Returns:
+        List[dict]: One entry per requested ID with id, status and item.
+    """
+    found = {obj.id: (obj, user_id) for obj, user_id in rows}
+
+    results = []
+    for requested_id in ids:
+        if requested_id not in found:
+            results.append({"id": requested_id, "status": BatchStatus.NOT_FOUND, "item": None})
+            continue
+
+        obj, user_id = found[requested_id]
+        if is_superuser or user_id == owner_id:
+            results.append({"id": requested_id, "status": BatchStatus.OK, "item": obj})
+        else:
+            results.append({"id": requested_id, "status": BatchStatus.FORBIDDEN, "item": None})
+
+    return results
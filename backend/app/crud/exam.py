@@ -1,14 +1,27 @@
+from datetime import datetime
+
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core import audit, rls
+from app.core.events import record_change
+from app.core.tracing import traced
+from app.crud import statements
+from app.crud.batch import resolve_batch
+from app.crud.versioning import update_if_version
+from app.database.partitions import school_year_range
+from app.exceptions.concurrency import VersionConflict
+from app.exceptions.exam import ExamNotFound, SubjectAccessDenied
+from app.exceptions.subject import PermissionDenied, SubjectNotFound
 from app.models.exam import Exam
+from app.models.role import Role
 from app.models.subject import Subject
 from app.models.user import User
-from app.models.role import Role
-from app.schemas.exam import ExamCreate, ExamRead, ExamUpdate
-from datetime import datetime
-from app.exceptions.exam import *
-from app.exceptions.subject import *
+from app.schemas.exam import ExamCreate, ExamUpdate
 
 
+@traced()
 def get_exam(db: Session, exam_id: int, owner_id: int):
     """
     Retrieve a single exam by ID if the user has access.
@@ -24,13 +37,13 @@ def get_exam(db: Session, exam_id: int, owner_id: int):
     Returns:
         Exam: The exam object.
     """
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
 
-    # Superuser can access any exam
-    if current_user.role == Role.SUPERUSER:
-        db_exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    # Superuser can access any exam, in RLS mode the policies filter
+    if current_user.role == Role.SUPERUSER or rls.is_active(db):
+        db_exam = db.scalars(statements.EXAM_BY_ID, {"exam_id": exam_id}).first()
     else:
-        db_exam = db.query(Exam).join(Subject).filter(Exam.id == exam_id, Subject.user_id == owner_id).first()
+        db_exam = db.scalars(statements.OWN_EXAM_BY_ID, {"exam_id": exam_id, "owner_id": owner_id}).first()
 
     if not db_exam:
         raise ExamNotFound()
@@ -38,27 +51,57 @@ def get_exam(db: Session, exam_id: int, owner_id: int):
     return db_exam
 
 
-def get_exams(db: Session, owner_id: int):
+@traced()
+def get_exams(db: Session, owner_id: int, school_year: int | None = None):
     """
     Retrieve all exams visible to the current user.
 
     Args:
         db (Session): Database session.
         owner_id (int): ID of the current user.
+        school_year (int | None): Only exams of this school year (named
+            after the year it starts in), read from its partition alone.
+            None returns all years (see app.database.partitions).
 
     Returns:
         List[Exam]: List of exam objects accessible to the user.
     """
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
 
-    # Superuser can access all exams
-    if current_user.role == Role.SUPERUSER:
-        return db.query(Exam).filter(Exam.deleted_at == None).all()
+    params = {}
+    if school_year is not None:
+        params["date_from"], params["date_to"] = school_year_range(school_year)
+
+    # Superuser can access all exams, in RLS mode the policies filter
+    if current_user.role == Role.SUPERUSER or rls.is_active(db):
+        return db.scalars(statements.EXAMS_IN_RANGE if school_year is not None else statements.EXAMS, params).all()
 
     # Others only their own
-    return db.query(Exam).join(Subject).filter(Exam.deleted_at == None, Subject.user_id == owner_id).all()
+    params["owner_id"] = owner_id
+    return db.scalars(statements.OWN_EXAMS_IN_RANGE if school_year is not None else statements.OWN_EXAMS, params).all()
 
 
+@traced()
+def get_exams_by_ids(db: Session, exam_ids: list[int], owner_id: int):
+    """
+    Retrieve several exams by ID with a single query.
+
+    Args:
+        db (Session): Database session.
+        exam_ids (list[int]): IDs of the exams to retrieve.
+        owner_id (int): ID of the current user.
+
+    Returns:
+        List[dict]: One entry per requested ID with id, status and item.
+    """
+    current_user = statements.get_principal(db, owner_id)
+
+    rows = db.execute(statements.EXAMS_BY_IDS, {"exam_ids": exam_ids}).all()
+
+    return resolve_batch(exam_ids, rows, owner_id, current_user.role == Role.SUPERUSER)
+
+
+@traced()
 def create_exam(db: Session, exam_data: ExamCreate, owner_id: int):
     """
     Create a new exam if the user is allowed.
@@ -76,16 +119,16 @@ def create_exam(db: Session, exam_data: ExamCreate, owner_id: int):
     Returns:
         Exam: The created exam object.
     """
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
 
     # Superuser can create exam for any subject
     if current_user.role == Role.SUPERUSER:
-        subject = db.query(Subject).filter(Subject.id == exam_data.subject_id).first()
+        subject = db.scalars(statements.SUBJECT_BY_ID, {"subject_id": exam_data.subject_id}).first()
         if not subject:
             raise SubjectNotFound()
     else:
         # Editor must own the subject
-        subject = db.query(Subject).filter(Subject.id == exam_data.subject_id, Subject.user_id == owner_id).first()
+        subject = db.scalars(statements.OWN_SUBJECT_BY_ID, {"subject_id": exam_data.subject_id, "owner_id": owner_id}).first()
 
         if not subject:
             raise SubjectAccessDenied()
@@ -102,55 +145,107 @@ def create_exam(db: Session, exam_data: ExamCreate, owner_id: int):
     )
 
     db.add(new_exam)
+    db.flush()
+    record_change(db, "exam", new_exam.id, "created", subject.user_id)
+    audit.record(db, owner_id, "exam", new_exam.id, "created", new=audit.snapshot(new_exam))
     db.commit()
     db.refresh(new_exam)
 
     return new_exam
 
 
-def update_exam(db: Session, exam_id: int, exam_data: ExamUpdate, owner_id: int):
+@traced()
+def update_exam(db: Session, exam_id: int, exam_data: ExamUpdate, owner_id: int, expected_version: int | None = None):
     """
     Update an existing exam if the user has permission.
 
+    With ``expected_version`` (If-Match) the exam is updated by a single
+    conditional UPDATE, without loading it first.
+
     Args:
         db (Session): Database session.
         exam_id (int): ID of the exam to update.
         exam_data (ExamUpdate): New data for the exam.
         owner_id (int): ID of the current user.
+        expected_version (int | None): Version the client last read.
 
     Raises:
         ExamNotFound: If the exam does not exist.
         SubjectAccessDenied: If the user does not own the subject.
         PermissionDenied: If the user is not an editor or superuser.
+        VersionConflict: If the exam was changed in the meantime.
 
     Returns:
         Exam: The updated exam object.
     """
+    current_user = statements.get_principal(db, owner_id)
+
+    if expected_version is not None and current_user.role in [Role.SUPERUSER, Role.EDITOR]:
+        return _update_exam_if_version(db, exam_id, exam_data, current_user, expected_version)
+
+    db_exam = _get_exam_for_write(db, exam_id, current_user)
+
+    old = audit.snapshot(db_exam)
+    update_data = exam_data.dict(exclude_unset=True)
+    for key, val in update_data.items():
+        setattr(db_exam, key, val)
+
+    record_change(db, "exam", db_exam.id, "updated", db_exam.subject.user_id)
+    audit.record(db, owner_id, "exam", db_exam.id, "updated", old, audit.snapshot(db_exam))
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise VersionConflict()
+    db.refresh(db_exam)
+
+    return db_exam
+
+
+def _get_exam_for_write(db: Session, exam_id: int, current_user: User):
     # Get the exam to update
-    db_exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    db_exam = db.scalars(statements.EXAM_BY_ID, {"exam_id": exam_id}).first()
     if not db_exam:
         raise ExamNotFound()
 
-    current_user = db.query(User).filter(User.id == owner_id).first()
-
     # Check permissions
     if current_user.role != Role.SUPERUSER:
-        subject = db.query(Subject).filter(Subject.id == db_exam.subject_id).first()
-        if not subject or subject.user_id != owner_id:
+        subject = db.scalars(statements.SUBJECT_BY_ID, {"subject_id": db_exam.subject_id}).first()
+        if not subject or subject.user_id != current_user.id:
             raise SubjectAccessDenied()
         if current_user.role != Role.EDITOR:
             raise PermissionDenied()
 
-    update_data = exam_data.dict(exclude_unset=True)
-    for key, val in update_data.items():
-        setattr(db_exam, key, val)
+    return db_exam
+
 
+def _update_exam_if_version(db: Session, exam_id: int, exam_data: ExamUpdate, current_user: User, expected_version: int):
+    # Editors only match exams of their own subjects
+    criteria = []
+    if current_user.role != Role.SUPERUSER:
+        criteria.append(Exam.subject_id.in_(select(Subject.id).where(Subject.user_id == current_user.id)))
+    subject_owner = select(Subject.user_id).where(Subject.id == Exam.subject_id).scalar_subquery()
+
+    values = exam_data.dict(exclude_unset=True)
+    row = update_if_version(db, Exam, exam_id, expected_version, values, *criteria, returning=(subject_owner,))
+
+    if row is None:
+        # Only the failure path looks at the row to tell why
+        db.rollback()
+        _get_exam_for_write(db, exam_id, current_user)
+        raise VersionConflict()
+
+    db_exam, owner = row
+    record_change(db, "exam", db_exam.id, "updated", owner)
+    audit.record(db, current_user.id, "exam", db_exam.id, "updated", new=audit.snapshot(db_exam, values))
+    # Keep the RETURNING values, the commit would expire them
+    db.expunge(db_exam)
     db.commit()
-    db.refresh(db_exam)
 
     return db_exam
 
 
+@traced()
 def delete_exam(db: Session, exam_id: int, owner_id: int):
     """
     Soft-delete an exam if the user has permission.
@@ -168,22 +263,25 @@ def delete_exam(db: Session, exam_id: int, owner_id: int):
     Returns:
         bool: True if deletion was successful.
     """
-    db_exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    db_exam = db.scalars(statements.EXAM_BY_ID, {"exam_id": exam_id}).first()
     if not db_exam:
         raise ExamNotFound()
 
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
 
     # Check permissions
     if current_user.role != Role.SUPERUSER:
-        subject = db.query(Subject).filter(Subject.id == db_exam.subject_id).first()
+        subject = db.scalars(statements.SUBJECT_BY_ID, {"subject_id": db_exam.subject_id}).first()
         if not subject or subject.user_id != owner_id:
             raise SubjectAccessDenied()
         if current_user.role != Role.EDITOR:
             raise PermissionDenied()
 
+    old = audit.snapshot(db_exam)
     db_exam.deleted_at = datetime.utcnow()
+    record_change(db, "exam", db_exam.id, "deleted", db_exam.subject.user_id)
+    audit.record(db, owner_id, "exam", db_exam.id, "deleted", old, audit.snapshot(db_exam))
     db.commit()
     db.refresh(db_exam)
 
-    return True
\ No newline at end of file
+    return True
@@ -1,14 +1,24 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from app.models.grade import Grade
 from app.schemas.grade import GradeCreate, GradeUpdate
 from app.exceptions.grade import *
 from app.exceptions.subject import *
 from app.exceptions.exam import *
-from app.models.user import User
+from app.exceptions.concurrency import *
 from app.models.role import Role
 from app.models.subject import Subject
 from app.models.exam import Exam
-
+from app.crud.batch import resolve_batch
+from app.crud.versioning import update_if_version
+from app.core.events import record_change
+from app.core import audit, rls
+from app.core.tracing import traced
+from app.crud import statements
+from app.database.partitions import school_year_range
+
+@traced()
 def get_grade(db: Session, grade_id: int, owner_id: int):
     """
     Retrieve a grade by ID if the user has access.
@@ -26,10 +36,10 @@ def get_grade(db: Session, grade_id: int, owner_id: int):
     Returns:
         Grade: The grade object.
     """
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
 
     # Get the grade
-    grade = db.query(Grade).filter(Grade.id == grade_id).first()
+    grade = db.scalars(statements.GRADE_BY_ID, {"grade_id": grade_id}).first()
     if not grade:
         raise GradeNotFound()
 
@@ -38,25 +48,29 @@ def get_grade(db: Session, grade_id: int, owner_id: int):
         return grade
 
     # Get the exam
-    exam = db.query(Exam).filter(Exam.id == grade.exam_id).first()
+    exam = db.scalars(statements.EXAM_BY_ID, {"exam_id": grade.exam_id}).first()
     if not exam:
         raise ExamNotFound()
 
     # Get the subject
-    subject = db.query(Subject).filter(Subject.id == exam.subject_id).first()
+    subject = db.scalars(statements.SUBJECT_BY_ID, {"subject_id": exam.subject_id}).first()
     if not subject or subject.user_id != owner_id:
         raise SubjectAccessDenied()
 
     return grade
 
 
-def get_grades(db: Session, owner_id: int):
+@traced()
+def get_grades(db: Session, owner_id: int, school_year: int | None = None):
     """
     Retrieve all grades visible to the user.
 
     Args:
         db (Session): Database session.
         owner_id (int): ID of the current user.
+        school_year (int | None): Only grades of exams in this school year,
+            read from its partitions alone. None returns all years
+            (see app.database.partitions).
 
     Raises:
         PermissionDenied: If the user is not authenticated.
@@ -64,14 +78,41 @@ def get_grades(db: Session, owner_id: int):
     Returns:
         List[Grade]: List of grades accessible to the user.
     """
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
 
-    if current_user.role == Role.SUPERUSER:
-        return db.query(Grade).all()
+    params = {}
+    if school_year is not None:
+        params["date_from"], params["date_to"] = school_year_range(school_year)
+
+    # In RLS mode the policies filter, no joins needed
+    if current_user.role == Role.SUPERUSER or rls.is_active(db):
+        return db.scalars(statements.GRADES_IN_RANGE if school_year is not None else statements.GRADES, params).all()
+
+    params["owner_id"] = owner_id
+    return db.scalars(statements.OWN_GRADES_IN_RANGE if school_year is not None else statements.OWN_GRADES, params).all()
+
+
+@traced()
+def get_grades_by_ids(db: Session, grade_ids: list[int], owner_id: int):
+    """
+    Retrieve several grades by ID with a single query.
+
+    Args:
+        db (Session): Database session.
+        grade_ids (list[int]): IDs of the grades to retrieve.
+        owner_id (int): ID of the current user.
+
+    Returns:
+        List[dict]: One entry per requested ID with id, status and item.
+    """
+    current_user = statements.get_principal(db, owner_id)
 
-    return db.query(Grade).join(Exam).join(Subject).filter(Subject.user_id == owner_id).all()
+    rows = db.execute(statements.GRADES_BY_IDS, {"grade_ids": grade_ids}).all()
 
+    return resolve_batch(grade_ids, rows, owner_id, current_user.role == Role.SUPERUSER)
 
+
+@traced()
 def create_grade(db: Session, grade_data: GradeCreate, owner_id: int):
     """
     Create a new grade if the user has permission.
@@ -91,17 +132,17 @@ def create_grade(db: Session, grade_data: GradeCreate, owner_id: int):
     Returns:
         Grade: The created grade object.
     """
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
     if not current_user or current_user.role not in [Role.SUPERUSER, Role.EDITOR]:
         raise PermissionDenied()
 
     # Get the related exam
-    exam = db.query(Exam).filter(Exam.id == grade_data.exam_id).first()
+    exam = db.scalars(statements.EXAM_BY_ID, {"exam_id": grade_data.exam_id}).first()
     if not exam:
         raise ExamNotFound()
 
     # Get the subject from the exam
-    subject = db.query(Subject).filter(Subject.id == exam.subject_id).first()
+    subject = db.scalars(statements.SUBJECT_BY_ID, {"subject_id": exam.subject_id}).first()
     if not subject:
         raise SubjectNotFound()
 
@@ -109,60 +150,113 @@ def create_grade(db: Session, grade_data: GradeCreate, owner_id: int):
         raise SubjectAccessDenied()
 
     try:
-        db_grade = Grade(**grade_data.dict())
+        db_grade = Grade(**grade_data.dict(), exam_date=exam.date)
     except Exception:
         raise InvalidGradeData()
 
     db.add(db_grade)
+    db.flush()
+    record_change(db, "grade", db_grade.id, "created", subject.user_id)
+    audit.record(db, owner_id, "grade", db_grade.id, "created", new=audit.snapshot(db_grade))
     db.commit()
     db.refresh(db_grade)
 
     return db_grade
 
 
-def update_grade(db: Session, grade_id: int, grade_update: GradeUpdate, owner_id: int):
+@traced()
+def update_grade(db: Session, grade_id: int, grade_update: GradeUpdate, owner_id: int, expected_version: int | None = None):
     """
     Update an existing grade if the user has permission.
 
+    With ``expected_version`` (If-Match) the grade is updated by a single
+    conditional UPDATE, without loading it first.
+
     Args:
         db (Session): Database session.
         grade_id (int): ID of the grade to update.
         grade_update (GradeUpdate): New data for the grade.
         owner_id (int): ID of the current user.
+        expected_version (int | None): Version the client last read.
 
     Raises:
         GradeNotFound: If the grade does not exist.
         ExamNotFound: If the related exam does not exist.
         SubjectAccessDenied: If the user does not own the subject.
         PermissionDenied: If the user is not an editor or superuser.
+        VersionConflict: If the grade was changed in the meantime.
 
     Returns:
         Grade: The updated grade object.
     """
+    if expected_version is not None:
+        return _update_grade_if_version(db, grade_id, grade_update, owner_id, expected_version)
+
+    db_grade, subject = _get_grade_for_write(db, grade_id, owner_id)
+
+    old = audit.snapshot(db_grade)
+    for key, val in grade_update.dict(exclude_unset=True).items():
+        setattr(db_grade, key, val)
+
+    record_change(db, "grade", db_grade.id, "updated", subject.user_id)
+    audit.record(db, owner_id, "grade", db_grade.id, "updated", old, audit.snapshot(db_grade))
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise VersionConflict()
+    db.refresh(db_grade)
+
+    return db_grade
+
+
+def _get_grade_for_write(db: Session, grade_id: int, owner_id: int):
     db_grade = get_grade(db, grade_id, owner_id)
 
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
     if not current_user or current_user.role not in [Role.SUPERUSER, Role.EDITOR]:
         raise PermissionDenied()
 
     # Get the exam and subject
-    exam = db.query(Exam).filter(Exam.id == db_grade.exam_id).first()
+    exam = db.scalars(statements.EXAM_BY_ID, {"exam_id": db_grade.exam_id}).first()
     if not exam:
         raise ExamNotFound()
 
-    subject = db.query(Subject).filter(Subject.id == exam.subject_id).first()
+    subject = db.scalars(statements.SUBJECT_BY_ID, {"subject_id": exam.subject_id}).first()
     if not subject or subject.user_id != owner_id:
         raise SubjectAccessDenied()
 
-    for key, val in grade_update.dict(exclude_unset=True).items():
-        setattr(db_grade, key, val)
+    return db_grade, subject
+
 
+def _update_grade_if_version(db: Session, grade_id: int, grade_update: GradeUpdate, owner_id: int, expected_version: int):
+    current_user = statements.get_principal(db, owner_id)
+    if not current_user or current_user.role not in [Role.SUPERUSER, Role.EDITOR]:
+        # Same errors (and their order) as the regular path
+        _get_grade_for_write(db, grade_id, owner_id)
+
+    # Grades can only be changed by the owner of the subject
+    owned_exams = select(Exam.id).join(Subject).where(Subject.user_id == owner_id)
+    values = grade_update.dict(exclude_unset=True)
+    row = update_if_version(db, Grade, grade_id, expected_version, values, Grade.exam_id.in_(owned_exams))
+
+    if row is None:
+        # Only the failure path looks at the row to tell why
+        db.rollback()
+        _get_grade_for_write(db, grade_id, owner_id)
+        raise VersionConflict()
+
+    db_grade = row[0]
+    record_change(db, "grade", db_grade.id, "updated", owner_id)
+    audit.record(db, owner_id, "grade", db_grade.id, "updated", new=audit.snapshot(db_grade, values))
+    # Keep the RETURNING values, the commit would expire them
+    db.expunge(db_grade)
     db.commit()
-    db.refresh(db_grade)
 
     return db_grade
 
 
+@traced()
 def delete_grade(db: Session, grade_id: int, owner_id: int):
     """
     Delete a grade if the user has permission.
@@ -183,19 +277,21 @@ def delete_grade(db: Session, grade_id: int, owner_id: int):
     """
     db_grade = get_grade(db, grade_id, owner_id)
 
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
     if not current_user or current_user.role not in [Role.SUPERUSER, Role.EDITOR]:
         raise PermissionDenied()
 
-    exam = db.query(Exam).filter(Exam.id == db_grade.exam_id).first()
+    exam = db.scalars(statements.EXAM_BY_ID, {"exam_id": db_grade.exam_id}).first()
     if not exam:
         raise ExamNotFound()
 
-    subject = db.query(Subject).filter(Subject.id == exam.subject_id).first()
+    subject = db.scalars(statements.SUBJECT_BY_ID, {"subject_id": exam.subject_id}).first()
     if not subject or subject.user_id != owner_id:
         raise SubjectAccessDenied()
 
     db.delete(db_grade)
+    record_change(db, "grade", db_grade.id, "deleted", subject.user_id)
+    audit.record(db, owner_id, "grade", db_grade.id, "deleted", old=audit.snapshot(db_grade))
     db.commit()
 
     return True
\ No newline at end of file
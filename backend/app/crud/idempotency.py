@@ -0,0 +1,109 @@
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.idempotency import IdempotencyKey
+from app.exceptions.idempotency import *
+from app.core.tracing import traced
+
+
+@traced()
+def get_idempotency_key(db: Session, user_id: int, key: str):
+    """
+    Retrieve an unexpired idempotency key of a user.
+
+    Args:
+        db (Session): Database session.
+        user_id (int): ID of the user who sent the key.
+        key (str): Value of the Idempotency-Key header.
+
+    Returns:
+        IdempotencyKey | None: The stored key, or None if unknown or expired.
+    """
+    return db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.expires_at > datetime.utcnow(),
+    ).first()
+
+
+@traced()
+def claim_idempotency_key(db: Session, user_id: int, key: str, fingerprint: str, expires_at: datetime):
+    """
+    Claim a key for a request that is about to run.
+
+    Args:
+        db (Session): Database session.
+        user_id (int): ID of the user who sent the key.
+        key (str): Value of the Idempotency-Key header.
+        fingerprint (str): Fingerprint of the request.
+        expires_at (datetime): When the claim lapses if the request never completes.
+
+    Raises:
+        IdempotencyKeyInProgress: If a concurrent request claimed the key first.
+    """
+    # An expired key, or the lapsed claim of a crashed request, may be claimed again
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.expires_at <= datetime.utcnow(),
+    ).delete(synchronize_session=False)
+    db.add(IdempotencyKey(user_id=user_id, key=key, fingerprint=fingerprint, expires_at=expires_at))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise IdempotencyKeyInProgress()
+
+
+@traced()
+def complete_idempotency_key(db: Session, user_id: int, key: str, status_code: int, response: str, expires_at: datetime):
+    """
+    Store the response of a claimed key.
+
+    Args:
+        db (Session): Database session.
+        user_id (int): ID of the user who sent the key.
+        key (str): Value of the Idempotency-Key header.
+        status_code (int): HTTP status of the response.
+        response (str): JSON body of the response.
+        expires_at (datetime): When the key may be reused, replaces the claim's lease.
+    """
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id, IdempotencyKey.key == key
+    ).update(
+        {"status_code": status_code, "response": response, "expires_at": expires_at}, synchronize_session=False
+    )
+    db.commit()
+
+
+@traced()
+def release_idempotency_key(db: Session, user_id: int, key: str):
+    """
+    Drop the claim of a request that failed, so it can be retried.
+
+    Args:
+        db (Session): Database session.
+        user_id (int): ID of the user who sent the key.
+        key (str): Value of the Idempotency-Key header.
+    """
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.status_code == None,
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+@traced()
+def purge_expired_idempotency_keys(db: Session) -> int:
+    """
+    Delete expired idempotency keys.
+
+    Returns:
+        int: Number of deleted rows.
+    """
+    deleted = db.query(IdempotencyKey).filter(
+        IdempotencyKey.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -0,0 +1,154 @@
+import re
+
+from sqlalchemy import bindparam, column, func, literal, literal_column, or_, select, table, union_all
+from sqlalchemy.orm import Session
+
+from app.core import rls
+from app.models.exam import Exam
+from app.models.role import Role
+from app.models.search import TS_CONFIG
+from app.models.subject import Subject
+from app.core.tracing import traced
+from app.crud import statements
+
+# Only word characters are kept, so the terms can be safely embedded in
+# tsquery / FTS5 match expressions.
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _terms(query: str) -> list[str]:
+    return [term.lower() for term in _TERM_PATTERN.findall(query)]
+
+
+def _document(*columns):
+    """
+    Build the concatenated search document for the given columns.
+
+    Mirrors SUBJECT_DOCUMENT / EXAM_DOCUMENT in app.models.search so the
+    Postgres expression indexes can be used.
+    """
+    parts = [func.coalesce(col, literal_column("''")) for col in columns]
+    document = parts[0]
+    for part in parts[1:]:
+        document = document.op("||")(literal_column("' '")).op("||")(part)
+    return document
+
+
+def _postgres_queries(terms: list[str]):
+    ts_config = literal_column(f"'{TS_CONFIG}'")
+    tsquery = func.to_tsquery(ts_config, bindparam("tsquery"))
+    fuzzy = bindparam("fuzzy")
+
+    subject_document = _document(Subject.name, Subject.description, Subject.teacher_name)
+    subject_vector = func.to_tsvector(ts_config, subject_document)
+    subjects = select(
+        literal("subject").label("entity"),
+        Subject.id.label("id"),
+        Subject.id.label("subject_id"),
+        Subject.name.label("title"),
+        (func.ts_rank(subject_vector, tsquery) + func.word_similarity(fuzzy, subject_document)).label("score"),
+    ).where(
+        Subject.deleted_at == None,
+        or_(subject_vector.op("@@")(tsquery), fuzzy.op("<%")(subject_document)),
+    )
+
+    exam_document = _document(Exam.title)
+    exam_vector = func.to_tsvector(ts_config, exam_document)
+    exams = select(
+        literal("exam").label("entity"),
+        Exam.id.label("id"),
+        Exam.subject_id.label("subject_id"),
+        Exam.title.label("title"),
+        (func.ts_rank(exam_vector, tsquery) + func.word_similarity(fuzzy, exam_document)).label("score"),
+    ).join(Subject).where(
+        Exam.deleted_at == None,
+        Subject.deleted_at == None,
+        or_(exam_vector.op("@@")(tsquery), fuzzy.op("<%")(exam_document)),
+    )
+
+    params = {
+        "tsquery": " | ".join(f"{term}:*" for term in terms),
+        "fuzzy": " ".join(terms),
+    }
+    return subjects, exams, params
+
+
+def _sqlite_queries(terms: list[str]):
+    subjects_fts = table("subjects_fts", column("rowid"))
+    exams_fts = table("exams_fts", column("rowid"))
+    match = bindparam("match")
+
+    # bm25() is lower-is-better, negate it so both backends rank descending
+    subjects = select(
+        literal("subject").label("entity"),
+        Subject.id.label("id"),
+        Subject.id.label("subject_id"),
+        Subject.name.label("title"),
+        (-func.bm25(literal_column("subjects_fts"))).label("score"),
+    ).select_from(
+        subjects_fts.join(Subject, Subject.id == subjects_fts.c.rowid)
+    ).where(
+        literal_column("subjects_fts").op("MATCH")(match),
+        Subject.deleted_at == None,
+    )
+
+    exams = select(
+        literal("exam").label("entity"),
+        Exam.id.label("id"),
+        Exam.subject_id.label("subject_id"),
+        Exam.title.label("title"),
+        (-func.bm25(literal_column("exams_fts"))).label("score"),
+    ).select_from(
+        exams_fts.join(Exam, Exam.id == exams_fts.c.rowid).join(Subject, Subject.id == Exam.subject_id)
+    ).where(
+        literal_column("exams_fts").op("MATCH")(match),
+        Exam.deleted_at == None,
+        Subject.deleted_at == None,
+    )
+
+    params = {"match": " OR ".join(f'"{term}"*' for term in terms)}
+    return subjects, exams, params
+
+
+@traced()
+def search(db: Session, query: str, owner_id: int, limit: int = 20, offset: int = 0):
+    """
+    Search subjects (name, description, teacher) and exams (title).
+
+    Uses tsvector/pg_trgm expression indexes on Postgres and FTS5 tables on
+    SQLite. Ownership is filtered in SQL, hits are ranked by relevance.
+
+    Args:
+        db (Session): Database session.
+        query (str): Free text search query.
+        owner_id (int): ID of the current user.
+        limit (int): Maximum number of hits to return.
+        offset (int): Number of hits to skip.
+
+    Returns:
+        List[Row]: Hits with entity, id, subject_id, title and score.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    current_user = statements.get_principal(db, owner_id)
+
+    if db.get_bind().dialect.name == "postgresql":
+        subjects, exams, params = _postgres_queries(terms)
+    else:
+        subjects, exams, params = _sqlite_queries(terms)
+
+    # Others only see hits from their own subjects (enforced by the policies in RLS mode)
+    if current_user.role != Role.SUPERUSER and not rls.is_active(db):
+        subjects = subjects.where(Subject.user_id == owner_id)
+        exams = exams.where(Subject.user_id == owner_id)
+
+    hits = union_all(subjects, exams).subquery()
+    stmt = (
+        select(hits)
+        .order_by(hits.c.score.desc(), hits.c.entity, hits.c.id)
+        .limit(limit)
+        .offset(offset)
+    )
+    return db.execute(stmt, params).all()
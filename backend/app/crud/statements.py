@@ -0,0 +1,78 @@
+"""
+Statements of the hot crud lookups, built once at import.
+
+A ``db.query(...)`` chain is constructed and gets its cache key generated
+on every call. These selects take their values as bound parameters, so the
+same object is executed every time: its cache key is memoized and the
+compiled form comes straight from the engine's compiled cache. On Postgres,
+psycopg then also prepares them server-side (POSTGRES_PREPARE_THRESHOLD).
+
+Usage:
+    db.scalars(SUBJECT_BY_ID, {"subject_id": subject_id}).first()
+"""
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session, selectinload
+
+from app.models.exam import Exam
+from app.models.grade import Grade
+from app.models.subject import Subject
+from app.models.user import User
+
+USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+# Login, and access tokens issued before refresh tokens existed
+USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+USERS = select(User)
+
+
+def get_principal(db: Session, user_id: int):
+    """
+    The user a crud function acts for, for its id and role.
+
+    Requests carry the principal of their access token on the session (see
+    app.api.deps.get_current_user), which needs no lookup; other callers
+    get the user loaded with USER_BY_ID.
+    """
+    principal = db.info.get("principal")
+    if principal is not None and principal.id == user_id:
+        return principal
+    return db.scalars(USER_BY_ID, {"user_id": user_id}).first()
+
+
+SUBJECT_BY_ID = select(Subject).where(Subject.id == bindparam("subject_id"))
+OWN_SUBJECT_BY_ID = SUBJECT_BY_ID.where(Subject.user_id == bindparam("owner_id"))
+SUBJECTS = select(Subject).where(Subject.deleted_at == None)
+OWN_SUBJECTS = SUBJECTS.where(Subject.user_id == bindparam("owner_id"))
+SUBJECTS_BY_IDS = select(Subject, Subject.user_id).where(Subject.id.in_(bindparam("subject_ids", expanding=True)))
+
+# One SELECT per level (subjects, exams, grades) regardless of row count
+_FULL_TREE = selectinload(Subject.exam.and_(Exam.deleted_at == None)).selectinload(Exam.grades)
+SUBJECT_FULL_BY_ID = SUBJECT_BY_ID.options(_FULL_TREE)
+OWN_SUBJECT_FULL_BY_ID = OWN_SUBJECT_BY_ID.options(_FULL_TREE)
+SUBJECTS_FULL = SUBJECTS.options(_FULL_TREE)
+OWN_SUBJECTS_FULL = OWN_SUBJECTS.options(_FULL_TREE)
+
+EXAM_BY_ID = select(Exam).where(Exam.id == bindparam("exam_id"))
+OWN_EXAM_BY_ID = EXAM_BY_ID.join(Subject).where(Subject.user_id == bindparam("owner_id"))
+EXAMS = select(Exam).where(Exam.deleted_at == None)
+OWN_EXAMS = EXAMS.join(Subject).where(Subject.user_id == bindparam("owner_id"))
+# Filtering on the partition key itself lets Postgres skip the partitions of
+# other school years, also for the generic plans of prepared statements
+_EXAM_IN_RANGE = (Exam.date >= bindparam("date_from"), Exam.date < bindparam("date_to"))
+EXAMS_IN_RANGE = EXAMS.where(*_EXAM_IN_RANGE)
+OWN_EXAMS_IN_RANGE = OWN_EXAMS.where(*_EXAM_IN_RANGE)
+EXAMS_BY_IDS = (
+    select(Exam, Subject.user_id).select_from(Exam).join(Subject)
+    .where(Exam.id.in_(bindparam("exam_ids", expanding=True)))
+)
+
+GRADE_BY_ID = select(Grade).where(Grade.id == bindparam("grade_id"))
+GRADES = select(Grade)
+OWN_GRADES = GRADES.join(Exam).join(Subject).where(Subject.user_id == bindparam("owner_id"))
+# The range is repeated on exam_date to prune the grades' partitions as well
+_GRADE_IN_RANGE = (Grade.exam_date >= bindparam("date_from"), Grade.exam_date < bindparam("date_to"))
+GRADES_IN_RANGE = GRADES.where(*_GRADE_IN_RANGE)
+OWN_GRADES_IN_RANGE = OWN_GRADES.where(*_GRADE_IN_RANGE, *_EXAM_IN_RANGE)
+GRADES_BY_IDS = (
+    select(Grade, Subject.user_id).select_from(Grade).join(Exam).join(Subject)
+    .where(Grade.id.in_(bindparam("grade_ids", expanding=True)))
+)
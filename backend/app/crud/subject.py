@@ -1,11 +1,29 @@
-from app.models.subject import Subject
-from app.schemas.subject import SubjectBase, SubjectCreate, SubjectUpdate
 from datetime import datetime
+
 from sqlalchemy.orm import Session
-from app.models.user import User
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core import audit, rls
+from app.core.events import record_change
+from app.core.tracing import traced
+from app.crud import statements
+from app.crud.batch import resolve_batch
+from app.crud.versioning import update_if_version
+from app.database.shards import DEFAULT_SHARD, shard_router
+from app.exceptions.concurrency import VersionConflict
+from app.exceptions.subject import (
+    InvalidSubjectOwner,
+    PermissionDenied,
+    SubjectAlreadyDeleted,
+    SubjectNotFound,
+)
+from app.exceptions.tenant import WrongShard
 from app.models.role import Role
-from app.exceptions.subject import *
+from app.models.subject import Subject
+from app.schemas.subject import SubjectCreate, SubjectUpdate
+
 
+@traced()
 def get_subject(db: Session, subject_id: int, owner_id: int):
     """
     Retrieve a subject by ID if the user has access.
@@ -21,13 +39,13 @@ def get_subject(db: Session, subject_id: int, owner_id: int):
     Returns:
         Subject: The subject object.
     """
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
 
-    # Superuser can access any subject
-    if current_user.role == Role.SUPERUSER:
-        subject = db.query(Subject).filter(Subject.id == subject_id).first()
+    # Superuser can access any subject, in RLS mode the policies filter
+    if current_user.role == Role.SUPERUSER or rls.is_active(db):
+        subject = db.scalars(statements.SUBJECT_BY_ID, {"subject_id": subject_id}).first()
     else:
-        subject = db.query(Subject).filter(Subject.id == subject_id, Subject.user_id == owner_id).first()
+        subject = db.scalars(statements.OWN_SUBJECT_BY_ID, {"subject_id": subject_id, "owner_id": owner_id}).first()
 
     if not subject:
         raise SubjectNotFound()
@@ -35,6 +53,7 @@ def get_subject(db: Session, subject_id: int, owner_id: int):
     return subject
 
 
+@traced()
 def get_subjects(db: Session, owner_id: int):
     """
     Retrieve all subjects visible to the current user.
@@ -49,16 +68,91 @@ def get_subjects(db: Session, owner_id: int):
     Returns:
         List[Subject]: List of subjects accessible to the user.
     """
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
+
+    # Superuser can access all subjects, in RLS mode the policies filter
+    if current_user.role == Role.SUPERUSER or rls.is_active(db):
+        return db.scalars(statements.SUBJECTS).all()
+
+    # Others see only their own subjects
+    return db.scalars(statements.OWN_SUBJECTS, {"owner_id": owner_id}).all()
+
+
+@traced()
+def get_subjects_by_ids(db: Session, subject_ids: list[int], owner_id: int):
+    """
+    Retrieve several subjects by ID with a single query.
+
+    Args:
+        db (Session): Database session.
+        subject_ids (list[int]): IDs of the subjects to retrieve.
+        owner_id (int): ID of the current user.
+
+    Returns:
+        List[dict]: One entry per requested ID with id, status and item.
+    """
+    current_user = statements.get_principal(db, owner_id)
+
+    rows = db.execute(statements.SUBJECTS_BY_IDS, {"subject_ids": subject_ids}).all()
+
+    return resolve_batch(subject_ids, rows, owner_id, current_user.role == Role.SUPERUSER)
+
+
+@traced()
+def get_subject_full(db: Session, subject_id: int, owner_id: int):
+    """
+    Retrieve a subject together with its exams and their grades.
+
+    The whole tree is loaded eagerly with a fixed number of queries.
+
+    Args:
+        db (Session): Database session.
+        subject_id (int): ID of the subject to retrieve.
+        owner_id (int): ID of the current user.
+
+    Raises:
+        SubjectNotFound: If the subject does not exist or access is denied.
+
+    Returns:
+        Subject: The subject object with exams and grades loaded.
+    """
+    current_user = statements.get_principal(db, owner_id)
+
+    # Others only their own
+    if current_user.role != Role.SUPERUSER and not rls.is_active(db):
+        subject = db.scalars(
+            statements.OWN_SUBJECT_FULL_BY_ID, {"subject_id": subject_id, "owner_id": owner_id}
+        ).first()
+    else:
+        subject = db.scalars(statements.SUBJECT_FULL_BY_ID, {"subject_id": subject_id}).first()
+    if not subject:
+        raise SubjectNotFound()
+
+    return subject
+
+
+@traced()
+def get_subjects_full(db: Session, owner_id: int):
+    """
+    Retrieve all visible subjects together with their exams and grades.
+
+    Args:
+        db (Session): Database session.
+        owner_id (int): ID of the current user.
 
-    # Superuser can access all subjects
-    if current_user.role == Role.SUPERUSER:
-        return db.query(Subject).filter(Subject.deleted_at == None).all()
+    Returns:
+        List[Subject]: Subjects with exams and grades loaded.
+    """
+    current_user = statements.get_principal(db, owner_id)
 
     # Others see only their own subjects
-    return db.query(Subject).filter(Subject.deleted_at == None, Subject.user_id == owner_id).all()
+    if current_user.role != Role.SUPERUSER and not rls.is_active(db):
+        return db.scalars(statements.OWN_SUBJECTS_FULL, {"owner_id": owner_id}).all()
+
+    return db.scalars(statements.SUBJECTS_FULL).all()
 
 
+@traced()
 def create_subject(db: Session, subject_data: SubjectCreate, owner_id: int):
     """
     Create a new subject if the user is allowed.
@@ -71,11 +165,12 @@ def create_subject(db: Session, subject_data: SubjectCreate, owner_id: int):
     Raises:
         PermissionDenied: If the user is not an editor or superuser.
         InvalidSubjectOwner: If an editor tries to create a subject for another user.
+        WrongShard: If the user's tenant is on another shard than the session.
 
     Returns:
         Subject: The created subject object.
     """
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
     if not current_user or current_user.role not in [Role.SUPERUSER, Role.EDITOR]:
         raise PermissionDenied()
 
@@ -83,6 +178,12 @@ def create_subject(db: Session, subject_data: SubjectCreate, owner_id: int):
     if current_user.role != Role.SUPERUSER and subject_data.user_id != owner_id:
         raise InvalidSubjectOwner()
 
+    # The subject must live on the shard of its user's tenant
+    if subject_data.user_id != owner_id and shard_router.enabled:
+        user = db.scalars(statements.USER_BY_ID, {"user_id": subject_data.user_id}).first()
+        if user is not None and shard_router.shard_of(user.tenant_id) != db.info.get("shard", DEFAULT_SHARD):
+            raise WrongShard()
+
     db_subject = Subject(
         user_id=subject_data.user_id,
         name=subject_data.name,
@@ -92,50 +193,100 @@ def create_subject(db: Session, subject_data: SubjectCreate, owner_id: int):
     )
 
     db.add(db_subject)
+    db.flush()
+    record_change(db, "subject", db_subject.id, "created", db_subject.user_id)
+    audit.record(db, owner_id, "subject", db_subject.id, "created", new=audit.snapshot(db_subject))
     db.commit()
     db.refresh(db_subject)
 
     return db_subject
 
 
-def update_subject(db: Session, subject_id: int, new_data: SubjectUpdate, owner_id: int):
+@traced()
+def update_subject(db: Session, subject_id: int, new_data: SubjectUpdate, owner_id: int, expected_version: int | None = None):
     """
     Update an existing subject if the user has permission.
 
+    With ``expected_version`` (If-Match) the subject is updated by a single
+    conditional UPDATE, without loading it first.
+
     Args:
         db (Session): Database session.
         subject_id (int): ID of the subject to update.
         new_data (SubjectUpdate): New data for the subject.
         owner_id (int): ID of the current user.
+        expected_version (int | None): Version the client last read.
 
     Raises:
         SubjectNotFound: If the subject does not exist.
         PermissionDenied: If the user is not allowed to update the subject.
+        VersionConflict: If the subject was changed in the meantime.
 
     Returns:
         Subject: The updated subject object.
     """
-    db_subject = db.query(Subject).filter(Subject.id == subject_id).first()
-    
+    if expected_version is not None:
+        return _update_subject_if_version(db, subject_id, new_data, owner_id, expected_version)
+
+    db_subject = db.scalars(statements.SUBJECT_BY_ID, {"subject_id": subject_id}).first()
+
     if not db_subject:
         raise SubjectNotFound()
 
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
     if not current_user or current_user.role not in [Role.SUPERUSER, Role.EDITOR]:
         raise PermissionDenied()
 
     if current_user.role != Role.SUPERUSER and db_subject.user_id != owner_id:
         raise PermissionDenied()
 
+    old = audit.snapshot(db_subject)
     for key, val in new_data.dict(exclude_unset=True).items():
         setattr(db_subject, key, val)
 
-    db.commit()
+    record_change(db, "subject", db_subject.id, "updated", db_subject.user_id)
+    audit.record(db, owner_id, "subject", db_subject.id, "updated", old, audit.snapshot(db_subject))
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise VersionConflict()
     db.refresh(db_subject)
 
     return db_subject
 
 
+def _update_subject_if_version(db: Session, subject_id: int, new_data: SubjectUpdate, owner_id: int, expected_version: int):
+    current_user = statements.get_principal(db, owner_id)
+    if not current_user or current_user.role not in [Role.SUPERUSER, Role.EDITOR]:
+        raise PermissionDenied()
+
+    # Editors only match their own subjects
+    criteria = [] if current_user.role == Role.SUPERUSER else [Subject.user_id == owner_id]
+    values = new_data.dict(exclude_unset=True)
+    row = update_if_version(db, Subject, subject_id, expected_version, values, *criteria)
+
+    if row is None:
+        # Only the failure path looks at the row to tell why
+        db.rollback()
+        db_subject = db.scalars(statements.SUBJECT_BY_ID, {"subject_id": subject_id}).first()
+        if not db_subject:
+            raise SubjectNotFound()
+        if criteria and db_subject.user_id != owner_id:
+            raise PermissionDenied()
+        raise VersionConflict()
+
+    db_subject = row[0]
+    record_change(db, "subject", db_subject.id, "updated", db_subject.user_id)
+    audit.record(db, owner_id, "subject", db_subject.id, "updated", new=audit.snapshot(db_subject, values))
+    # Keep the RETURNING values, the commit would expire them
+    db.expunge(db_subject)
+    db.commit()
+
+    return db_subject
+
+
+@traced()
 def delete_subject(db: Session, subject_id: int, owner_id: int):
     """
     Soft-delete a subject if the user has permission.
@@ -153,15 +304,15 @@ def delete_subject(db: Session, subject_id: int, owner_id: int):
     Returns:
         bool: True if the deletion was successful.
     """
-    db_subject = db.query(Subject).filter(Subject.id == subject_id).first()
-    
+    db_subject = db.scalars(statements.SUBJECT_BY_ID, {"subject_id": subject_id}).first()
+
     if not db_subject:
         raise SubjectNotFound()
 
     if db_subject.deleted_at is not None:
         raise SubjectAlreadyDeleted()
 
-    current_user = db.query(User).filter(User.id == owner_id).first()
+    current_user = statements.get_principal(db, owner_id)
     if not current_user or current_user.role not in [Role.SUPERUSER, Role.EDITOR]:
         raise PermissionDenied()
 
@@ -169,8 +320,11 @@ def delete_subject(db: Session, subject_id: int, owner_id: int):
     if current_user.role != Role.SUPERUSER and db_subject.user_id != owner_id:
         raise PermissionDenied()
 
+    old = audit.snapshot(db_subject)
     db_subject.deleted_at = datetime.utcnow()
+    record_change(db, "subject", db_subject.id, "deleted", db_subject.user_id)
+    audit.record(db, owner_id, "subject", db_subject.id, "deleted", old, audit.snapshot(db_subject))
     db.commit()
     db.refresh(db_subject)
 
-    return True
\ No newline at end of file
+    return True
@@ -0,0 +1,129 @@
+from sqlalchemy import null, select
+from sqlalchemy.orm import Session
+
+from app.core.events import ChangeEvent
+from app.core.tracing import traced
+from app.crud import statements
+from app.models.exam import Exam
+from app.models.grade import Grade
+from app.models.role import Role
+from app.models.subject import Subject
+from app.models.sync import ENTITY_NAMES, Tombstone
+
+
+def _sources(owner_id: int, is_superuser: bool):
+    subjects = select(Subject)
+    exams = select(Exam).join(Subject)
+    grades = select(Grade).join(Exam).join(Subject)
+    tombstones = select(Tombstone)
+
+    # Others only sync their own data
+    if not is_superuser:
+        subjects = subjects.where(Subject.user_id == owner_id)
+        exams = exams.where(Subject.user_id == owner_id)
+        grades = grades.where(Subject.user_id == owner_id)
+        tombstones = tombstones.where(Tombstone.owner_id == owner_id)
+
+    return [(subjects, Subject), (exams, Exam), (grades, Grade), (tombstones, Tombstone)]
+
+
+@traced()
+def get_changes(db: Session, owner_id: int, since: int, limit: int = 500):
+    """
+    Retrieve the rows changed after the change sequence ``since``.
+
+    A page holds about ``limit`` changes; rows sharing the last sequence
+    number are never split across pages.
+
+    Args:
+        db (Session): Database session.
+        owner_id (int): ID of the current user.
+        since (int): Change sequence returned by the previous sync (0 for a full sync).
+        limit (int): Approximate maximum number of changes to return.
+
+    Returns:
+        dict: Changed subjects, exams and grades, deleted rows, next_since and has_more.
+    """
+    current_user = statements.get_principal(db, owner_id)
+    sources = _sources(owner_id, current_user.role == Role.SUPERUSER)
+
+    # First find the sequence range of this page, using only the indexed column
+    seqs = []
+    has_more = False
+    for stmt, model in sources:
+        page = db.execute(
+            stmt.with_only_columns(model.change_seq)
+            .where(model.change_seq > since)
+            .order_by(model.change_seq)
+            .limit(limit)
+        ).scalars().all()
+        seqs.extend(page)
+        has_more = has_more or len(page) == limit
+
+    if not seqs:
+        return {"next_since": since, "has_more": False}
+
+    seqs.sort()
+    has_more = has_more or len(seqs) > limit
+    until = seqs[min(limit, len(seqs)) - 1]
+
+    changes = {"subjects": [], "exams": [], "grades": [], "deleted": [], "next_since": until, "has_more": has_more}
+    for stmt, model in sources:
+        rows = db.execute(
+            stmt.where(model.change_seq > since, model.change_seq <= until).order_by(model.change_seq)
+        ).scalars().all()
+
+        if model is Tombstone:
+            changes["deleted"].extend({"entity": row.entity, "id": row.entity_id} for row in rows)
+            continue
+
+        key = model.__tablename__
+        for row in rows:
+            # Soft-deleted subjects and exams are sent as tombstones
+            if getattr(row, "deleted_at", None) is not None:
+                changes["deleted"].append({"entity": key[:-1], "id": row.id})
+            else:
+                changes[key].append(row)
+
+    return changes
+
+
+@traced()
+def get_change_events(db: Session, owner_id: int, since: int, limit: int) -> list[ChangeEvent] | None:
+    """
+    The changes after the change sequence ``since`` as change feed events, to replay them.
+
+    Each row is replayed with its last operation.
+
+    Args:
+        db (Session): Database session.
+        owner_id (int): ID of the current user.
+        since (int): Change sequence of the last event the client received.
+        limit (int): Most events to replay.
+
+    Returns:
+        list[ChangeEvent] | None: The events ordered by sequence, or None if
+        there are more than ``limit`` and the client must refetch.
+    """
+    current_user = statements.get_principal(db, owner_id)
+    events = []
+    for stmt, model in _sources(owner_id, current_user.role == Role.SUPERUSER):
+        if model is Tombstone:
+            columns = (Tombstone.change_seq, Tombstone.entity, Tombstone.entity_id, Tombstone.owner_id)
+        else:
+            columns = (model.change_seq, model.id, model.version, Subject.user_id, getattr(model, "deleted_at", null()))
+        rows = db.execute(
+            stmt.with_only_columns(*columns).where(model.change_seq > since).order_by(model.change_seq).limit(limit + 1)
+        ).all()
+
+        for row in rows:
+            if model is Tombstone:
+                events.append(ChangeEvent(row[0], row[1], row[2], "deleted", row[3]))
+                continue
+            seq, row_id, version, user_id, deleted_at = row
+            operation = "deleted" if deleted_at is not None else "created" if version == 1 else "updated"
+            events.append(ChangeEvent(seq, ENTITY_NAMES[model], row_id, operation, user_id))
+
+    if len(events) > limit:
+        return None
+    return sorted(events, key=lambda event: event.seq)
@@ -0,0 +1,136 @@
+from collections import Counter
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models.exam import Exam
+from app.models.grade import Grade
+from app.models.role import Role
+from app.models.subject import Subject
+from app.models.tenant import Tenant
+from app.models.user import User
+from app.schemas.tenant import TenantCreate
+from app.exceptions.subject import PermissionDenied
+from app.exceptions.tenant import *
+from app.database.shards import DEFAULT_SHARD, shard_router
+from app.core import audit
+from app.core.tracing import traced
+from app.crud import statements
+
+
+@traced()
+def get_tenant(db: Session, tenant_id: int):
+    """
+    Retrieve a tenant (school) by ID.
+
+    Args:
+        db (Session): Database session.
+        tenant_id (int): ID of the tenant.
+
+    Raises:
+        TenantNotFound: If the tenant does not exist.
+
+    Returns:
+        Tenant: The tenant object.
+    """
+    tenant = db.get(Tenant, tenant_id)
+    if tenant is None:
+        raise TenantNotFound()
+    return tenant
+
+
+@traced()
+def get_tenants(db: Session):
+    """
+    Retrieve all tenants with their shard.
+
+    Args:
+        db (Session): Database session.
+
+    Returns:
+        List[Tenant]: All tenants ordered by ID.
+    """
+    return db.scalars(select(Tenant).order_by(Tenant.id)).all()
+
+
+@traced()
+def create_tenant(db: Session, data: TenantCreate, owner_id: int | None = None):
+    """
+    Create a tenant on the given shard.
+
+    Args:
+        db (Session): Database session.
+        data (TenantCreate): Name and shard of the tenant.
+        owner_id (int | None): ID of the current user.
+
+    Raises:
+        ShardNotFound: If the shard is not configured.
+        TenantAlreadyExists: If the name is taken.
+
+    Returns:
+        Tenant: The created tenant.
+    """
+    if data.shard not in shard_router.names:
+        raise ShardNotFound()
+    if db.scalars(select(Tenant).where(Tenant.name == data.name)).first():
+        raise TenantAlreadyExists()
+
+    tenant = Tenant(name=data.name, shard=data.shard)
+    db.add(tenant)
+    db.flush()
+    audit.record(db, owner_id, "tenant", tenant.id, "created", new=audit.snapshot(tenant))
+    db.commit()
+    db.refresh(tenant)
+    return tenant
+
+
+def _totals_by_owner(db: Session) -> dict[str, Counter]:
+    subjects = select(Subject.user_id, func.count()).where(Subject.deleted_at == None).group_by(Subject.user_id)
+    exams = (
+        select(Subject.user_id, func.count()).select_from(Exam).join(Subject)
+        .where(Exam.deleted_at == None).group_by(Subject.user_id)
+    )
+    grades = select(Subject.user_id, func.count()).select_from(Grade).join(Exam).join(Subject).group_by(Subject.user_id)
+    return {name: Counter(dict(db.execute(stmt).all())) for name, stmt in (("subjects", subjects), ("exams", exams), ("grades", grades))}
+
+
+@traced()
+def get_tenant_report(db: Session, owner_id: int):
+    """
+    Count users, subjects, exams and grades per tenant across all shards.
+
+    Every shard is queried in parallel. Only the rows on a tenant's current
+    shard are counted, so a tenant being moved isn't counted twice.
+
+    Args:
+        db (Session): Database session (of the primary database).
+        owner_id (int): ID of the current user.
+
+    Raises:
+        PermissionDenied: If the user is not a superuser.
+
+    Returns:
+        List[dict]: One entry per tenant, users without a tenant last.
+    """
+    current_user = statements.get_principal(db, owner_id)
+    if current_user.role != Role.SUPERUSER:
+        raise PermissionDenied()
+
+    tenants = {tenant.id: tenant for tenant in get_tenants(db)}
+    owners: dict[int | None, list[int]] = {tenant_id: [] for tenant_id in [*tenants, None]}
+    for user_id, tenant_id in db.execute(select(User.id, User.tenant_id)).all():
+        owners.setdefault(tenant_id, []).append(user_id)
+    totals = shard_router.fan_out(_totals_by_owner, db)
+
+    report = []
+    for tenant_id, user_ids in owners.items():
+        tenant = tenants.get(tenant_id)
+        shard = tenant.shard if tenant is not None else DEFAULT_SHARD
+        counts = totals.get(shard, {})
+        report.append({
+            "tenant_id": tenant_id,
+            "name": tenant.name if tenant is not None else None,
+            "shard": shard,
+            "users": len(user_ids),
+            **{name: sum(counts.get(name, Counter())[user_id] for user_id in user_ids) for name in ("subjects", "exams", "grades")},
+        })
+    return report
@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.tracing import traced
+from app.exceptions.token import TokenAlreadyRevoked
+from app.models.token_revocation import TokenRevocation
+
+
+@traced()
+def revoke_token(db: Session, jti: str, user_id: int, expires_at: datetime | None = None):
+    """
+    Revoke a single token by its ``jti`` claim.
+
+    Args:
+        db (Session): Database session.
+        jti (str): ID of the token to revoke.
+        user_id (int): ID of the token owner.
+        expires_at (datetime | None): When the token expires anyway.
+
+    Raises:
+        TokenAlreadyRevoked: If the token was revoked before, also by a concurrent request.
+    """
+    db.add(TokenRevocation(
+        jti=jti,
+        user_id=user_id,
+        revoked_at=datetime.now(timezone.utc),
+        expires_at=expires_at,
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise TokenAlreadyRevoked()
+
+
+@traced()
+def revoke_user_tokens(db: Session, user_id: int):
+    """
+    Revoke all tokens issued to a user so far, e.g. when the user is deactivated.
+
+    Args:
+        db (Session): Database session.
+        user_id (int): ID of the user.
+    """
+    db.add(TokenRevocation(user_id=user_id, revoked_at=datetime.now(timezone.utc)))
+    db.commit()
+
+
+@traced()
+def is_token_revoked(db: Session, jti: str, user_id: int, issued_at: datetime) -> bool:
+    """
+    Check a token against the revocation table.
+
+    Args:
+        db (Session): Database session.
+        jti (str): ID of the token.
+        user_id (int): ID of the token owner.
+        issued_at (datetime): When the token was issued.
+
+    Returns:
+        bool: True if the token or all tokens of the user issued before it were revoked.
+    """
+    return db.query(TokenRevocation.id).filter(
+        or_(
+            TokenRevocation.jti == jti,
+            TokenRevocation.jti.is_(None)
+            & (TokenRevocation.user_id == user_id)
+            & (TokenRevocation.revoked_at >= issued_at),
+        )
+    ).first() is not None
+
+
+@traced()
+def get_revocations_since(db: Session, since: datetime | None):
+    """
+    Retrieve the revocations made since ``since`` for incremental cache refreshes.
+
+    Args:
+        db (Session): Database session.
+        since (datetime | None): Earliest ``revoked_at`` to return, None for all.
+
+    Returns:
+        List[TokenRevocation]: The revocations ordered by ``revoked_at``.
+    """
+    query = db.query(TokenRevocation)
+    if since is not None:
+        query = query.filter(TokenRevocation.revoked_at >= since)
+    return query.order_by(TokenRevocation.revoked_at).all()
+
+
+@traced()
+def purge_expired_revocations(db: Session) -> int:
+    """
+    Delete revocations of tokens that have expired anyway.
+
+    Returns:
+        int: Number of deleted rows.
+    """
+    deleted = db.query(TokenRevocation).filter(
+        TokenRevocation.expires_at < datetime.now(timezone.utc)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -1,50 +1,119 @@
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.models.user import User
 from app.schemas.user import UserCreate
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash_async, verify_and_update_password
 from datetime import datetime, timezone
 from app.models.role import Role
-def create_user(*, db: Session, user: UserCreate):
+from app.models.tenant import Tenant
+from app.exceptions.tenant import TenantNotFound
+from app.exceptions.user import UserAlreadyDeactivated, UserNotFound
+from app.crud.token import revoke_user_tokens
+from app.core import audit
+from app.core.tracing import traced
+from app.crud import statements
+def _insert_user(db: Session, user: UserCreate, hashed_password: str, role: Role, owner_id: int | None):
+    if user.tenant_id is not None and db.get(Tenant, user.tenant_id) is None:
+        raise TenantNotFound()
     db_user = User(
         username=user.username, 
         email=user.email, 
-        hashed_password=get_password_hash(user.password),
-        role=user.role,
-        created_at=datetime.now(timezone.utc).isoformat()
+        hashed_password=hashed_password,
+        role=role,
+        tenant_id=user.tenant_id,
+        created_at=datetime.now(timezone.utc).replace(tzinfo=None)
     )
     db.add(db_user)
+    db.flush()
+    audit.record(db, owner_id, "user", db_user.id, "created", new=audit.snapshot(db_user))
     db.commit()
     db.refresh(db_user)
     return db_user
 
-def create_superuser(*, db: Session, user: UserCreate):
-    db_user = User(
-        username=user.username, 
-        email=user.email, 
-        hashed_password=get_password_hash(user.password),
-        #is_superuser=True,
-        role = Role.SUPERUSER,
-        created_at=datetime.now(timezone.utc).isoformat()
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+@traced()
+async def create_user(*, db: Session, user: UserCreate, owner_id: int | None = None):
+    """
+    Create a user without blocking the event loop or the threadpool on bcrypt.
+
+    The password is hashed in the password pool.
+
+    Args:
+        owner_id (int | None): ID of the superuser registering the user.
+
+    Raises:
+        TenantNotFound: If ``tenant_id`` is given but doesn't exist.
+    """
+    hashed_password = await get_password_hash_async(user.password)
+    return await run_in_threadpool(_insert_user, db, user, hashed_password, user.role, owner_id)
 
+@traced()
+async def create_superuser(*, db: Session, user: UserCreate):
+    """Create a superuser, audited as the system. The password is hashed in the password pool."""
+    hashed_password = await get_password_hash_async(user.password)
+    return await run_in_threadpool(_insert_user, db, user, hashed_password, Role.SUPERUSER, None)
+
+@traced()
+def deactivate_user(*, db: Session, user_id: int, owner_id: int):
+    """
+    Deactivate a user and revoke all tokens issued to them, in one transaction.
+
+    Args:
+        db (Session): Database session.
+        user_id (int): ID of the user to deactivate.
+        owner_id (int): ID of the superuser deactivating the user.
+
+    Raises:
+        UserNotFound: If the user does not exist.
+        UserAlreadyDeactivated: If the user is inactive already.
+
+    Returns:
+        bool: True if the user was deactivated.
+    """
+    db_user = db.get(User, user_id)
+    if not db_user:
+        raise UserNotFound()
+    if db_user.updated_at: # change to deleted_at
+        raise UserAlreadyDeactivated()
+
+    db_user.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    audit.record(db, owner_id, "user", db_user.id, "updated", new={"updated_at": db_user.updated_at.isoformat()})
+    # Commits the deactivation too
+    revoke_user_tokens(db, db_user.id)
+    return True
+
+@traced()
 def get_user(*, db: Session, user_id: int):
-    return db.query(User).filter(User.id == user_id).first()
+    return db.scalars(statements.USER_BY_ID, {"user_id": user_id}).first()
 
+@traced()
 def get_users(db: Session):
-    return db.query(User).all()
+    return db.scalars(statements.USERS).all()
+
+def _store_rehashed_password(db: Session, db_user: User, hashed_password: str):
+    db_user.hashed_password = hashed_password
+    audit.record(db, db_user.id, "user", db_user.id, "updated", new={"hashed_password": audit.REDACTED})
+    db.commit()
+    db.refresh(db_user)
+
+@traced()
+async def authenticate_user_async(*, db: Session, email: str, password: str):
+    """
+    Authenticate a user without blocking the event loop or the threadpool on bcrypt.
 
-def authenticate_user(*, db: Session, email: str, password: str):
-    db_user = db.query(User).filter(User.email == email).first()
+    The password is verified in the password pool. If the stored hash uses an
+    outdated cost factor it is transparently replaced.
+    """
+    db_user = await run_in_threadpool(get_user_by_email, db=db, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.hashed_password):
+    valid, new_hash = await verify_and_update_password(password, db_user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        await run_in_threadpool(_store_rehashed_password, db, db_user, new_hash)
     return db_user
 
+@traced()
 def get_user_by_email(*, db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+    return db.scalars(statements.USER_BY_EMAIL, {"email": email}).first()
 
@@ -0,0 +1,36 @@
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.models.sync import next_change_seq
+from app.core.tracing import traced
+
+
+@traced()
+def update_if_version(db: Session, model, row_id: int, expected_version: int, values: dict, *criteria, returning=()):
+    """
+    Update a row with a single conditional UPDATE ... RETURNING.
+
+    The row is only changed if it still has ``expected_version`` and matches
+    ``criteria`` (e.g. ownership), so no SELECT is needed beforehand. The
+    version and change sequence are bumped like an ORM flush would.
+
+    Args:
+        db (Session): Database session.
+        model: Mapped class with ``id``, ``version`` and ``change_seq`` columns.
+        row_id (int): ID of the row to update.
+        expected_version (int): Version the client read (If-Match).
+        values (dict): New column values.
+        *criteria: Additional WHERE criteria.
+        returning: Extra column expressions to return with the row.
+
+    Returns:
+        Row | None: The updated object (and ``returning`` values), or None if no
+        row matched. The caller decides why and rolls back.
+    """
+    stmt = (
+        update(model)
+        .where(model.id == row_id, model.version == expected_version, *criteria)
+        .values(**values, version=model.version + 1, change_seq=next_change_seq(db))
+        .returning(model, *returning)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    return db.execute(stmt).first()
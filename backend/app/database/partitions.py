@@ -0,0 +1,234 @@
+"""
+Range partitioning of exams and grades by school year (Postgres only).
+
+``exams`` is partitioned on ``date`` and ``grades`` on ``exam_date``, a copy
+of its exam's date kept in step by the foreign key (ON UPDATE CASCADE), so
+both tables have one partition per school year with the same bounds, e.g.
+``exams_sy2024`` and ``grades_sy2024`` for 2024-08-01 up to 2025-08-01.
+Rows outside all year partitions land in ``exams_default``/``grades_default``.
+
+``maintain`` creates the partitions up to PARTITION_YEARS_AHEAD school
+years in advance and, with PARTITION_RETENTION_YEARS, detaches older years.
+Detached partitions stay as standalone tables to archive or drop, instead
+of running large DELETEs. It runs in init_db and periodically in every
+worker and shard (``start_maintenance``); an advisory lock serializes
+the workers.
+
+Queries only get pruned to the partitions they need when they filter on the
+partition key itself, e.g. ``Exam.date >= start`` rather than on an
+expression such as ``extract(year from date)``. GET /exams and GET /grades
+only prune with ``?school_year=``: without it they keep returning every
+year, as they did before partitioning, since defaulting to the current
+year would silently hide older exams and grades from existing clients.
+"""
+import datetime
+import logging
+import re
+import threading
+
+from sqlalchemy import Connection, Engine, PrimaryKeyConstraint, text
+from sqlalchemy.ext.compiler import compiles
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# In creation order: exams first, grades reference them
+PARTITIONED_TABLES = {"exams": "date", "grades": "exam_date"}
+
+# pg_advisory_xact_lock key of the maintenance run
+_LOCK_KEY = 4_810_048
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_sy(?P<year>\d{4})$")
+
+
+def partitioned_by(column: str) -> dict:
+    """
+    Table options range-partitioning a table on ``column`` on Postgres.
+
+    Used as the last item of ``__table_args__``; other databases get a plain
+    table.
+    """
+    return {"postgresql_partition_by": f"RANGE ({column})", "info": {"partition_key": column}}
+
+
+def not_partitioned(_ddl, _target, _bind, **kw) -> bool:
+    """``ddl_if`` callable for constraints only needed on unpartitioned tables."""
+    return kw["dialect"].name != "postgresql"
+
+
+@compiles(PrimaryKeyConstraint, "postgresql")
+def _primary_key_with_partition_key(constraint, compiler, **kw):
+    # Unique constraints of a partitioned table must contain the partition
+    # key. ids still come from one sequence, so they stay unique, and the
+    # mapper keeps ``id`` alone as the identity.
+    key = constraint.table.info.get("partition_key")
+    if key is None or key in constraint.columns:
+        return compiler.visit_primary_key_constraint(constraint, **kw)
+    columns = ", ".join(compiler.preparer.quote(c.name) for c in [*constraint.columns, constraint.table.c[key]])
+    return (
+        compiler.define_constraint_preamble(constraint, **kw)
+        + f"PRIMARY KEY ({columns})"
+        + compiler.define_constraint_deferrability(constraint)
+    )
+
+
+def school_year(day: datetime.date) -> int:
+    """The school year ``day`` belongs to, named after the year it starts in."""
+    return day.year if day.month >= settings.SCHOOL_YEAR_START_MONTH else day.year - 1
+
+
+def school_year_range(year: int) -> tuple[datetime.datetime, datetime.datetime]:
+    """Start (inclusive) and end (exclusive) of the school year ``year``."""
+    start = datetime.datetime(year, settings.SCHOOL_YEAR_START_MONTH, 1)
+    return start, start.replace(year=year + 1)
+
+
+def partition_name(table: str, year: int) -> str:
+    return f"{table}_sy{year}"
+
+
+def plan(today: datetime.date, attached_years: set[int]) -> tuple[list[int], list[int]]:
+    """
+    School years to create and to detach.
+
+    Returns:
+        tuple[list[int], list[int]]: Missing years from the oldest retained
+        one (or the current one) to PARTITION_YEARS_AHEAD years ahead, and
+        attached years older than PARTITION_RETENTION_YEARS.
+    """
+    current = school_year(today)
+    retention = settings.PARTITION_RETENTION_YEARS
+    first = current - retention + 1 if retention else current
+    create = [year for year in range(first, current + settings.PARTITION_YEARS_AHEAD + 1) if year not in attached_years]
+    detach = sorted(year for year in attached_years if retention and year < first)
+    return create, detach
+
+
+def _is_partitioned(connection: Connection, table: str) -> bool:
+    return connection.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"), {"table": table}
+    ).first() is not None
+
+
+def _attached_years(connection: Connection, table: str) -> set[int]:
+    names = connection.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ),
+        {"table": table},
+    ).scalars()
+    matches = (_PARTITION_NAME.match(name) for name in names)
+    return {int(m["year"]) for m in matches if m and m["table"] == table}
+
+
+def create_partition(connection: Connection, table: str, year: int) -> None:
+    """
+    Add the partition of a school year to ``table``.
+
+    The partition is built as a standalone table, filled with the year's rows
+    from the default partition and then attached, which only takes a SHARE
+    UPDATE EXCLUSIVE lock on the parent (CREATE TABLE ... PARTITION OF would
+    block all reads and writes). Expects the foreign keys to be deferred.
+    """
+    key = PARTITIONED_TABLES[table]
+    name = partition_name(table, year)
+    start, end = (bound.date().isoformat() for bound in school_year_range(year))
+    connection.exec_driver_sql(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    connection.exec_driver_sql(
+        f"WITH moved AS (DELETE FROM {table}_default WHERE {key} >= '{start}' AND {key} < '{end}' RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    )
+    connection.exec_driver_sql(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')")
+
+
+def detach_partition(connection: Connection, table: str, year: int) -> None:
+    """
+    Detach the partition of a school year from ``table``.
+
+    The detached table keeps its rows but no foreign key, so the exams of a
+    year can be detached after their grades.
+    """
+    name = partition_name(table, year)
+    connection.exec_driver_sql(f"ALTER TABLE {table} DETACH PARTITION {name}")
+    connection.exec_driver_sql(f"ALTER TABLE {name} DROP CONSTRAINT IF EXISTS fk_grades_exam")
+
+
+def maintain(connection: Connection, today: datetime.date | None = None) -> tuple[list[int], list[int]]:
+    """
+    Create upcoming and detach expired school year partitions.
+
+    Runs in the connection's transaction. Tables created before partitioning
+    was introduced are left alone.
+
+    Returns:
+        tuple[list[int], list[int]]: The school years created and detached.
+    """
+    if not all(_is_partitioned(connection, table) for table in PARTITIONED_TABLES):
+        logger.warning("exams/grades are not partitioned, skipping partition maintenance")
+        return [], []
+
+    connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+    # Moved exams are referenced by grades still in the default partition
+    connection.exec_driver_sql("SET CONSTRAINTS ALL DEFERRED")
+    for table in PARTITIONED_TABLES:
+        connection.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+
+    create, detach = plan(today or datetime.date.today(), _attached_years(connection, "exams"))
+    for year in create:
+        for table in PARTITIONED_TABLES:
+            create_partition(connection, table, year)
+    for year in detach:
+        for table in reversed(PARTITIONED_TABLES):
+            detach_partition(connection, table, year)
+
+    if create or detach:
+        logger.info("Partitions created for %s, detached for %s", create, detach)
+    return create, detach
+
+
+class PartitionMaintenance:
+    """Runs ``maintain`` every PARTITION_MAINTENANCE_INTERVAL_SECONDS."""
+
+    def __init__(self, engine: Engine, interval: float):
+        self.engine = engine
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="partition-maintenance", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                with self.engine.begin() as connection:
+                    maintain(connection)
+            except Exception:
+                logger.exception("Partition maintenance failed")
+
+
+_maintenance: list[PartitionMaintenance] = []
+
+
+def start_maintenance() -> None:
+    """Start a maintenance thread for every Postgres shard."""
+    from app.database.shards import shard_router
+
+    if _maintenance:
+        return
+    for shard in shard_router.names:
+        engine = shard_router.engine(shard)
+        if engine.dialect.name == "postgresql":
+            _maintenance.append(PartitionMaintenance(engine, settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS))
+    for maintenance in _maintenance:
+        maintenance.start()
+
+
+def stop_maintenance() -> None:
+    while _maintenance:
+        _maintenance.pop().stop()
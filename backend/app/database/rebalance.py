@@ -0,0 +1,215 @@
+"""
+Move a tenant to another shard while it stays online.
+
+1. Copy all rows of the tenant from the source to the target shard, from
+   one snapshot of the source.
+2. Copy what changed meanwhile (by change sequence, grade deletions by
+   tombstone) until the remaining delta is small.
+3. Mark the tenant read-only and wait ``grace`` seconds, so every worker has
+   seen it (SHARD_MAP_REFRESH_SECONDS) and finished its running writes.
+4. Copy the last changes and the idempotency keys, raise the target's change
+   sequence to the source's (delta sync cursors stay valid) and switch the
+   tenant to the target shard.
+5. Wait ``grace`` seconds again for workers still reading from the source,
+   then delete the tenant's rows there.
+
+Writes of the tenant get 503 from step 3 until workers see the switch.
+
+Usage (run from the backend directory):
+    python -m app.database.rebalance 42 shard-2
+    python -m app.database.rebalance 42 default --keep-source
+"""
+import argparse
+import logging
+import time
+
+from sqlalchemy import Connection, Engine, Table, bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core import audit
+from app.core import db as _models  # registers all tables on Base.metadata
+from app.core.config import settings
+from app.database.shards import ShardRouter, shard_router
+from app.exceptions.tenant import TenantNotFound
+from app.models.exam import Exam
+from app.models.grade import Grade
+from app.models.idempotency import IdempotencyKey
+from app.models.subject import Subject
+from app.models.sync import ChangeSequence, Tombstone
+from app.models.tenant import Tenant
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def _tenant_rows(user_ids: list[int]) -> dict[Table, object]:
+    # Criteria selecting the tenant's rows of every sharded table
+    subject_ids = select(Subject.id).where(Subject.user_id.in_(user_ids))
+    return {
+        Subject.__table__: Subject.user_id.in_(user_ids),
+        Exam.__table__: Exam.subject_id.in_(subject_ids),
+        Grade.__table__: Grade.exam_id.in_(select(Exam.id).where(Exam.subject_id.in_(subject_ids))),
+        Tombstone.__table__: Tombstone.owner_id.in_(user_ids),
+    }
+
+
+def _upsert(target: Connection, table: Table, rows: list[dict]) -> None:
+    existing = set(target.execute(select(table.c.id).where(table.c.id.in_([row["id"] for row in rows]))).scalars())
+    new = [row for row in rows if row["id"] not in existing]
+    if new:
+        target.execute(insert(table), new)
+    changed = [{f"v_{key}": value for key, value in row.items()} for row in rows if row["id"] in existing]
+    if changed:
+        # Updates, not delete and insert: other rows reference these
+        values = {column.name: bindparam(f"v_{column.name}") for column in table.c if column.name != "id"}
+        target.execute(update(table).where(table.c.id == bindparam("v_id")).values(values), changed)
+
+
+def copy_changes(source: Engine, target: Engine, user_ids: list[int], since: int | None, final: bool = False) -> tuple[int, int]:
+    """
+    Copy the rows of ``user_ids`` changed after the change sequence ``since``.
+
+    With ``since=None`` all rows are copied. Reads come from one snapshot of
+    the source, writes go to the target in one transaction. ``final`` also
+    copies the idempotency keys.
+
+    Returns:
+        tuple[int, int]: The source's change sequence the copy is complete
+        up to, and the number of rows copied or deleted.
+    """
+    criteria = _tenant_rows(user_ids)
+    copied = 0
+    with source.connect() as src, target.begin() as dst:
+        if source.dialect.name == "postgresql":
+            src.execution_options(isolation_level="REPEATABLE READ")
+        with src.begin():
+            # Rows with a higher sequence committed after the snapshot
+            upto = src.execute(select(ChangeSequence.value)).scalar_one()
+            for table, where in criteria.items():
+                if since is not None:
+                    changed = table.c.change_seq > since
+                    if table is Grade.__table__:
+                        # The exam's new date cascaded to its grades without a new sequence
+                        changed |= Grade.exam_id.in_(select(Exam.id).where(criteria[Exam.__table__], Exam.change_seq > since))
+                    where = where & changed
+                result = src.execution_options(yield_per=BATCH_SIZE).execute(select(table).where(where))
+                for rows in result.mappings().partitions():
+                    _upsert(dst, table, [dict(row) for row in rows])
+                    copied += len(rows)
+
+            if since is not None:
+                deleted = src.execute(
+                    select(Tombstone.entity_id).where(
+                        criteria[Tombstone.__table__], Tombstone.entity == "grade", Tombstone.change_seq > since
+                    )
+                ).scalars().all()
+                if deleted:
+                    dst.execute(delete(Grade).where(Grade.id.in_(deleted)))
+                    copied += len(deleted)
+
+            if final:
+                keys = [dict(row) for row in src.execute(select(IdempotencyKey.__table__).where(IdempotencyKey.user_id.in_(user_ids))).mappings()]
+                dst.execute(delete(IdempotencyKey).where(IdempotencyKey.user_id.in_(user_ids)))
+                if keys:
+                    dst.execute(insert(IdempotencyKey.__table__), keys)
+
+        if final:
+            # New writes on the target must sort after everything clients synced from the source
+            current = dst.execute(select(ChangeSequence.value).with_for_update()).scalar_one()
+            if current < upto:
+                dst.execute(update(ChangeSequence).values(value=upto))
+    return upto, copied
+
+
+def delete_tenant_rows(engine: Engine, user_ids: list[int]) -> None:
+    """Delete the rows of ``user_ids`` from a shard they were moved away from."""
+    criteria = _tenant_rows(user_ids)
+    with engine.begin() as connection:
+        for table in reversed(criteria):
+            connection.execute(delete(table).where(criteria[table]))
+        connection.execute(delete(IdempotencyKey).where(IdempotencyKey.user_id.in_(user_ids)))
+
+
+def _set_tenant(router: ShardRouter, tenant_id: int, **values) -> None:
+    with Session(router.engine("default")) as db:
+        db.execute(update(Tenant).where(Tenant.id == tenant_id).values(**values))
+        audit.record(db, None, "tenant", tenant_id, "updated", new=values)
+        db.commit()
+
+
+def _user_ids(router: ShardRouter, tenant_id: int) -> list[int]:
+    # Read again for every pass, users may be added during the move
+    with Session(router.engine("default")) as db:
+        return db.scalars(select(User.id).where(User.tenant_id == tenant_id)).all()
+
+
+def move_tenant(
+    tenant_id: int,
+    target: str,
+    router: ShardRouter = shard_router,
+    grace: float | None = None,
+    max_passes: int = 5,
+    small_delta: int = 100,
+    keep_source: bool = False,
+) -> None:
+    """
+    Move a tenant's subjects, exams and grades to the shard ``target``.
+
+    Raises:
+        TenantNotFound: If the tenant does not exist.
+        ShardNotFound: If the target shard is not configured.
+    """
+    if grace is None:
+        grace = settings.SHARD_MAP_REFRESH_SECONDS + 10.0
+    with Session(router.engine("default")) as db:
+        tenant = db.get(Tenant, tenant_id)
+        if tenant is None:
+            raise TenantNotFound()
+        source = tenant.shard
+    if source == target:
+        logger.info("Tenant %s is already on %s", tenant_id, target)
+        return
+    source_engine, target_engine = router.engine(source), router.engine(target)
+
+    since, copied = copy_changes(source_engine, target_engine, _user_ids(router, tenant_id), None)
+    logger.info("Copied %s rows of tenant %s from %s to %s", copied, tenant_id, source, target)
+    for _ in range(max_passes):
+        if copied <= small_delta:
+            break
+        since, copied = copy_changes(source_engine, target_engine, _user_ids(router, tenant_id), since)
+        logger.info("Caught up %s changed rows", copied)
+
+    _set_tenant(router, tenant_id, read_only=True)
+    try:
+        logger.info("Tenant %s is read-only, waiting %.0f s", tenant_id, grace)
+        time.sleep(grace)
+        _, copied = copy_changes(source_engine, target_engine, _user_ids(router, tenant_id), since, final=True)
+        logger.info("Copied the last %s changed rows", copied)
+    except Exception:
+        _set_tenant(router, tenant_id, read_only=False)
+        raise
+    _set_tenant(router, tenant_id, shard=target, read_only=False)
+    logger.info("Tenant %s switched to %s", tenant_id, target)
+
+    if not keep_source:
+        time.sleep(grace)
+        delete_tenant_rows(source_engine, _user_ids(router, tenant_id))
+        logger.info("Deleted the rows of tenant %s from %s", tenant_id, source)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("tenant_id", type=int)
+    parser.add_argument("target", help='Key of SHARD_URLS or "default"')
+    parser.add_argument("--grace", type=float, default=None, help="Seconds to wait for workers to see a change of the tenant")
+    parser.add_argument("--keep-source", action="store_true", help="Don't delete the moved rows from the source shard")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    move_tenant(args.tenant_id, args.target, grace=args.grace, keep_source=args.keep_source)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import contextvars
+import functools
+import logging
+import math
+import threading
+import time
+
+from sqlalchemy import Engine, event, select
+from sqlalchemy.orm import Session
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.database.session import create_server_engine, run_after_commit
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRouter:
+    """
+    Round-robin selection of read-replica engines.
+
+    Replicas are health-checked lazily (at most once per interval) and
+    skipped while unhealthy. Clients that wrote recently are pinned to the
+    primary for ``lag_window`` seconds to get read-your-writes consistency,
+    see ReadYourWritesMiddleware.
+    """
+
+    def __init__(self, engines: list[Engine], lag_window: float, health_check_interval: float):
+        self.engines = engines
+        self.lag_window = lag_window
+        self.health_check_interval = health_check_interval
+        self._next = 0
+        self._healthy = [True] * len(engines)
+        self._checked_at = [0.0] * len(engines)
+        self._lock = threading.Lock()
+
+    def recently_wrote(self, written_at: float | None) -> bool:
+        # Wall-clock time, the write may have been committed by another
+        # worker; abs() tolerates clocks running slightly apart
+        return written_at is not None and abs(time.time() - written_at) < self.lag_window
+
+    def _is_healthy(self, index: int) -> bool:
+        now = time.monotonic()
+        if now - self._checked_at[index] < self.health_check_interval:
+            return self._healthy[index]
+
+        self._checked_at[index] = now
+        try:
+            with self.engines[index].connect() as connection:
+                connection.execute(select(1))
+            healthy = True
+        except Exception as e:
+            logger.warning("Read replica %s is unavailable: %s", index, e)
+            healthy = False
+        self._healthy[index] = healthy
+        return healthy
+
+    def choose(self, written_at: float | None = None) -> Engine | None:
+        """
+        Pick the replica engine for a read.
+
+        Args:
+            written_at (float | None): Commit time of the client's last write.
+
+        Returns:
+            Engine | None: A healthy replica, or None if the primary should be used.
+        """
+        if not self.engines:
+            return None
+        if self.recently_wrote(written_at):
+            return None
+
+        with self._lock:
+            start = self._next
+            self._next = (start + 1) % len(self.engines)
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            if self._is_healthy(index):
+                return self.engines[index]
+        return None
+
+
+replica_router = ReplicaRouter(
+    engines=[create_server_engine(url, pool_pre_ping=True) for url in settings.READ_REPLICA_URLS],
+    lag_window=settings.READ_REPLICA_LAG_SECONDS,
+    health_check_interval=settings.READ_REPLICA_HEALTH_CHECK_SECONDS,
+)
+
+
+# Commit time (epoch seconds) of the client's last write
+WRITE_COOKIE = "last_write"
+_WRITTEN_AT_KEY = "replica_written_at"
+
+# ASGI scope of the current request, see ReadYourWritesMiddleware
+_request: contextvars.ContextVar[dict | None] = contextvars.ContextVar("replica_request", default=None)
+
+
+def last_write() -> float | None:
+    """
+    Commit time of the current client's last write.
+
+    Returns:
+        float | None: The time from WRITE_COOKIE, or None outside a request or without the cookie.
+    """
+    scope = _request.get()
+    if scope is None:
+        return None
+    try:
+        return float(Request(scope).cookies[WRITE_COOKIE])
+    except (KeyError, ValueError):
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """
+    Carries the primary pin of a client across workers.
+
+    Responses of requests that committed writes set WRITE_COOKIE to the
+    commit time for the lag window, so the client's next reads go to the
+    primary whichever worker serves them.
+    """
+
+    def __init__(self, app, lag_window: float):
+        self.app = app
+        self.max_age = math.ceil(lag_window)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start" and _WRITTEN_AT_KEY in scope:
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "set-cookie",
+                    f"{WRITE_COOKIE}={scope[_WRITTEN_AT_KEY]:.3f}; Max-Age={self.max_age}; Path=/; HttpOnly; SameSite=lax",
+                )
+            await send(message)
+
+        token = _request.set(scope)
+        try:
+            await self.app(scope, receive, send_with_pin)
+        finally:
+            _request.reset(token)
+
+
+def _mark_write(scope: dict) -> None:
+    scope[_WRITTEN_AT_KEY] = time.time()
+
+
+# Track whether a session wrote, so the commit pins the client to the primary
+@event.listens_for(Session, "after_flush")
+def _remember_write(session: Session, _flush_context) -> None:
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _remember_bulk_write(orm_execute_state) -> None:
+    # ORM-enabled UPDATE/DELETE statements bypass the flush
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _pin_writer_to_primary(session: Session) -> None:
+    scope = _request.get()
+    if session.info.pop("has_writes", False) and scope is not None:
+        run_after_commit(session, functools.partial(_mark_write, scope))
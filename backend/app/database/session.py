@@ -1,17 +1,83 @@
-from sqlalchemy import create_engine
-from sqlalchemy.engine import URL
+from collections.abc import Callable
+from functools import cache
+
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.engine import URL, make_url
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import Session
 
 from app.core.config import settings
 
-url = URL.create(
-    drivername=settings.SQLALCHEMY_DATABASE_URI.scheme,
-    username=settings.POSTGRES_USER,
-    password=settings.POSTGRES_PASSWORD,
-    host=settings.POSTGRES_SERVER,
-    database=settings.POSTGRES_DB,
-    port=settings.POSTGRES_PORT
-)
-
-engine = create_engine(url)
 Base = declarative_base()
+
+# Set to a list by sessions whose commits only release a savepoint of an
+# outer transaction (atomic batches, see app.api.routes.batch)
+DEFERRED_KEY = "after_outer_commit"
+
+
+def run_after_commit(session: Session, callback: Callable[[], None]) -> None:
+    """
+    Run the work of an ``after_commit`` listener that must not outlive a rollback.
+
+    Runs ``callback`` right away, unless the session's commits only release
+    a savepoint: then it is kept on the session until the outer transaction
+    commits, and dropped if it rolls back.
+    """
+    deferred = session.info.get(DEFERRED_KEY)
+    if deferred is None:
+        callback()
+    else:
+        deferred.append(callback)
+
+
+@cache
+def get_engine() -> Engine:
+    """
+    The engine of the primary database, created on first use.
+
+    Creating it loads the database driver, which importing the models or
+    the app shouldn't pay for.
+    """
+    if settings.DATABASE_BACKEND == "sqlite":
+        from app.database.sqlite import create_sqlite_engine
+
+        return create_sqlite_engine(
+            settings.SQLITE_PATH,
+            cache_size_kib=settings.SQLITE_CACHE_SIZE_KIB,
+            mmap_size=settings.SQLITE_MMAP_SIZE,
+            busy_timeout_ms=settings.SQLITE_BUSY_TIMEOUT_MS,
+            write_timeout=settings.SQLITE_WRITE_TIMEOUT_SECONDS,
+        )
+
+    url = URL.create(
+        drivername=settings.SQLALCHEMY_DATABASE_URI.scheme,
+        username=settings.POSTGRES_USER,
+        password=settings.POSTGRES_PASSWORD,
+        host=settings.POSTGRES_SERVER,
+        database=settings.POSTGRES_DB,
+        port=settings.POSTGRES_PORT
+    )
+    return create_server_engine(url)
+
+
+def create_server_engine(url: str | URL, **kwargs) -> Engine:
+    """
+    An engine for a database server: the primary, a read replica or a shard.
+
+    All of them get the same connection settings, extra ``kwargs`` go to
+    ``create_engine``.
+    """
+    url = make_url(url)
+    # psycopg prepares a statement server-side once a connection executed it
+    # this often (None disables, e.g. behind PgBouncer in transaction mode)
+    connect_args = (
+        {"prepare_threshold": settings.POSTGRES_PREPARE_THRESHOLD} if url.get_driver_name() == "psycopg" else {}
+    )
+    return create_engine(url, connect_args=connect_args, **kwargs)
+
+
+def __getattr__(name: str):
+    # Keeps `from app.database.session import engine` working, lazily
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,184 @@
+"""
+Tenant-based sharding across several databases.
+
+The primary database is the directory: it keeps the users, the tenants
+(schools) with the shard each one lives on, token revocations, login
+buckets and the audit log. Subjects, exams, grades and the other per-user
+rows of a tenant live on its shard, a database with the full schema. The
+primary database itself is shard ``default``, so without SHARD_URLS nothing
+changes.
+
+Sessions from ``ShardRouter.session`` are bound to the shard, while the
+directory models (DIRECTORY_MODELS) are routed to the primary database, so
+the crud functions work unchanged. Queries must not join directory and
+shard tables.
+
+Ids of the sharded tables come from sequences striding by SHARD_ID_STRIDE
+with a per-shard offset, so they are unique across shards and a tenant can
+be moved (app.database.rebalance) without renumbering.
+"""
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+from sqlalchemy import Connection, Engine, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.session import create_server_engine, get_engine
+from app.exceptions.tenant import ShardNotFound
+from app.models.audit import AuditEntry
+from app.models.rate_limit import RateLimitBucket
+from app.models.tenant import Tenant
+from app.models.token_revocation import TokenRevocation
+from app.models.user import User
+
+T = TypeVar("T")
+
+DEFAULT_SHARD = "default"
+
+# Always read from and written to the primary database
+DIRECTORY_MODELS = (User, Tenant, TokenRevocation, RateLimitBucket, AuditEntry)
+
+# Tables with the rows of a tenant that have an id sequence, in copy order
+SHARDED_TABLES = ("subjects", "exams", "grades", "sync_tombstones")
+
+
+class ShardRouter:
+    """
+    Maps tenants to shards and shards to engines.
+
+    Every shard gets its own engine and pool, created on first use. The
+    tenant map is reloaded from the directory at most once per
+    ``refresh_interval``, so a moved tenant is routed to its new shard by
+    every worker after that long.
+    """
+
+    def __init__(self, urls: dict[str, str], refresh_interval: float, directory: Engine | None = None):
+        self.urls = urls
+        self.refresh_interval = refresh_interval
+        self._directory = directory
+        self._engines: dict[str, Engine] = {}
+        # tenant id -> (shard, read-only)
+        self._tenants: dict[int, tuple[str, bool]] = {}
+        self._refreshed_at = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.urls)
+
+    @property
+    def names(self) -> list[str]:
+        return [DEFAULT_SHARD, *self.urls]
+
+    def offset(self, shard: str) -> int:
+        """The shard's id offset, from its position in SHARD_URLS."""
+        return self.names.index(shard)
+
+    def engine(self, shard: str) -> Engine:
+        """
+        Raises:
+            ShardNotFound: If the shard is not configured.
+        """
+        if shard == DEFAULT_SHARD:
+            return self._directory or get_engine()
+        engine = self._engines.get(shard)
+        if engine is None:
+            if shard not in self.urls:
+                raise ShardNotFound()
+            with self._lock:
+                engine = self._engines.get(shard)
+                if engine is None:
+                    engine = self._engines[shard] = create_server_engine(self.urls[shard])
+        return engine
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            if not force and now - self._refreshed_at < self.refresh_interval:
+                return
+            with Session(self._directory or get_engine()) as db:
+                rows = db.execute(select(Tenant.id, Tenant.shard, Tenant.read_only)).all()
+            self._tenants = {row.id: (row.shard, row.read_only) for row in rows}
+            self._refreshed_at = now
+
+    def _lookup(self, tenant_id: int | None) -> tuple[str, bool]:
+        if tenant_id is None or not self.enabled:
+            return DEFAULT_SHARD, False
+        self.refresh()
+        return self._tenants.get(tenant_id, (DEFAULT_SHARD, False))
+
+    def shard_of(self, tenant_id: int | None) -> str:
+        """The shard of a tenant, ``default`` for users without one."""
+        return self._lookup(tenant_id)[0]
+
+    def is_read_only(self, tenant_id: int | None) -> bool:
+        """True while the tenant is being moved to another shard."""
+        return self._lookup(tenant_id)[1]
+
+    def directory_binds(self, shard: str) -> dict:
+        """``binds`` of a session on ``shard`` routing the directory models to the primary database."""
+        if shard == DEFAULT_SHARD:
+            return {}
+        directory = self.engine(DEFAULT_SHARD)
+        return dict.fromkeys(DIRECTORY_MODELS, directory)
+
+    def session(self, shard: str) -> Session:
+        """A session bound to ``shard``, with the directory models on the primary database."""
+        session = Session(self.engine(shard), binds=self.directory_binds(shard))
+        session.info["shard"] = shard
+        return session
+
+    def fan_out(self, query: Callable[[Session], T], db: Session | None = None) -> dict[str, T]:
+        """
+        Run ``query`` on every shard in parallel, for cross-tenant reports.
+
+        Each shard gets its own session; ``db``, if given, serves the default
+        shard. Results are keyed by shard. The caller is responsible for
+        restricting this to superusers.
+        """
+        def run(shard: str) -> T:
+            if shard == DEFAULT_SHARD and db is not None:
+                return query(db)
+            with self.session(shard) as session:
+                return query(session)
+
+        with ThreadPoolExecutor(max_workers=len(self.names), thread_name_prefix="fan-out") as pool:
+            return dict(zip(self.names, pool.map(run, self.names), strict=True))
+
+    def dispose(self) -> None:
+        for engine in self._engines.values():
+            engine.dispose()
+        self._engines.clear()
+
+
+def prepare_shard(connection: Connection, offset: int, stride: int) -> None:
+    """
+    Prepare the schema of a shard for sharding (Postgres only).
+
+    The id sequences of SHARDED_TABLES are set to hand out ids congruent to
+    ``offset`` modulo ``stride``. Shards other than the primary database
+    also lose the foreign key from subjects to users, which are kept in the
+    directory. Run it before the workers start, like init_db.
+    """
+    if offset != 0:
+        connection.exec_driver_sql("ALTER TABLE subjects DROP CONSTRAINT IF EXISTS subjects_user_id_fkey")
+    for table in SHARDED_TABLES:
+        sequence = connection.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table}).scalar()
+        connection.exec_driver_sql(f"ALTER SEQUENCE {sequence} INCREMENT BY {stride}")
+        # First free id with the shard's offset above the ids handed out so far
+        connection.execute(
+            text(
+                f"SELECT setval(:sequence, (greatest((SELECT coalesce(max(id), 0) FROM {table}), "
+                f"(SELECT last_value FROM {sequence})) / :stride + 1) * :stride + :offset, false)"
+            ),
+            {"sequence": sequence, "stride": stride, "offset": offset},
+        )
+
+
+shard_router = ShardRouter(settings.SHARD_URLS, settings.SHARD_MAP_REFRESH_SECONDS)
@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import Engine, create_engine, event
+
+from app.core.metrics import metrics
+
+# Statements taking the write lock besides the ORM inserts, updates, deletes and
+# DDL. A SAVEPOINT counts too, the transaction around it is expected to write
+_WRITE_VERBS = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER", "SAVEPOINT")
+
+
+class WriterQueue:
+    """
+    FIFO lock admitting one writing transaction at a time.
+
+    SQLite allows a single writer; letting transactions race for the file
+    lock ends in ``database is locked`` errors or busy-waiting. Queueing
+    them in-process keeps writes in arrival order, while reads (WAL) never
+    wait.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._waiters: deque[threading.Event] = deque()
+        self._held = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Raises:
+            TimeoutError: If the lock wasn't granted within ``timeout`` seconds.
+        """
+        with self._lock:
+            if not self._held and not self._waiters:
+                self._held = True
+                return
+            turn = threading.Event()
+            self._waiters.append(turn)
+            metrics.add("sqlite.writer.waiting", 1)
+
+        started = time.perf_counter()
+        granted = turn.wait(self.timeout)
+        with self._lock:
+            metrics.add("sqlite.writer.waiting", -1)
+            metrics.inc("sqlite.writer.wait_seconds", time.perf_counter() - started)
+            if not granted and not turn.is_set():
+                self._waiters.remove(turn)
+                metrics.inc("sqlite.writer.timeouts")
+                raise TimeoutError("Timed out waiting for the SQLite writer lock")
+
+    def release(self) -> None:
+        with self._lock:
+            if self._waiters:
+                # Hand over directly, so no newcomer can overtake the queue
+                self._waiters.popleft().set()
+            else:
+                self._held = False
+
+
+def _is_write(statement: str, context) -> bool:
+    if context is not None and (context.isinsert or context.isupdate or context.isdelete or context.isddl):
+        return True
+    return statement.lstrip()[:9].upper().startswith(_WRITE_VERBS)
+
+
+def enable_savepoints(engine: Engine) -> None:
+    """
+    Let SQLAlchemy control transactions of a pysqlite engine.
+
+    pysqlite begins transactions itself, only before INSERT/UPDATE/DELETE,
+    so a SAVEPOINT issued first (the atomic batch, ``join_transaction_mode=
+    "create_savepoint"``) opens the outermost transaction and its RELEASE
+    commits. Turns pysqlite's handling off and emits ``BEGIN`` before the
+    first write or SAVEPOINT of a transaction SQLAlchemy began. Reads before
+    that still run in autocommit, so their snapshot can't go stale before
+    the transaction writes.
+    """
+
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, _record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _defer_begin(conn):
+        conn.info["begin_pending"] = True
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _begin(conn, cursor, statement, _parameters, context, _executemany):
+        if conn.info.get("begin_pending") and _is_write(statement, context):
+            del conn.info["begin_pending"]
+            cursor.execute("BEGIN")
+
+    @event.listens_for(engine, "commit")
+    @event.listens_for(engine, "rollback")
+    def _end(conn):
+        conn.info.pop("begin_pending", None)
+
+
+def create_sqlite_engine(
+    path: str,
+    cache_size_kib: int,
+    mmap_size: int,
+    busy_timeout_ms: int,
+    write_timeout: float,
+    pool_size: int = 10,
+) -> Engine:
+    """
+    Engine for the embedded SQLite mode.
+
+    Every connection gets WAL journaling (readers don't block the writer and
+    vice versa), ``synchronous=NORMAL`` (durable at checkpoints, safe with
+    WAL), a memory-mapped file, a larger page cache and foreign key checks
+    like Postgres. Writing transactions pass a ``WriterQueue``: the lock is
+    taken by the first writing statement and held until commit or rollback.
+    Transactions begin at their first write (``enable_savepoints``), so
+    savepoints work and a writer's reads see the state it holds the lock on.
+    """
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False, "timeout": busy_timeout_ms / 1000},
+        pool_size=pool_size,
+    )
+    enable_savepoints(engine)
+    writers = WriterQueue(write_timeout)
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        for pragma in (
+            "journal_mode=WAL",
+            "synchronous=NORMAL",
+            f"mmap_size={mmap_size}",
+            # Negative: size in KiB instead of pages
+            f"cache_size=-{cache_size_kib}",
+            f"busy_timeout={busy_timeout_ms}",
+            "temp_store=MEMORY",
+            "foreign_keys=ON",
+        ):
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _acquire_writer(conn, _cursor, statement, _parameters, context, _executemany):
+        if not conn.info.get("writer") and _is_write(statement, context):
+            writers.acquire()
+            conn.info["writer"] = True
+
+    def _release_writer(info: dict) -> None:
+        if info.pop("writer", False):
+            writers.release()
+
+    # Released once the DBAPI commit or rollback returned (the "commit" and
+    # "rollback" events fire before). Covers the pool's reset on checkin too.
+    dialect = engine.dialect
+    do_commit, do_rollback = dialect.do_commit, dialect.do_rollback
+
+    def _release_writer_of(dbapi_connection) -> None:
+        try:
+            info = dbapi_connection.info
+        except NotImplementedError:
+            # Ad-hoc connection of the dialect's first connect, never a writer
+            return
+        _release_writer(info)
+
+    def _commit_and_release(dbapi_connection):
+        try:
+            do_commit(dbapi_connection)
+        finally:
+            _release_writer_of(dbapi_connection)
+
+    def _rollback_and_release(dbapi_connection):
+        try:
+            do_rollback(dbapi_connection)
+        finally:
+            _release_writer_of(dbapi_connection)
+
+    dialect.do_commit = _commit_and_release
+    dialect.do_rollback = _rollback_and_release
+
+    @event.listens_for(engine.pool, "invalidate")
+    def _release_on_invalidate(_dbapi_connection, record, _exception):
+        _release_writer(record.info)
+
+    return engine
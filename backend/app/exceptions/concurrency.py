@@ -0,0 +1,3 @@
+class VersionConflict(Exception):
+    """Raised when the row was changed by someone else since the client read it."""
+    pass
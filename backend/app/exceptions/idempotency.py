@@ -0,0 +1,7 @@
+class IdempotencyKeyReused(Exception):
+    """Raised when an idempotency key is sent again with a different request."""
+    pass
+
+class IdempotencyKeyInProgress(Exception):
+    """Raised when the original request of an idempotency key has not finished yet."""
+    pass
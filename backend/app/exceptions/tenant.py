@@ -0,0 +1,15 @@
+class TenantNotFound(Exception):
+    """Raised when the requested tenant (school) does not exist."""
+    pass
+
+class TenantAlreadyExists(Exception):
+    """Raised when a tenant with the same name already exists."""
+    pass
+
+class ShardNotFound(Exception):
+    """Raised when a shard is not configured in SHARD_URLS."""
+    pass
+
+class WrongShard(Exception):
+    """Raised when a write is for a tenant on another shard than the session's."""
+    pass
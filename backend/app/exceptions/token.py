@@ -0,0 +1,3 @@
+class TokenAlreadyRevoked(Exception):
+    """Raised when a token is revoked a second time, e.g. a refresh token rotated twice."""
+    pass
@@ -0,0 +1,7 @@
+class UserNotFound(Exception):
+    """Raised when the requested user does not exist."""
+    pass
+
+class UserAlreadyDeactivated(Exception):
+    """Raised when a user that is already inactive is deactivated."""
+    pass
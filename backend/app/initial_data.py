@@ -5,7 +5,6 @@ from app.core.db import init_db
 from app.database.session import engine
 from app.models.role import Role as RoleEnum
 from app.models.user import User
-from app.core.security import get_password_hash
 from datetime import datetime, timedelta
 
 logging.basicConfig(level=logging.INFO)
@@ -1,24 +1,112 @@
-from fastapi import FastAPI
-from fastapi.routing import APIRoute
-
-from app.api.main import api_router
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
 
 from app.core.config import settings
-from starlette.middleware.cors import CORSMiddleware
 
-def cstm_generate_unique_id(route: APIRoute) -> str:
+if TYPE_CHECKING:
+  from fastapi import FastAPI
+  from fastapi.routing import APIRoute
+
+def cstm_generate_unique_id(route: "APIRoute") -> str:
   return f"{route.tags[0]}-{route.name}"
 
-app = FastAPI(title=settings.PROJECT_NAME, 
-              openapi_url=f"{settings.API_V1_STR}/openapi.json", 
-              generate_unique_id_function=cstm_generate_unique_id)
+@asynccontextmanager
+async def lifespan(_app: "FastAPI"):
+  import anyio.to_thread
+
+  from app.core import audit, events, security, tracing, warmup
+  from app.database import partitions
+  from app.database.session import get_engine
+
+  anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+  if settings.WARMUP_ENABLED:
+    warmup.state.start(get_engine())
+  else:
+    warmup.state.mark_ready()
+  events.start_listener()
+  partitions.start_maintenance()
+  yield
+  warmup.state.stop()
+  # Write the queued audit entries while the database is still reachable
+  audit.writer.shutdown()
+  partitions.stop_maintenance()
+  events.stop_listener()
+  security.shutdown_password_pool()
+  tracing.exporter.shutdown()
+
+def create_app() -> "FastAPI":
+  """
+  Build the application.
+
+  The routers (and with them the models, crud functions and schemas) are
+  imported here rather than at module level, and the database engine is
+  only created by the first request needing it, so importing this module
+  stays cheap. Servers can call the factory directly, e.g.
+  ``uvicorn --factory app.main:create_app``.
+  """
+  from fastapi import FastAPI
+  from starlette.middleware.cors import CORSMiddleware
+
+  from app.api.main import api_router
+  from app.api.routes import ready
+  from app.core import tracing
+  from app.core.admission import AdmissionControlMiddleware
+  from app.core.profiling import ProfilingMiddleware
+  from app.core.slow_queries import QueryOriginMiddleware
+  from app.database.replicas import ReadYourWritesMiddleware
+
+  app = FastAPI(title=settings.PROJECT_NAME,
+                lifespan=lifespan,
+                openapi_url=f"{settings.API_V1_STR}/openapi.json",
+                generate_unique_id_function=cstm_generate_unique_id)
+
+  app.include_router(api_router, prefix=settings.API_V1_STR)
+  # Probes are served outside the versioned API
+  app.include_router(ready.router, tags=["ready"])
+
+  # Innermost, so profiles only cover the request's own work
+  app.add_middleware(ProfilingMiddleware)
+
+  # Tags slow statements with the route they came from
+  app.add_middleware(QueryOriginMiddleware)
+
+  # Pins clients that just wrote to the primary, on every worker
+  app.add_middleware(ReadYourWritesMiddleware, lag_window=settings.READ_REPLICA_LAG_SECONDS)
+
+  # Rejects before routing, the threadpool or the DB pool are touched.
+  # Added before CORS so 503s still carry the CORS headers.
+  app.add_middleware(
+    AdmissionControlMiddleware,
+    limits=settings.ADMISSION_CONCURRENCY,
+    queue_size=settings.ADMISSION_QUEUE_SIZE,
+    timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+  )
+
+  app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Adjust as needed for production
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+  )
+
+  # Outermost, so the request span also covers CORS and admission control
+  app.add_middleware(tracing.TracingMiddleware)
+
+  return app
+
+_app: "FastAPI | None" = None
 
-app.include_router(api_router, prefix=settings.API_V1_STR)
+def __getattr__(name: str):
+  # `app.main:app` (fastapi dev/run, uvicorn) builds the app on first access
+  global _app
+  if name == "app":
+    if _app is None:
+      _app = create_app()
+    return _app
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-app.add_middleware(
-  CORSMiddleware,
-  allow_origins=["*"],  # Adjust as needed for production
-  allow_credentials=True,
-  allow_methods=["*"],
-  allow_headers=["*"],
-)
\ No newline at end of file
+def __dir__():
+  # fastapi-cli looks for the app in dir() of the module
+  return [*globals(), "app"]
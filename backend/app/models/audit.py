@@ -0,0 +1,24 @@
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Index, Integer, String
+from app.database.session import Base
+
+
+class AuditEntry(Base):
+    """
+    One create, update or delete of a subject, exam, grade, user or tenant.
+
+    ``changes`` maps each changed column to ``{"old": ..., "new": ...}``.
+    Written in batches by app.core.audit, after the change committed.
+    """
+    __tablename__ = "audit_log"
+
+    # SQLite only autoincrements INTEGER primary keys
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    # No foreign key, entries outlive their users
+    principal_id = Column(Integer, nullable=True, index=True)
+    entity = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    action = Column(String(10), nullable=False)
+    changes = Column(JSON, nullable=False)
+
+    __table_args__ = (Index("ix_audit_log_entity", "entity", "entity_id"),)
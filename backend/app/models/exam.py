@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, ForeignKey, Float, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.database.session import Base
+from app.database.partitions import not_partitioned, partitioned_by
 import datetime
 
 
@@ -8,7 +9,7 @@ class Exam(Base):
     __tablename__ = 'exams'
 
     id = Column(Integer, primary_key=True, index=True)
-    subject_id = Column(Integer, ForeignKey('subjects.id'), nullable=False)
+    subject_id = Column(Integer, ForeignKey('subjects.id'), nullable=False, index=True)
     title = Column(String(100), nullable=False)
     date = Column(DateTime, nullable=False)
     type = Column(String(50), nullable=True)
@@ -17,9 +18,21 @@ class Exam(Base):
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     deleted_at = Column(DateTime, nullable=True)
+    # Global change sequence of the last write, see app.models.sync
+    change_seq = Column(BigInteger, nullable=True, index=True)
+    # Optimistic concurrency: bumped on every UPDATE, compared with If-Match
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     subject = relationship("Subject", back_populates="exam")
     grades = relationship("Grade", back_populates="exam")
 
+    __table_args__ = (
+        # Referenced by the grades' foreign key, part of the primary key on Postgres
+        UniqueConstraint("id", "date", name="uq_exams_id_date").ddl_if(callable_=not_partitioned),
+        # One partition per school year, see app.database.partitions
+        partitioned_by("date"),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
 from app.models.subject import Subject
-from app.models.grade import Grade
\ No newline at end of file
+from app.models.grade import Grade
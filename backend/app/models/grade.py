@@ -1,13 +1,32 @@
-from sqlalchemy import Column, Integer, Enum, ForeignKey
+from sqlalchemy import BigInteger, Column, DateTime, Integer, Enum, ForeignKeyConstraint
 from sqlalchemy.orm import relationship
 from app.database.session import Base
+from app.database.partitions import partitioned_by
 from app.models.grade_enum import GradeEnum
 
 class Grade(Base):
     __tablename__ = "grades"
 
     id = Column(Integer, primary_key=True, index=True)
-    exam_id = Column(Integer, ForeignKey("exams.id"), nullable=False)
+    exam_id = Column(Integer, nullable=False, index=True)
+    # Copy of the exam's date, the partition key (see app.database.partitions)
+    exam_date = Column(DateTime, nullable=False)
     grade = Column(Enum(GradeEnum), nullable=False)
+    # Global change sequence of the last write, see app.models.sync
+    change_seq = Column(BigInteger, nullable=True, index=True)
+    # Optimistic concurrency: bumped on every UPDATE, compared with If-Match
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
-    exam = relationship("Exam", back_populates="grades")
\ No newline at end of file
+    exam = relationship("Exam", back_populates="grades")
+
+    __table_args__ = (
+        # Moves grades along when the exam's date changes; deferrable, so
+        # partition maintenance can move an exam before its grades
+        ForeignKeyConstraint(
+            ["exam_id", "exam_date"], ["exams.id", "exams.date"],
+            name="fk_grades_exam", onupdate="CASCADE", deferrable=True,
+        ),
+        # Partitioned in step with the exams
+        partitioned_by("exam_date"),
+    )
+    __mapper_args__ = {"version_id_col": version}
@@ -6,3 +6,8 @@ class GradeEnum(str, enum.Enum):
     befriedigend = "Befriedigend"
     genuegend = "Genügend"
     nicht_genuegend = "Nicht Genügend"
+
+    @property
+    def numeric(self) -> int:
+        """Numeric value of the grade on the Austrian 1 (best) to 5 scale."""
+        return list(GradeEnum).index(self) + 1
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, Integer, SmallInteger, String, Text
+from app.database.session import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Response of a create request sent with an ``Idempotency-Key`` header.
+
+    A row without ``status_code`` is a claim of a request still in progress.
+    See app.core.idempotency.
+    """
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # SHA-256 of route and request body, a key can't be reused for another request
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(SmallInteger, nullable=True)
+    response = Column(Text, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
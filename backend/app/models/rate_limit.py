@@ -0,0 +1,11 @@
+from sqlalchemy import Column, DateTime, Float, String
+from app.database.session import Base
+
+
+class RateLimitBucket(Base):
+    """Token bucket shared between workers, see app.core.rate_limit."""
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(320), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,74 @@
+from sqlalchemy import DDL, event
+
+from app.models.subject import Subject
+from app.models.exam import Exam
+
+# Text search configuration used for both the indexes and the queries.
+# "simple" does no stemming, which suits mixed German/English titles.
+TS_CONFIG = "simple"
+
+# The expressions below must match the ones built in app.crud.search exactly,
+# otherwise Postgres will not use the expression indexes.
+SUBJECT_DOCUMENT = (
+    "coalesce(name, '') || ' ' || coalesce(description, '') || ' ' || coalesce(teacher_name, '')"
+)
+EXAM_DOCUMENT = "coalesce(title, '')"
+
+
+# Postgres: tsvector + trigram expression indexes
+event.listen(
+    Subject.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+for ddl in (
+    f"CREATE INDEX IF NOT EXISTS ix_subjects_search_vector ON subjects "
+    f"USING gin ((to_tsvector('{TS_CONFIG}', {SUBJECT_DOCUMENT})))",
+    f"CREATE INDEX IF NOT EXISTS ix_subjects_search_trgm ON subjects "
+    f"USING gin (({SUBJECT_DOCUMENT}) gin_trgm_ops)",
+):
+    event.listen(Subject.__table__, "after_create", DDL(ddl).execute_if(dialect="postgresql"))
+
+for ddl in (
+    f"CREATE INDEX IF NOT EXISTS ix_exams_search_vector ON exams "
+    f"USING gin ((to_tsvector('{TS_CONFIG}', {EXAM_DOCUMENT})))",
+    f"CREATE INDEX IF NOT EXISTS ix_exams_search_trgm ON exams "
+    f"USING gin (({EXAM_DOCUMENT}) gin_trgm_ops)",
+):
+    event.listen(Exam.__table__, "after_create", DDL(ddl).execute_if(dialect="postgresql"))
+
+
+# SQLite: external-content FTS5 tables kept in sync by triggers
+SQLITE_FTS_TABLES = {
+    "subjects": ("subjects_fts", ("name", "description", "teacher_name")),
+    "exams": ("exams_fts", ("title",)),
+}
+
+
+def _sqlite_fts_ddl(source: str, fts: str, columns: tuple[str, ...]) -> list[str]:
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{c}" for c in columns)
+    old_values = ", ".join(f"old.{c}" for c in columns)
+    delete_old = (
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, "
+        f"content='{source}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {source} BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+for model in (Subject, Exam):
+    fts, columns = SQLITE_FTS_TABLES[model.__tablename__]
+    for ddl in _sqlite_fts_ddl(model.__tablename__, fts, columns):
+        event.listen(model.__table__, "after_create", DDL(ddl).execute_if(dialect="sqlite"))
+    event.listen(
+        model.__table__,
+        "before_drop",
+        DDL(f"DROP TABLE IF EXISTS {fts}").execute_if(dialect="sqlite"),
+    )
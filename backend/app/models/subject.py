@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, ForeignKey, Enum
 from sqlalchemy.orm import relationship
 from app.database.session import Base
 import enum
@@ -9,7 +9,7 @@ class Subject(Base):
     __tablename__ = 'subjects'
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     name = Column(String(100), nullable=False)
     description = Column(String, nullable=True)
     semester = Column(String(20), nullable=True)
@@ -17,6 +17,12 @@ class Subject(Base):
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     deleted_at = Column(DateTime, nullable=True)
+    # Global change sequence of the last write, see app.models.sync
+    change_seq = Column(BigInteger, nullable=True, index=True)
+    # Optimistic concurrency: bumped on every UPDATE, compared with If-Match
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     user = relationship("User", back_populates="subject")
     exam = relationship("Exam", back_populates="subject")
+
+    __mapper_args__ = {"version_id_col": version}
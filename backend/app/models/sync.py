@@ -0,0 +1,123 @@
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    Column,
+    Connection,
+    Integer,
+    String,
+    event,
+    select,
+    update,
+)
+from sqlalchemy.orm import Session
+
+from app.database.session import Base
+from app.models.exam import Exam
+from app.models.grade import Grade
+from app.models.subject import Subject
+
+
+class ChangeSequence(Base):
+    """
+    Single-row counter handing out the global change sequence.
+
+    Incrementing the row locks it until the writing transaction commits, so
+    sequence numbers become visible in commit order and ``since`` cursors
+    never skip a row that commits late. The price: every transaction writing
+    subjects, exams or grades waits for the previous one to commit, writes
+    to a database (shard) are serialized. A Postgres sequence wouldn't
+    block, but hands out numbers in call order rather than commit order.
+    """
+    __tablename__ = "change_sequence"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+class Tombstone(Base):
+    """Marks hard-deleted rows (grades) for delta sync clients."""
+    __tablename__ = "sync_tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    owner_id = Column(Integer, nullable=False, index=True)
+    change_seq = Column(BigInteger, nullable=False, index=True)
+
+
+event.listen(
+    ChangeSequence.__table__,
+    "after_create",
+    DDL("INSERT INTO change_sequence (id, value) VALUES (1, 0)"),
+)
+
+# Entity names as used by the sync payload and the change feed
+ENTITY_NAMES = {Subject: "subject", Exam: "exam", Grade: "grade"}
+SYNCED_MODELS = tuple(ENTITY_NAMES)
+
+
+_NEXT_CHANGE_SEQ = (
+    update(ChangeSequence.__table__)
+    .where(ChangeSequence.__table__.c.id == 1)
+    .values(value=ChangeSequence.__table__.c.value + 1)
+    .returning(ChangeSequence.__table__.c.value)
+)
+
+
+# The last change sequence of the session's transaction, for the change feed
+CHANGE_SEQ_KEY = "change_seq"
+
+
+def next_change_seq(session: Session) -> int:
+    """Increment the change sequence in the session's transaction and return it."""
+    seq = session.connection().execute(_NEXT_CHANGE_SEQ).scalar_one()
+    session.info[CHANGE_SEQ_KEY] = seq
+    return seq
+
+
+def backfill_change_seq(connection: Connection) -> None:
+    """
+    Stamp rows written before delta sync existed, ``since`` cursors never match NULL.
+
+    They all get one new sequence number, so every client syncs them next.
+    """
+    tables = [model.__table__ for model in SYNCED_MODELS]
+    if not any(
+        connection.execute(select(table.c.id).where(table.c.change_seq.is_(None)).limit(1)).first() for table in tables
+    ):
+        return
+    seq = connection.execute(_NEXT_CHANGE_SEQ).scalar_one()
+    for table in tables:
+        # Keep columns such as updated_at, the rows didn't change
+        unchanged = {column.name: column for column in table.columns if column.onupdate is not None}
+        connection.execute(update(table).where(table.c.change_seq.is_(None)).values(**unchanged, change_seq=seq))
+
+
+def _owner_id(obj) -> int:
+    if isinstance(obj, Subject):
+        return obj.user_id
+    if isinstance(obj, Exam):
+        return obj.subject.user_id
+    return obj.exam.subject.user_id
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_change_seq(session: Session, _flush_context, _instances) -> None:
+    changed = [
+        obj for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, SYNCED_MODELS) and session.is_modified(obj)
+    ]
+    deleted = [obj for obj in session.deleted if isinstance(obj, SYNCED_MODELS)]
+    if not changed and not deleted:
+        return
+
+    seq = next_change_seq(session)
+    for obj in changed:
+        obj.change_seq = seq
+    for obj in deleted:
+        session.add(Tombstone(
+            entity=ENTITY_NAMES[type(obj)],
+            entity_id=obj.id,
+            owner_id=_owner_id(obj),
+            change_seq=seq,
+        ))
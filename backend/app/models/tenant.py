@@ -0,0 +1,19 @@
+from sqlalchemy import Boolean, Column, DateTime, Integer, String
+from app.database.session import Base
+import datetime
+
+
+class Tenant(Base):
+    """
+    A school. Its users stay in the primary database, its subjects, exams
+    and grades live on ``shard`` (see app.database.shards).
+    """
+    __tablename__ = "tenants"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), unique=True, nullable=False)
+    # Key of SHARD_URLS, or "default" for the primary database
+    shard = Column(String(50), nullable=False, default="default", server_default="default")
+    # Set while the tenant is moved to another shard, writes are rejected
+    read_only = Column(Boolean, nullable=False, default=False, server_default="false")
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
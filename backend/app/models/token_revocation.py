@@ -0,0 +1,21 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String
+
+from app.database.session import Base
+
+
+class TokenRevocation(Base):
+    """
+    A revoked refresh token (``jti``) or all tokens of a user issued before
+    ``revoked_at`` (``user_id`` without ``jti``).
+    """
+    __tablename__ = "token_revocations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String(64), nullable=True)
+    user_id = Column(Integer, nullable=True, index=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    # Rows can be purged once the revoked token would have expired anyway
+    expires_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+    # A token is revoked once, concurrent rotations of a refresh token conflict
+    __table_args__ = (Index("uq_token_revocations_jti", "jti", unique=True),)
@@ -13,5 +13,7 @@ class User(Base):
     role = Column(Enum(Role), nullable=False)
     created_at = Column(DateTime, nullable=False)
     updated_at = Column(DateTime, nullable=True)
+    # School of the user, None for platform users such as the first superuser
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True, index=True)
 
     subject = relationship("Subject", back_populates="user")
\ No newline at end of file
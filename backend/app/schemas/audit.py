@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+
+class AuditEntryRead(BaseModel):
+    id: int
+    created_at: datetime
+    principal_id: Optional[int]
+    entity: str
+    entity_id: int
+    action: str
+    # column -> {"old": ..., "new": ...}
+    changes: Dict[str, Dict[str, Any]]
+
+    class Config:
+        from_attributes = True
+
+
+class AuditPage(BaseModel):
+    # Newest first
+    entries: List[AuditEntryRead] = []
+    # Pass as ``before`` to get the next page
+    next_before: Optional[int]
+    has_more: bool
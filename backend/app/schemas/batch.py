@@ -0,0 +1,39 @@
+import enum
+from pydantic import BaseModel, Field
+from typing import Any, Generic, List, Literal, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class BatchStatus(str, enum.Enum):
+    OK = "ok"
+    NOT_FOUND = "not_found"
+    FORBIDDEN = "forbidden"
+
+
+class BatchItem(BaseModel, Generic[T]):
+    id: int
+    status: BatchStatus
+    item: Optional[T] = None
+
+
+# POST /batch
+MAX_BATCH_OPERATIONS = 20
+
+
+class BatchOperation(BaseModel):
+    method: Literal["GET", "POST", "PUT", "DELETE"]
+    # Relative to the API prefix, e.g. "/subjects/1" or "/exams/batch?ids=1,2"
+    path: str = Field(..., pattern=r"^/")
+    body: Optional[Any] = None
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=MAX_BATCH_OPERATIONS)
+    # Run all operations in one transaction, stopping at the first failure
+    atomic: bool = False
+
+
+class BatchResult(BaseModel):
+    status: int
+    body: Optional[Any] = None
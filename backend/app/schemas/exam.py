@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, computed_field
+from typing import List, Optional
 from datetime import datetime
+from app.schemas.grade import GradeFull
 
 
 class ExamBase(BaseModel):
@@ -20,6 +21,7 @@ class ExamRead(ExamBase):
     created_at: datetime
     updated_at: Optional[datetime]
     deleted_at: Optional[datetime]
+    version: int
 
 
 class ExamUpdate(BaseModel):
@@ -27,4 +29,21 @@ class ExamUpdate(BaseModel):
     date: Optional[datetime] = None
     type: Optional[str] = None
     weight: Optional[float] = None
-    max_score: Optional[float] = None
\ No newline at end of file
+    max_score: Optional[float] = None
+
+
+class ExamFull(ExamRead):
+    id: int
+    grades: List[GradeFull] = []
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def grade_count(self) -> int:
+        return len(self.grades)
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def average_grade(self) -> Optional[float]:
+        if not self.grades:
+            return None
+        return sum(g.grade.numeric for g in self.grades) / len(self.grades)
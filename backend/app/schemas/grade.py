@@ -12,3 +12,7 @@ class GradeUpdate(GradeBase):
 
 class GradeRead(GradeBase):
     exam_id: int
+    version: int
+
+class GradeFull(GradeRead):
+    id: int
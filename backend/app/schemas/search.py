@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import Literal
+
+
+class SearchHit(BaseModel):
+    entity: Literal["subject", "exam"]
+    id: int
+    subject_id: int
+    title: str
+    score: float
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, computed_field
+from typing import List, Optional
 from datetime import datetime
+from app.schemas.exam import ExamFull
 
 
 class SubjectBase(BaseModel):
@@ -20,9 +21,39 @@ class SubjectRead(SubjectBase):
     created_at: datetime
     updated_at: Optional[datetime]
     deleted_at: Optional[datetime]
+    version: int
 
 class SubjectUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     semester: Optional[str] = None
     teacher_name: Optional[str] = None
+
+
+class SubjectFull(SubjectRead):
+    # The ORM relationship is called "exam" but holds all exams of the subject
+    exams: List[ExamFull] = Field(default=[], validation_alias="exam")
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def exam_count(self) -> int:
+        return len(self.exams)
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def grade_count(self) -> int:
+        return sum(exam.grade_count for exam in self.exams)
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def average_grade(self) -> Optional[float]:
+        """Average of the exam averages, weighted by exam weight (default 1)."""
+        weighted = [
+            (exam.average_grade, 1.0 if exam.weight is None else exam.weight)
+            for exam in self.exams
+            if exam.average_grade is not None
+        ]
+        total_weight = sum(weight for _, weight in weighted)
+        if not total_weight:
+            return None
+        return sum(average * weight for average, weight in weighted) / total_weight
@@ -0,0 +1,44 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+from datetime import datetime
+from app.models.grade_enum import GradeEnum
+
+
+class SyncSubject(BaseModel):
+    id: int
+    user_id: int
+    name: str
+    description: Optional[str] = None
+    semester: Optional[str] = None
+    teacher_name: Optional[str] = None
+
+
+class SyncExam(BaseModel):
+    id: int
+    subject_id: int
+    title: str
+    date: datetime
+    type: Optional[str] = None
+    weight: Optional[float] = None
+    max_score: Optional[float] = None
+
+
+class SyncGrade(BaseModel):
+    id: int
+    exam_id: int
+    grade: GradeEnum
+
+
+class SyncDeleted(BaseModel):
+    entity: Literal["subject", "exam", "grade"]
+    id: int
+
+
+class SyncChanges(BaseModel):
+    subjects: List[SyncSubject] = []
+    exams: List[SyncExam] = []
+    grades: List[SyncGrade] = []
+    deleted: List[SyncDeleted] = []
+    # Pass as ``since`` on the next call
+    next_since: int
+    has_more: bool
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class TenantCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    shard: str = "default"
+
+
+class TenantRead(BaseModel):
+    id: int
+    name: str
+    shard: str
+    read_only: bool
+
+    class Config:
+        from_attributes = True
+
+
+class TenantReport(BaseModel):
+    # None: users without a tenant
+    tenant_id: Optional[int]
+    name: Optional[str]
+    shard: str
+    users: int
+    subjects: int
+    exams: int
+    grades: int
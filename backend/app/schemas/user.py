@@ -10,6 +10,7 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str = Field(..., min_length=1, max_length=50)
     role: Role
+    tenant_id: Optional[int] = None
 
 class UserUpdate(UserBase):
     password: Optional[str] = None
@@ -19,6 +20,7 @@ class UserInDBBase(UserBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     role: Role 
+    tenant_id: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,106 @@
+import pytest
+from fastapi import Request
+
+from app.api.deps import BATCH_SCOPE_KEY, get_db
+from app.core import admission, audit, events, idempotency
+from app.core.config import settings
+from app.main import app
+from app.models.audit import AuditEntry
+from app.models.subject import Subject
+
+
+def test_batch_runs_operations_and_reports_each_status(client_with_editor, db, test_editor):
+    subject = Subject(name="Math", user_id=test_editor.id)
+    db.add(subject)
+    db.commit()
+
+    response = client_with_editor.post("/api/v1/batch/", json={"operations": [
+        {"method": "GET", "path": f"/subjects/{subject.id}"},
+        {"method": "GET", "path": "/subjects/999"},
+        {"method": "POST", "path": "/subjects/create-subject", "body": {"user_id": test_editor.id, "name": "Art"}},
+        {"method": "GET", "path": "/nowhere"},
+        {"method": "GET", "path": "/batch/"},
+    ]})
+
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["status"] for r in results] == [200, 404, 201, 404, 400]
+    assert results[0]["body"]["name"] == "Math"
+    assert results[2]["body"]["name"] == "Art"
+
+
+@pytest.fixture
+def batch_client(client_with_editor, db):
+    # Let sub-requests use the batch session like the real get_db does
+    def override_get_db(request: Request):
+        batch = request.scope.get(BATCH_SCOPE_KEY)
+        yield batch.session if batch is not None else db
+
+    app.dependency_overrides[get_db] = override_get_db
+    return client_with_editor
+
+
+def test_atomic_batch_rolls_back_on_failure(batch_client, db, test_editor):
+    response = batch_client.post("/api/v1/batch/", json={"atomic": True, "operations": [
+        {"method": "POST", "path": "/subjects/create-subject", "body": {"user_id": test_editor.id, "name": "Art"}},
+        {"method": "GET", "path": "/subjects/999"},
+        {"method": "GET", "path": "/subjects/"},
+    ]})
+
+    assert [r["status"] for r in response.json()] == [201, 404, 424]
+    db.expire_all()
+    assert db.query(Subject).count() == 0
+
+
+def test_failed_atomic_batch_has_no_side_effects(batch_client, db, test_editor, monkeypatch):
+    monkeypatch.setattr(settings, "AUDIT_ENABLED", True)
+    idempotency.cache.clear()
+    published = []
+    monkeypatch.setattr(events.bus, "publish", lambda *change: published.append(change))
+    create = {"method": "POST", "path": "/subjects/create-subject", "body": {"user_id": test_editor.id, "name": "Art"}}
+
+    response = batch_client.post(
+        "/api/v1/batch/", headers={"Idempotency-Key": "k1"},
+        json={"atomic": True, "operations": [create, {"method": "GET", "path": "/subjects/999"}]},
+    )
+    audit.writer.shutdown()
+
+    assert [r["status"] for r in response.json()] == [201, 404]
+    assert db.query(AuditEntry).count() == 0
+    assert published == []
+    retry = batch_client.post("/api/v1/subjects/create-subject", json=create["body"], headers={"Idempotency-Key": "k1"})
+    assert retry.status_code == 201
+    assert idempotency.REPLAY_HEADER not in retry.headers
+
+
+def test_atomic_batch_side_effects_follow_its_commit(batch_client, db, test_editor, monkeypatch):
+    monkeypatch.setattr(settings, "AUDIT_ENABLED", True)
+    published = []
+    monkeypatch.setattr(events.bus, "publish", lambda *change: published.append(change))
+
+    response = batch_client.post("/api/v1/batch/", json={"atomic": True, "operations": [
+        {"method": "POST", "path": "/subjects/create-subject", "body": {"user_id": test_editor.id, "name": "Art"}},
+    ]})
+    audit.writer.shutdown()
+
+    assert [r["status"] for r in response.json()] == [201]
+    assert [e.entity for e in db.query(AuditEntry)] == ["subject"]
+    assert len(published) == 1
+
+
+def test_sub_requests_pass_admission_control(client_with_editor, monkeypatch):
+    groups = []
+
+    def route_group(method, path):
+        groups.append((method, path))
+        return "default"
+
+    monkeypatch.setattr(admission, "route_group", route_group)
+
+    response = client_with_editor.post("/api/v1/batch/", json={"operations": [
+        {"method": "GET", "path": "/subjects/"},
+        {"method": "GET", "path": "/exams/"},
+    ]})
+
+    assert response.status_code == 200
+    assert groups == [("POST", "/api/v1/batch/"), ("GET", "/api/v1/subjects/"), ("GET", "/api/v1/exams/")]
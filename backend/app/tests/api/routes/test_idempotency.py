@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core import idempotency
+from app.models.idempotency import IdempotencyKey
+from app.models.subject import Subject
+from app.schemas.subject import SubjectCreate
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    idempotency.cache.clear()
+    yield
+    idempotency.cache.clear()
+
+
+def _create(client, user_id, name, key=None):
+    headers = {"Idempotency-Key": key} if key else {}
+    return client.post(
+        "/api/v1/subjects/create-subject", json={"user_id": user_id, "name": name}, headers=headers
+    )
+
+
+def test_retry_replays_original_response(client_with_editor, db, test_editor):
+    first = _create(client_with_editor, test_editor.id, "Math", key="abc")
+    retry = _create(client_with_editor, test_editor.id, "Math", key="abc")
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers[idempotency.REPLAY_HEADER] == "true"
+    assert db.query(Subject).count() == 1
+
+
+def test_replay_from_table_after_cache_loss(client_with_editor, db, test_editor):
+    first = _create(client_with_editor, test_editor.id, "Math", key="abc")
+    idempotency.cache.clear()
+
+    retry = _create(client_with_editor, test_editor.id, "Math", key="abc")
+
+    assert retry.json()["id"] == first.json()["id"]
+    assert db.query(Subject).count() == 1
+
+
+def test_key_reused_for_other_request(client_with_editor, test_editor):
+    _create(client_with_editor, test_editor.id, "Math", key="abc")
+
+    response = _create(client_with_editor, test_editor.id, "Art", key="abc")
+
+    assert response.status_code == 422
+
+
+def test_failed_request_releases_key(client_with_editor, db, test_superuser):
+    # Editors can't create subjects for others
+    assert _create(client_with_editor, test_superuser.id, "Math", key="abc").status_code == 400
+
+    response = _create(client_with_editor, test_superuser.id, "Math", key="abc")
+
+    assert response.status_code == 400
+    assert db.query(Subject).count() == 0
+
+
+def _claim(db, user_id, lease_ends_at):
+    # Claimed by a request for the same subject that is running or crashed
+    fingerprint = idempotency._fingerprint("create-subject", SubjectCreate(user_id=user_id, name="Math"))
+    db.add(IdempotencyKey(user_id=user_id, key="abc", fingerprint=fingerprint, expires_at=lease_ends_at))
+    db.commit()
+
+
+def test_running_claim_answers_in_progress(client_with_editor, db, test_editor):
+    _claim(db, test_editor.id, datetime.utcnow() + timedelta(seconds=60))
+
+    response = _create(client_with_editor, test_editor.id, "Math", key="abc")
+
+    assert response.status_code == 409
+
+
+def test_lapsed_claim_of_crashed_request_can_be_retried(client_with_editor, db, test_editor):
+    _claim(db, test_editor.id, datetime.utcnow() - timedelta(seconds=1))
+
+    response = _create(client_with_editor, test_editor.id, "Math", key="abc")
+
+    assert response.status_code == 201
+    assert db.query(Subject).count() == 1
+
+
+def test_claim_is_kept_if_storing_the_response_fails(client_with_editor, db, test_editor, monkeypatch):
+    def fail(*_args):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(idempotency.crud, "complete_idempotency_key", fail)
+    with pytest.raises(RuntimeError):
+        _create(client_with_editor, test_editor.id, "Math", key="abc")
+    monkeypatch.undo()
+
+    # The subject was written, a retry must not write it again
+    response = _create(client_with_editor, test_editor.id, "Math", key="abc")
+
+    assert response.status_code == 409
+    assert db.query(Subject).count() == 1
+
+
+def test_without_key_every_request_creates(client_with_editor, db, test_editor):
+    _create(client_with_editor, test_editor.id, "Math")
+    _create(client_with_editor, test_editor.id, "Math")
+
+    assert db.query(Subject).count() == 2
@@ -0,0 +1,14 @@
+def test_put_with_if_match(client_with_editor, test_editor):
+    created = client_with_editor.post(
+        "/api/v1/subjects/create-subject", json={"user_id": test_editor.id, "name": "Math"}
+    ).json()
+    url = f"/api/v1/subjects/update-subject/{created['id']}"
+
+    first = client_with_editor.put(url, json={"name": "Maths"}, headers={"If-Match": f'"{created["version"]}"'})
+    stale = client_with_editor.put(url, json={"name": "Algebra"}, headers={"If-Match": f'"{created["version"]}"'})
+
+    assert first.status_code == 201
+    assert first.headers["ETag"] == '"2"'
+    assert first.json()["name"] == "Maths"
+    assert stale.status_code == 409
+    assert client_with_editor.put(url, json={"name": "x"}, headers={"If-Match": "abc"}).status_code == 400
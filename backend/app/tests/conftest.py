@@ -1,11 +1,14 @@
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
 from datetime import datetime, timezone
 from passlib.context import CryptContext
 
+from app.core import audit
+from app.core.config import settings
 from app.database.session import Base
+from app.database.sqlite import enable_savepoints
 from app.api.deps import get_db, get_current_user
 from app.models.user import User
 from app.models.role import Role
@@ -13,6 +16,13 @@ from app.main import app
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# Like the SQLite mode of the app: savepoints for atomic batches, and WAL so
+# open read transactions don't block the background audit writer
+enable_savepoints(engine)
+
+@event.listens_for(engine, "connect")
+def _use_wal(dbapi_connection, _record):
+    dbapi_connection.execute("PRAGMA journal_mode=WAL")
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -20,6 +30,12 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
+@pytest.fixture(autouse=True)
+def no_audit(monkeypatch):
+    # The background audit writer would mix its INSERTs into other tests'
+    # statements, tests of the audit log turn it on
+    monkeypatch.setattr(settings, "AUDIT_ENABLED", False)
+
 @pytest.fixture(scope="function")
 def db():
     Base.metadata.create_all(bind=engine)
@@ -29,6 +45,8 @@ def db():
     finally:
         session.rollback()
         session.close()
+        # Audit entries are written in the background, finish before dropping the tables
+        audit.writer.shutdown()
         Base.metadata.drop_all(bind=engine)
 
 @pytest.fixture(scope="function")
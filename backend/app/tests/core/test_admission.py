@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app.core.admission import AdmissionRejected, ConcurrencyLimit, route_group
+from app.core.metrics import metrics
+
+
+def test_route_groups():
+    assert route_group("GET", "/api/v1/grades/") == "heavy"
+    assert route_group("GET", "/api/v1/subjects/full") == "heavy"
+    assert route_group("GET", "/api/v1/subjects/3") == "default"
+    assert route_group("POST", "/api/v1/login/") == "auth"
+    assert route_group("POST", "/api/v1/login/refresh") == "auth"
+    assert route_group("POST", "/api/v1/login/me") == "default"
+    assert route_group("POST", "/api/v1/login/logout") == "default"
+    assert route_group("GET", "/api/v1/events/") == "unlimited"
+    assert route_group("POST", "/api/v1/batch/") == "unlimited"
+
+
+def test_waiters_are_admitted_in_order():
+    async def scenario():
+        limit = ConcurrencyLimit("test-order", limit=1, queue_size=2, timeout=1)
+        order = []
+
+        async def request(n):
+            await limit.acquire()
+            order.append(n)
+            await asyncio.sleep(0.01)
+            limit.release()
+
+        await asyncio.gather(*(request(n) for n in range(3)))
+        return order, limit.active
+
+    order, active = asyncio.run(scenario())
+
+    assert order == [0, 1, 2]
+    assert active == 0
+
+
+def test_full_queue_rejects():
+    async def scenario():
+        limit = ConcurrencyLimit("test-full", limit=1, queue_size=0, timeout=1)
+        await limit.acquire()
+        with pytest.raises(AdmissionRejected):
+            await limit.acquire()
+        limit.release()
+
+    asyncio.run(scenario())
+
+    assert metrics.snapshot()["counters"]["admission.test-full.rejected"] >= 1
+
+
+def test_wait_times_out():
+    async def scenario():
+        limit = ConcurrencyLimit("test-timeout", limit=1, queue_size=1, timeout=0.01)
+        await limit.acquire()
+        with pytest.raises(AdmissionRejected):
+            await limit.acquire()
+        limit.release()
+        return limit.active
+
+    assert asyncio.run(scenario()) == 0
+    assert metrics.snapshot()["gauges"]["admission.test-timeout.queued"] == 0
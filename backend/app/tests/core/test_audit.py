@@ -0,0 +1,148 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core import audit, security
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.crud import audit as crud
+from app.crud import exam as exam_crud
+from app.crud import grade as grade_crud
+from app.crud import subject as subject_crud
+from app.crud import tenant as tenant_crud
+from app.crud import user as user_crud
+from app.models.audit import AuditEntry
+from app.models.grade_enum import GradeEnum
+from app.models.role import Role
+from app.schemas.exam import ExamCreate
+from app.schemas.grade import GradeCreate, GradeUpdate
+from app.schemas.subject import SubjectCreate, SubjectUpdate
+from app.schemas.tenant import TenantCreate
+from app.schemas.user import UserCreate
+
+
+@pytest.fixture(autouse=True)
+def audit_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "AUDIT_ENABLED", True)
+
+
+def entry(entity_id=1):
+    return {
+        "created_at": datetime.now(timezone.utc), "principal_id": 1, "entity": "grade",
+        "entity_id": entity_id, "action": "created", "changes": {},
+    }
+
+
+def count_entries(db):
+    return db.scalar(select(func.count()).select_from(AuditEntry))
+
+
+def test_writes_are_audited_with_their_changes(db, test_editor, test_superuser):
+    subject = subject_crud.create_subject(db, SubjectCreate(user_id=test_editor.id, name="Mathe"), test_editor.id)
+    subject_crud.update_subject(db, subject.id, SubjectUpdate(name="Mathematik", semester="WS"), test_editor.id)
+    exam = exam_crud.create_exam(db, ExamCreate(title="Test", date=datetime(2025, 5, 1), subject_id=subject.id), test_editor.id)
+    grade = grade_crud.create_grade(db, GradeCreate(exam_id=exam.id, grade=GradeEnum.gut), test_editor.id)
+    grade_crud.update_grade(db, grade.id, GradeUpdate(grade=GradeEnum.sehr_gut), test_editor.id, expected_version=1)
+    grade_crud.delete_grade(db, grade.id, test_editor.id)
+    audit.writer.shutdown()
+
+    entries = crud.get_audit_log(db, test_superuser.id)["entries"]
+
+    assert [(e.entity, e.action) for e in entries] == [
+        ("grade", "deleted"), ("grade", "updated"), ("grade", "created"),
+        ("exam", "created"), ("subject", "updated"), ("subject", "created"),
+    ]
+    assert all(e.principal_id == test_editor.id for e in entries)
+    assert entries[-2].changes == {"name": {"old": "Mathe", "new": "Mathematik"}, "semester": {"old": None, "new": "WS"}}
+    # Conditional updates only know the new values
+    assert entries[1].changes == {"grade": {"new": "Sehr gut"}}
+    assert entries[0].changes["grade"] == {"old": "Sehr gut"}
+    assert entries[2].changes["exam_id"] == {"new": exam.id}
+
+
+def test_user_and_tenant_writes_are_audited(db, test_superuser):
+    tenant = tenant_crud.create_tenant(db, TenantCreate(name="Schule"), test_superuser.id)
+
+    async def create_user():
+        try:
+            return await user_crud.create_user(
+                db=db, user=UserCreate(username="neuer", email="neu@example.com", password="Secret123", role=Role.EDITOR, tenant_id=tenant.id),
+                owner_id=test_superuser.id,
+            )
+        finally:
+            security.shutdown_password_pool()
+
+    user = asyncio.run(create_user())
+    audit.writer.shutdown()
+
+    entries = crud.get_audit_log(db, test_superuser.id)["entries"]
+
+    assert [(e.entity, e.entity_id, e.principal_id) for e in entries] == [
+        ("user", user.id, test_superuser.id), ("tenant", tenant.id, test_superuser.id),
+    ]
+    assert entries[0].changes["hashed_password"] == {"new": audit.REDACTED}
+    assert entries[0].changes["tenant_id"] == {"new": tenant.id}
+    assert entries[1].changes["name"] == {"new": "Schule"}
+
+
+def test_rolled_back_writes_are_not_audited(db, test_editor):
+    audit.record(db, test_editor.id, "grade", 1, "created", new={"grade": "Gut"})
+    db.rollback()
+    audit.writer.shutdown()
+
+    assert count_entries(db) == 0
+
+
+def test_audit_log_pages(db, test_superuser):
+    engine = db.get_bind()
+    audit.writer.submit(engine, [entry(i) for i in range(5)])
+    audit.writer.shutdown()
+
+    first = crud.get_audit_log(db, test_superuser.id, limit=3)
+    second = crud.get_audit_log(db, test_superuser.id, before=first["next_before"], limit=3)
+
+    assert [e.entity_id for e in first["entries"]] == [4, 3, 2]
+    assert first["has_more"] is True
+    assert [e.entity_id for e in second["entries"]] == [1, 0]
+    assert second["has_more"] is False and second["next_before"] is None
+    assert [e.entity_id for e in crud.get_audit_log(db, test_superuser.id, entity_id=3)["entries"]] == [3]
+
+
+def test_full_queue_writes_in_the_caller(db, monkeypatch):
+    writer = audit.AuditWriter(max_queue=1, batch_size=10, enqueue_timeout=0.01, shutdown_timeout=5.0)
+    # No writer thread draining the queue
+    monkeypatch.setattr(writer, "_start", lambda: None)
+    before = metrics.snapshot()["counters"].get("audit.sync_writes", 0)
+
+    writer.submit(db.get_bind(), [entry(1), entry(2), entry(3)])
+
+    assert writer._queue.qsize() == 1
+    assert count_entries(db) == 2
+    assert metrics.snapshot()["counters"]["audit.sync_writes"] == before + 1
+
+
+def test_shutdown_writes_queued_entries(db):
+    writer = audit.AuditWriter(max_queue=100, batch_size=2, enqueue_timeout=1.0, shutdown_timeout=5.0)
+    writer.submit(db.get_bind(), [entry(i) for i in range(5)])
+
+    writer.shutdown()
+
+    assert count_entries(db) == 5
+
+
+def test_audit_endpoint_is_for_superusers(client_with_editor):
+    response = client_with_editor.get("/api/v1/audit/")
+
+    assert response.status_code == 403
+
+
+def test_audit_endpoint_filters_by_entity(client_with_superuser, db):
+    audit.writer.submit(db.get_bind(), [entry(1), {**entry(2), "entity": "exam"}])
+    audit.writer.shutdown()
+
+    response = client_with_superuser.get("/api/v1/audit/", params={"entity": "exam"})
+
+    assert response.status_code == 200
+    assert [e["entity_id"] for e in response.json()["entries"]] == [2]
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.coalesce import SingleFlight
+
+
+def test_concurrent_sync_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def query():
+        calls.append(1)
+        release.wait(1)
+        return ["row"]
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.do, "key", query, "test") for _ in range(4)]
+        while not flight._calls:
+            pass
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert results == [["row"]] * 4
+    assert not flight._calls
+
+
+def test_sync_errors_are_shared_and_not_cached():
+    flight = SingleFlight()
+
+    with pytest.raises(ValueError):
+        flight.do("key", lambda: (_ for _ in ()).throw(ValueError()), "test")
+
+    assert flight.do("key", lambda: 1, "test") == 1
+
+
+def test_concurrent_async_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def query():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "row"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do_async(("k", 1), query, "test") for _ in range(3)))
+
+    assert asyncio.run(scenario()) == ["row"] * 3
+    assert len(calls) == 1
+
+
+def test_coalesced_route_returns_same_payload(client_with_superuser, db, test_superuser):
+    from app.models.subject import Subject
+
+    db.add(Subject(name="Math", user_id=test_superuser.id))
+    db.commit()
+
+    response = client_with_superuser.get("/api/v1/subjects/full")
+
+    assert response.status_code == 200
+    assert response.json()[0]["name"] == "Math"
+    assert response.json()[0]["exam_count"] == 0
+
+
+def test_superusers_share_reads_only_within_a_shard(test_superuser):
+    from sqlalchemy.orm import Session
+
+    from app.core.coalesce import _principal_scope
+
+    default, shard = Session(), Session()
+    shard.info["shard"] = "shard-1"
+
+    assert _principal_scope(test_superuser, default) == "superuser:default"
+    assert _principal_scope(test_superuser, shard) == "superuser:shard-1"
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.api.routes import events as events_route
+from app.core import security
+from app.core.config import settings
+from app.core.events import EventBus, bus
+from app.crud import subject as subject_crud
+from app.database.session import Base
+from app.main import app
+from app.models.role import Role
+from app.models.user import User
+from app.schemas.subject import SubjectCreate, SubjectUpdate
+
+
+def test_publish_reaches_only_visible_subscribers():
+    async def scenario():
+        events = EventBus(queue_size=10)
+        owner = events.subscribe(user_id=1, is_superuser=False)
+        other = events.subscribe(user_id=2, is_superuser=False)
+        admin = events.subscribe(user_id=3, is_superuser=True)
+
+        events.publish(1, "grade", 7, "created", owner_id=1)
+        await asyncio.sleep(0)
+
+        return owner.queue.qsize(), other.queue.qsize(), admin.queue.qsize()
+
+    assert asyncio.run(scenario()) == (1, 0, 1)
+
+
+def test_reconnect_replays_changes_from_the_database(client, db, test_editor, monkeypatch):
+    subject = subject_crud.create_subject(db, SubjectCreate(user_id=test_editor.id, name="Sport"), test_editor.id)
+    seen = subject.change_seq
+    subject_crud.update_subject(db, subject.id, SubjectUpdate(name="Turnen"), test_editor.id)
+    other = subject_crud.create_subject(db, SubjectCreate(user_id=test_editor.id, name="Kunst"), test_editor.id)
+    subject_crud.delete_subject(db, other.id, test_editor.id)
+    replayed = []
+
+    async def stream(_request, subscriber, backlog):
+        replayed.append(backlog)
+        bus.unsubscribe(subscriber)
+        yield ": opened\n\n"
+
+    monkeypatch.setattr(events_route, "_stream", stream)
+    monkeypatch.setitem(app.dependency_overrides, deps.get_streaming_user, lambda: test_editor)
+
+    # Any worker can replay, the ids are change sequences
+    client.get("/api/v1/events/", headers={"Last-Event-ID": str(seen)})
+    client.get("/api/v1/events/", headers={"Last-Event-ID": "other-boot:3"})
+    monkeypatch.setattr(settings, "EVENTS_REPLAY_LIMIT", 1)
+    client.get("/api/v1/events/", headers={"Last-Event-ID": str(seen)})
+
+    assert [(c.entity_id, c.operation) for c in replayed[0]] == [(subject.id, "updated"), (other.id, "deleted")]
+    assert replayed[0][0].seq > seen
+    assert replayed[1] is None
+    assert replayed[2] is None
+
+
+def test_crud_write_published_after_commit(db, test_editor):
+    async def scenario():
+        subscriber = bus.subscribe(user_id=test_editor.id, is_superuser=False)
+        try:
+            subject = subject_crud.create_subject(
+                db, SubjectCreate(user_id=test_editor.id, name="Sport"), test_editor.id
+            )
+            change = await asyncio.wait_for(subscriber.queue.get(), timeout=1)
+        finally:
+            bus.unsubscribe(subscriber)
+        return subject, change
+
+    subject, change = asyncio.run(scenario())
+
+    assert (change.entity, change.entity_id, change.operation) == ("subject", subject.id, "created")
+    assert change.seq == subject.change_seq
+
+
+def test_open_stream_holds_no_connection(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(username="sse", email="sse@example.com", hashed_password="!", role=Role.EDITOR, created_at=datetime(2025, 1, 1)))
+        session.commit()
+    monkeypatch.setattr(deps, "get_engine", lambda: engine)
+    monkeypatch.setattr(app, "dependency_overrides", {})
+
+    checked_out = []
+
+    async def stream(_request, subscriber, _backlog):
+        # Runs while the response is streamed
+        checked_out.append(engine.pool.checkedout())
+        bus.unsubscribe(subscriber)
+        yield ": opened\n\n"
+
+    monkeypatch.setattr(events_route, "_stream", stream)
+    token = security.create_access_token("sse@example.com", timedelta(minutes=5))
+
+    response = TestClient(app).get("/api/v1/events/", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert checked_out == [0]
+    engine.dispose()
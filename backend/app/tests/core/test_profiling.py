@@ -0,0 +1,70 @@
+import time
+
+import anyio
+import anyio.to_thread
+
+from app.core import profiling
+
+
+def _busy_handler(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_samples_threadpool_work_of_the_profiled_request():
+    sampler = profiling.Sampler(interval=0.001, buffer_size=2)
+    profile = sampler.start("GET", "/api/v1/subjects/")
+    token = profiling._active.set(profile)
+    try:
+        anyio.run(anyio.to_thread.run_sync, _busy_handler, 0.1)
+    finally:
+        profiling._active.reset(token)
+        sampler.finish(profile)
+
+    assert profile.samples
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in profile.collapsed().splitlines())
+    assert any("_busy_handler (" in stack for stack in profile.samples)
+    assert sampler.get(profile.id) is profile
+
+
+def test_ignores_work_of_other_requests():
+    sampler = profiling.Sampler(interval=0.001, buffer_size=2)
+    profile = sampler.start("GET", "/api/v1/subjects/")
+    try:
+        anyio.run(anyio.to_thread.run_sync, _busy_handler, 0.05)
+    finally:
+        sampler.finish(profile)
+
+    assert not profile.samples
+
+
+def test_ring_buffer_keeps_the_latest_profiles():
+    sampler = profiling.Sampler(interval=0.001, buffer_size=2)
+    for _ in range(3):
+        sampler.finish(sampler.start("GET", "/"))
+
+    assert [profile.id for profile in sampler.recent()] == [3, 2]
+    assert sampler.get(1) is None
+
+
+def test_profile_requested_by_superuser(client_with_superuser):
+    token = client_with_superuser.post("/api/v1/profiles/token").json()["token"]
+
+    response = client_with_superuser.get("/api/v1/subjects/", headers={"X-Profile": token})
+    profile_id = response.headers["x-profile-id"]
+
+    listed = client_with_superuser.get("/api/v1/profiles/").json()
+    assert listed[0]["id"] == int(profile_id)
+    assert listed[0]["path"] == "/api/v1/subjects/"
+    assert client_with_superuser.get(f"/api/v1/profiles/{profile_id}").status_code == 200
+
+
+def test_invalid_profile_header_is_ignored(client_with_superuser):
+    response = client_with_superuser.get("/api/v1/subjects/", headers={"X-Profile": "forged"})
+
+    assert "x-profile-id" not in response.headers
+
+
+def test_profiles_require_superuser(client_with_editor):
+    assert client_with_editor.get("/api/v1/profiles/").status_code == 403
@@ -0,0 +1,83 @@
+import time
+
+from app.core.rate_limit import TokenBucketLimiter
+
+
+def test_bucket_allows_burst_then_rejects():
+    limiter = TokenBucketLimiter(capacity=3, refill_per_second=1)
+
+    results = [limiter.acquire("email:a@example.com") for _ in range(4)]
+
+    assert results[:3] == [0.0, 0.0, 0.0]
+    assert 0 < results[3] <= 1
+
+
+def test_buckets_are_independent():
+    limiter = TokenBucketLimiter(capacity=1, refill_per_second=1)
+
+    assert limiter.acquire("ip:10.0.0.1") == 0.0
+    assert limiter.acquire("ip:10.0.0.2") == 0.0
+    assert limiter.acquire("ip:10.0.0.1") > 0
+
+
+def test_bucket_refills():
+    limiter = TokenBucketLimiter(capacity=1, refill_per_second=100)
+
+    limiter.acquire("key")
+    time.sleep(0.02)
+
+    assert limiter.acquire("key") == 0.0
+
+
+def test_full_buckets_are_evicted():
+    limiter = TokenBucketLimiter(capacity=1, refill_per_second=1000, evict_interval=0.0)
+
+    limiter.acquire("old")
+    time.sleep(0.01)
+    limiter.acquire("new")
+
+    assert len(limiter) == 1
+
+
+def test_refund_returns_a_token():
+    limiter = TokenBucketLimiter(capacity=1, refill_per_second=0.01)
+
+    limiter.acquire("key")
+    limiter.refund("key")
+
+    assert limiter.acquire("key") == 0.0
+
+
+def test_ip_rejections_leave_the_email_budget_alone(monkeypatch):
+    from app.core import rate_limit
+
+    monkeypatch.setattr(rate_limit, "email_limiter", TokenBucketLimiter(capacity=2, refill_per_second=0.01))
+    monkeypatch.setattr(rate_limit, "ip_limiter", TokenBucketLimiter(capacity=1, refill_per_second=0.01))
+
+    flood = [rate_limit.check_login_attempt("victim@example.com", "10.0.0.1") for _ in range(5)]
+
+    assert flood[0] == 0.0
+    assert all(retry_after > 0 for retry_after in flood[1:])
+    assert rate_limit.check_login_attempt("victim@example.com", "10.0.0.2") == 0.0
+
+
+def test_login_is_throttled_before_authentication(client, monkeypatch):
+    from app.core import rate_limit
+    from app.crud import user as crud
+
+    monkeypatch.setattr(rate_limit, "email_limiter", TokenBucketLimiter(capacity=2, refill_per_second=0.01))
+    calls = []
+
+    async def fake_authenticate(**kwargs):
+        calls.append(kwargs)
+        return None
+
+    monkeypatch.setattr(crud, "authenticate_user_async", fake_authenticate)
+
+    statuses = [
+        client.post("/api/v1/login/", data={"username": "a@example.com", "password": "x"}).status_code
+        for _ in range(3)
+    ]
+
+    assert statuses == [400, 400, 429]
+    assert len(calls) == 2
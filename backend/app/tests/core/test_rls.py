@@ -0,0 +1,110 @@
+import os
+from datetime import datetime, timezone
+from unittest.mock import Mock
+
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app.core import rls
+from app.core.config import settings
+from app.crud.subject import get_subjects
+from app.database.session import Base
+from app.models.role import Role
+from app.models.subject import Subject
+from app.models.user import User
+
+# The policies only exist on Postgres, e.g.
+# TEST_POSTGRES_URL=postgresql+psycopg://postgres:pw@localhost:5432/app-grade-tracker-test
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+
+@pytest.fixture
+def postgres_db(monkeypatch):
+    if not POSTGRES_URL:
+        pytest.skip("needs a Postgres database in TEST_POSTGRES_URL")
+    monkeypatch.setattr(settings, "OWNERSHIP_ENFORCEMENT", "rls")
+    engine = create_engine(POSTGRES_URL)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        rls.apply_policies(connection)
+    try:
+        with Session(engine) as session:
+            yield session
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+def add_user(db, username: str, role: Role) -> User:
+    user = User(
+        username=username,
+        email=f"{username}@example.com",
+        role=role,
+        hashed_password="",
+        created_at=datetime.now(timezone.utc),
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_rls_mode_falls_back_to_query_filters_without_postgres(db, test_editor, test_superuser, monkeypatch):
+    monkeypatch.setattr(settings, "OWNERSHIP_ENFORCEMENT", "rls")
+    db.add_all([
+        Subject(name="Own", user_id=test_editor.id),
+        Subject(name="Foreign", user_id=test_superuser.id),
+    ])
+    db.commit()
+
+    rls.set_principal(db, test_editor.id, Role.EDITOR)
+
+    assert not rls.is_active(db)
+    assert [s.name for s in get_subjects(db, test_editor.id)] == ["Own"]
+
+
+def test_transactions_carry_the_principal():
+    session = Session()
+    session.info["rls_principal"] = (7, Role.EDITOR)
+    connection = Mock()
+
+    rls._apply_principal(session, None, connection)
+
+    assert event.contains(Session, "after_begin", rls._apply_principal)
+    connection.exec_driver_sql.assert_called_once_with(f"SET LOCAL ROLE {rls.RLS_ROLE}")
+    (statement,), _ = connection.execute.call_args
+    assert list(statement.compile(dialect=postgresql.dialect()).params.values()) == [
+        "app.user_id", "7", True, "app.user_role", Role.EDITOR.name, True,
+    ]
+
+
+def test_policies_hide_rows_of_other_users(postgres_db):
+    owner = add_user(postgres_db, "owner", Role.EDITOR)
+    other = add_user(postgres_db, "other", Role.EDITOR)
+    postgres_db.add_all([Subject(name="Own", user_id=owner.id), Subject(name="Foreign", user_id=other.id)])
+    postgres_db.commit()
+
+    rls.set_principal(postgres_db, owner.id, Role.EDITOR)
+
+    assert rls.is_active(postgres_db)
+    assert postgres_db.scalar(select(func.current_setting("app.user_id"))) == str(owner.id)
+    assert postgres_db.scalar(select(func.current_setting("app.user_role"))) == Role.EDITOR.name
+    # Unfiltered queries only see the principal's rows
+    assert postgres_db.scalars(select(Subject.name)).all() == ["Own"]
+    postgres_db.add(Subject(name="Planted", user_id=other.id))
+    with pytest.raises(DBAPIError):
+        postgres_db.flush()
+    postgres_db.rollback()
+
+
+def test_policies_let_superusers_see_all_rows(postgres_db):
+    owner = add_user(postgres_db, "owner", Role.EDITOR)
+    admin = add_user(postgres_db, "admin", Role.SUPERUSER)
+    postgres_db.add(Subject(name="Own", user_id=owner.id))
+    postgres_db.commit()
+
+    rls.set_principal(postgres_db, admin.id, Role.SUPERUSER)
+
+    assert postgres_db.scalars(select(Subject.name)).all() == ["Own"]
@@ -0,0 +1,71 @@
+import asyncio
+
+from app.core import password_worker, security
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+def test_verify_in_password_pool():
+    hashed = password_worker.hash_password("Kennwort1", settings.BCRYPT_ROUNDS)
+
+    async def scenario():
+        try:
+            return (
+                await security.verify_and_update_password("Kennwort1", hashed),
+                await security.verify_and_update_password("falsch", hashed),
+            )
+        finally:
+            security.shutdown_password_pool()
+
+    assert asyncio.run(scenario()) == ((True, None), (False, None))
+    assert metrics.snapshot()["gauges"]["password_hash.waiting"] == 0
+    assert metrics.snapshot()["gauges"]["password_hash.in_flight"] == 0
+
+
+def test_rehash_when_rounds_change():
+    old_hash = password_worker.hash_password("Kennwort1", 4)
+
+    valid, new_hash = password_worker.verify_and_update("Kennwort1", old_hash, 5)
+
+    assert valid
+    assert new_hash.startswith("$2b$05$")
+    assert password_worker.verify_and_update("Kennwort1", new_hash, 5) == (True, None)
+
+
+def test_authenticate_user_async_upgrades_hash(db, test_editor, monkeypatch):
+    from app.crud import user as crud
+
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+
+    async def scenario():
+        try:
+            return await crud.authenticate_user_async(db=db, email=test_editor.email, password="TestPass123")
+        finally:
+            security.shutdown_password_pool()
+
+    user = asyncio.run(scenario())
+
+    assert user.id == test_editor.id
+    assert user.hashed_password.startswith("$2b$05$")
+
+
+def test_create_user_hashes_in_password_pool(db, monkeypatch):
+    from app.crud import user as crud
+    from app.models.role import Role
+    from app.schemas.user import UserCreate
+
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    completed = metrics.snapshot()["counters"].get("password_hash.completed", 0)
+
+    async def scenario():
+        try:
+            return await crud.create_user(
+                db=db, user=UserCreate(username="neuer", email="neu@example.com", password="Secret123", role=Role.VIEWER)
+            )
+        finally:
+            security.shutdown_password_pool()
+
+    user = asyncio.run(scenario())
+
+    assert user.hashed_password.startswith("$2b$05$")
+    assert metrics.snapshot()["counters"]["password_hash.completed"] == completed + 1
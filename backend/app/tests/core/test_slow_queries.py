@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import create_engine, event
+
+from app.core import slow_queries
+from app.core.config import settings
+
+
+@pytest.fixture
+def record_all(monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0.0)
+    slow_queries.store.clear()
+    yield
+    slow_queries.store.clear()
+
+
+def test_normalize_replaces_literals_and_parameters():
+    statement = """SELECT subjects.id FROM subjects
+        WHERE subjects.user_id = %(user_id_1)s AND name = 'Math' AND id IN (%(id_1_1)s, %(id_1_2)s)
+        AND created::date > :since LIMIT 10"""
+
+    assert slow_queries.normalize(statement) == (
+        "SELECT subjects.id FROM subjects WHERE subjects.user_id = ? AND name = ? AND id IN (...) "
+        "AND created::date > ? LIMIT ?"
+    )
+
+
+def test_aggregates_by_fingerprint():
+    log = slow_queries.SlowQueryLog(max_size=2)
+    log.record("SELECT * FROM grades WHERE id = 1", (1,), 300.0, "GET /api/v1/grades/{grade_id}")
+    log.record("SELECT * FROM grades WHERE id = 2", (2,), 100.0, "GET /api/v1/grades/{grade_id}")
+    log.record("SELECT * FROM exams", (), 50.0, None)
+
+    grades, exams = log.entries()
+    assert grades.calls == 2
+    assert grades.max_ms == 300.0
+    assert grades.summary()["mean_ms"] == 200.0
+    assert grades.routes == {"GET /api/v1/grades/{grade_id}": 2}
+    assert grades.last_parameters == "(2,)"
+    assert exams.routes == {}
+
+
+def test_store_is_bounded():
+    log = slow_queries.SlowQueryLog(max_size=2)
+    for table in ("grades", "exams", "subjects"):
+        log.record(f"SELECT * FROM {table}", (), 1.0, None)
+
+    assert {entry.statement for entry in log.entries()} == {"SELECT * FROM exams", "SELECT * FROM subjects"}
+
+
+def test_explain_does_not_run_the_statement(monkeypatch):
+    engine = create_engine("sqlite://")
+    executed = []
+    event.listen(engine, "before_cursor_execute", lambda _conn, _cursor, statement, *_: executed.append(statement))
+    monkeypatch.setattr(slow_queries, "_pending", 1)
+
+    slow_queries._explain(engine, "key", "SELECT pg_notify('changes', '1')", ())
+
+    assert executed == ["EXPLAIN SELECT pg_notify('changes', '1')"]
+
+
+@pytest.mark.usefixtures("record_all")
+def test_records_the_originating_route(client_with_superuser):
+    client_with_superuser.get("/api/v1/subjects/")
+
+    entries = client_with_superuser.get("/api/v1/slow-queries/").json()
+    assert any("FROM subjects" in entry["statement"] and "GET /api/v1/subjects/" in entry["routes"] for entry in entries)
+
+
+def test_fast_queries_are_not_recorded(client_with_superuser, monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 10_000.0)
+    slow_queries.store.clear()
+
+    client_with_superuser.get("/api/v1/subjects/")
+
+    assert slow_queries.store.entries() == []
+
+
+def test_slow_queries_require_superuser(client_with_editor):
+    assert client_with_editor.get("/api/v1/slow-queries/").status_code == 403
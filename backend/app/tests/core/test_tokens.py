@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app.api import deps
+from app.api.deps import get_current_user
+from app.core import revocation, security
+from app.core.revocation import revocation_cache
+from app.crud import token as token_crud
+from app.exceptions.token import TokenAlreadyRevoked
+from app.main import app
+from app.models.token_revocation import TokenRevocation
+
+
+@pytest.fixture(autouse=True)
+def fresh_revocation_cache():
+    revocation_cache.clear()
+    yield
+    revocation_cache.clear()
+
+
+def login(client, monkeypatch):
+    monkeypatch.setattr(deps, "check_login_attempt", lambda *args: 0.0)
+    # Use the real token validation for these tests
+    app.dependency_overrides.pop(get_current_user, None)
+    response = client.post("/api/v1/login/", data={"username": "editor@example.com", "password": "TestPass123"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def me(client, access_token):
+    return client.post("/api/v1/login/me", headers={"Authorization": f"Bearer {access_token}"})
+
+
+def test_access_token_is_validated_without_user_lookup(client, test_editor, monkeypatch):
+    tokens = login(client, monkeypatch)
+
+    monkeypatch.setattr(deps, "get_user_by_email", lambda **kwargs: None)
+
+    response = me(client, tokens["access_token"])
+    assert response.status_code == 200
+    assert response.json()["id"] == test_editor.id
+
+
+@pytest.mark.usefixtures("test_editor")
+def test_crud_takes_the_role_from_the_token(client, db, monkeypatch):
+    tokens = login(client, monkeypatch)
+    statements = []
+
+    def listener(*args):
+        statements.append(args[2])
+
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        response = client.get("/api/v1/subjects/", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    assert not [statement for statement in statements if "FROM users" in statement]
+
+
+@pytest.mark.usefixtures("test_editor")
+def test_refresh_rotates_tokens(client, monkeypatch):
+    tokens = login(client, monkeypatch)
+
+    refreshed = client.post("/api/v1/login/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert refreshed.status_code == 200
+    assert me(client, refreshed.json()["access_token"]).status_code == 200
+
+    # Reusing the rotated refresh token revokes everything of the user
+    reused = client.post("/api/v1/login/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert reused.status_code == 401
+    second = client.post("/api/v1/login/refresh", json={"refresh_token": refreshed.json()["refresh_token"]})
+    assert second.status_code == 401
+
+
+def test_concurrent_rotation_counts_as_reuse(client, db, test_editor, monkeypatch):
+    tokens = login(client, monkeypatch)
+    assert client.post("/api/v1/login/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+    # A second refresh that passed the check before the first one revoked the token
+    monkeypatch.setattr(token_crud, "is_token_revoked", lambda *args: False)
+
+    reused = client.post("/api/v1/login/refresh", json={"refresh_token": tokens["refresh_token"]})
+
+    assert reused.status_code == 401
+    monkeypatch.undo()
+    assert token_crud.is_token_revoked(db, "other", test_editor.id, datetime.now(timezone.utc) - timedelta(minutes=1))
+
+
+def test_token_is_revoked_once(db, test_editor):
+    token_crud.revoke_token(db, "jti", test_editor.id)
+
+    with pytest.raises(TokenAlreadyRevoked):
+        token_crud.revoke_token(db, "jti", test_editor.id)
+
+
+@pytest.mark.usefixtures("test_editor")
+def test_access_token_cannot_be_used_as_refresh_token(client, monkeypatch):
+    tokens = login(client, monkeypatch)
+
+    response = client.post("/api/v1/login/refresh", json={"refresh_token": tokens["access_token"]})
+    assert response.status_code == 401
+
+
+def test_revoked_user_is_rejected_through_cache(client, db, test_editor):
+    access_token = security.create_access_token(
+        test_editor.email,
+        timedelta(minutes=5),
+        claims={"uid": test_editor.id, "username": "editor", "role": "Editor", "created_at": "2025-01-01T00:00:00"},
+    )
+    app.dependency_overrides.pop(get_current_user, None)
+    assert me(client, access_token).status_code == 200
+
+    token_crud.revoke_user_tokens(db, test_editor.id)
+    revocation_cache.refresh(db, force=True)
+
+    assert me(client, access_token).status_code == 401
+
+
+def test_deactivation_revokes_the_users_tokens(client, test_editor, test_superuser, monkeypatch):
+    tokens = login(client, monkeypatch)
+    app.dependency_overrides[get_current_user] = lambda: test_superuser
+
+    response = client.delete(f"/api/v1/users/deactivate-user/{test_editor.id}")
+
+    assert response.status_code == 200
+    assert client.delete(f"/api/v1/users/deactivate-user/{test_editor.id}").status_code == 400
+    app.dependency_overrides.pop(get_current_user)
+    assert me(client, tokens["access_token"]).status_code == 401
+    assert client.post("/api/v1/login/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+
+def test_logout_purges_expired_revocations(client, db, test_editor, monkeypatch):
+    tokens = login(client, monkeypatch)
+    token_crud.revoke_token(db, "expired", test_editor.id, expires_at=datetime.now(timezone.utc) - timedelta(minutes=1))
+    monkeypatch.setattr(revocation, "_purged_at", float("-inf"))
+
+    assert client.post("/api/v1/login/logout", json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+
+    # Only the revocation of the logout is left
+    assert db.query(TokenRevocation).filter(TokenRevocation.jti == "expired").count() == 0
+    assert db.query(TokenRevocation).count() == 1
+
+
+def test_revocations_committed_out_of_id_order_are_picked_up(db, test_editor):
+    now = datetime.now(timezone.utc)
+    db.add(TokenRevocation(id=10, jti="first", user_id=test_editor.id, revoked_at=now))
+    db.commit()
+    revocation_cache.refresh(db, force=True)
+    # Took its id before the first one but committed after it
+    db.add(TokenRevocation(id=5, jti="second", user_id=test_editor.id, revoked_at=now - timedelta(seconds=1)))
+    db.commit()
+    revocation_cache.refresh(db, force=True)
+
+    assert revocation_cache.is_revoked({"jti": "first"})
+    assert revocation_cache.is_revoked({"jti": "second"})
@@ -0,0 +1,54 @@
+from sqlalchemy import select
+
+from app.core import tracing
+from app.core.config import settings
+from app.crud import subject as subject_crud
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+
+def test_parse_traceparent():
+    assert tracing.parse_traceparent(PARENT) == (TRACE_ID, "00f067aa0ba902b7", True)
+    assert tracing.parse_traceparent(PARENT[:-1] + "0")[2] is False
+    assert tracing.parse_traceparent("garbage") is None
+    assert tracing.parse_traceparent(None) is None
+
+
+def test_spans_nest_under_the_request(db, test_editor, monkeypatch):
+    exported = []
+    monkeypatch.setattr(tracing.exporter, "export", exported.append)
+
+    with tracing.start_root_span("GET /subjects/", tracing.parse_traceparent(PARENT)) as root:
+        subject_crud.get_subjects(db, test_editor.id)
+        db.execute(select(1))
+
+    names = [span.name for span in exported]
+    assert names[-1] == "GET /subjects/"
+    assert "crud.subject.get_subjects" in names
+    assert "SQL SELECT" in names
+    assert all(span.trace_id == TRACE_ID for span in exported)
+    crud_span = next(span for span in exported if span.name == "crud.subject.get_subjects")
+    assert crud_span.parent_id == root.span_id
+
+
+def test_unsampled_requests_record_nothing(db, test_editor, monkeypatch):
+    exported = []
+    monkeypatch.setattr(tracing.exporter, "export", exported.append)
+
+    subject_crud.get_subjects(db, test_editor.id)
+
+    assert exported == []
+
+
+def test_middleware_continues_incoming_trace(client_with_editor, monkeypatch):
+    exported = []
+    monkeypatch.setattr(tracing.exporter, "export", exported.append)
+    monkeypatch.setattr(settings, "TRACING_ENABLED", True)
+
+    response = client_with_editor.get("/api/v1/subjects/999", headers={"traceparent": PARENT})
+
+    assert response.headers["traceparent"].startswith(f"00-{TRACE_ID}-")
+    root = exported[-1]
+    assert root.name == "GET /api/v1/subjects/{subject_id}"
+    assert root.attributes["http.response.status_code"] == 404
@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from app.core import security, warmup
+from app.core.config import settings
+
+
+@pytest.fixture
+def warmup_state():
+    warmup.state.reset()
+    yield warmup.state
+    warmup.state.reset()
+
+
+# A user per role, for both variants of the hot statements
+@pytest.mark.usefixtures("test_superuser", "test_editor")
+def test_warm_up_fills_pool_and_caches(db, monkeypatch):
+    started = []
+    monkeypatch.setattr(security, "start_password_pool", lambda: started.append(True))
+    monkeypatch.setattr(settings, "WARMUP_POOL_CONNECTIONS", 3)
+    engine = db.get_bind()
+    state = warmup.WarmUp()
+
+    state.run(engine)
+
+    assert state.ready, state.error
+    assert set(state.durations) == {"connect", "open_pool", "statements", "caches"}
+    assert engine.pool.checkedin() >= 3
+    assert started == [True]
+
+
+def test_connect_gives_up_after_timeout():
+    engine = create_engine("sqlite:////nonexistent/dir/warmup.db")
+
+    with pytest.raises(OperationalError):
+        warmup.connect_with_backoff(engine, timeout=0.3)
+
+
+def test_unreachable_database_is_retried(monkeypatch):
+    monkeypatch.setattr(settings, "WARMUP_CONNECT_TIMEOUT_SECONDS", 0.1)
+    attempts = []
+    connect = warmup.connect_with_backoff
+
+    def connect_once_the_database_is_up(engine, timeout):
+        attempts.append(engine)
+        if len(attempts) == 1:
+            return connect(create_engine("sqlite:////nonexistent/dir/warmup.db"), timeout)
+        return None
+
+    monkeypatch.setattr(warmup, "connect_with_backoff", connect_once_the_database_is_up)
+    monkeypatch.setattr(warmup, "_RECONNECT_SECONDS", 0.01)
+    monkeypatch.setattr(warmup, "open_pool", lambda engine, count: [])
+    monkeypatch.setattr(warmup.WarmUp, "_warm_caches", staticmethod(lambda engine: None))
+    state = warmup.WarmUp()
+
+    state.run(object())
+
+    assert len(attempts) == 2
+    assert state.ready
+    assert state.error is None
+
+
+def test_warm_up_stops_while_the_database_is_unreachable(monkeypatch):
+    monkeypatch.setattr(settings, "WARMUP_CONNECT_TIMEOUT_SECONDS", 0.1)
+    state = warmup.WarmUp()
+
+    state.start(create_engine("sqlite:////nonexistent/dir/warmup.db"))
+    while state.error is None:
+        state.wait(0.01)
+    state.stop()
+    state._thread.join(timeout=5)
+
+    assert not state._thread.is_alive()
+    assert not state.ready
+    assert state.error.startswith("Database unreachable")
+
+
+def test_failed_warm_up_step_still_gets_ready(db, monkeypatch):
+    def fail(_engine):
+        raise RuntimeError("no password workers")
+
+    monkeypatch.setattr(warmup.WarmUp, "_warm_caches", staticmethod(fail))
+    state = warmup.WarmUp()
+
+    state.run(db.get_bind())
+
+    assert state.ready
+    assert state.error == "Warm-up failed: no password workers"
+
+
+def test_ready_is_gated_on_warm_up(client, warmup_state):
+    assert client.get("/ready").status_code == 503
+
+    warmup_state.mark_ready()
+
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
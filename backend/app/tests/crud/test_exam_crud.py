@@ -172,3 +172,41 @@ def test_delete_exam_no_access(db, test_superuser, test_editor):
 
     with pytest.raises(SubjectAccessDenied):
         crud.delete_exam(db, exam.id, owner_id=test_editor.id)
+
+
+def test_get_exams_by_ids_reports_status_per_id(db, test_superuser, test_editor):
+    from app.schemas.batch import BatchStatus
+
+    own = crud.create_exam(
+        db,
+        ExamCreate(title="Eigene", date=datetime(2025, 4, 1), subject_id=create_subject(db, test_editor).id),
+        owner_id=test_editor.id
+    )
+    foreign = crud.create_exam(
+        db,
+        ExamCreate(title="Fremde", date=datetime(2025, 4, 2), subject_id=create_subject(db, test_superuser).id),
+        owner_id=test_superuser.id
+    )
+
+    results = crud.get_exams_by_ids(db, [foreign.id, 9999, own.id], owner_id=test_editor.id)
+
+    assert [(r["id"], r["status"]) for r in results] == [
+        (foreign.id, BatchStatus.FORBIDDEN),
+        (9999, BatchStatus.NOT_FOUND),
+        (own.id, BatchStatus.OK),
+    ]
+    assert results[0]["item"] is None
+    assert results[2]["item"].title == "Eigene"
+
+    results = crud.get_exams_by_ids(db, [foreign.id, own.id], owner_id=test_superuser.id)
+    assert all(r["status"] == BatchStatus.OK for r in results)
+
+
+def test_get_exams_of_school_year(db, test_editor):
+    subject = create_subject(db, test_editor)
+    for title, date in (("Juli", datetime(2025, 7, 31)), ("August", datetime(2025, 8, 1)), ("Juni", datetime(2026, 6, 30))):
+        crud.create_exam(db, ExamCreate(title=title, date=date, subject_id=subject.id), owner_id=test_editor.id)
+
+    assert [e.title for e in crud.get_exams(db, test_editor.id, school_year=2025)] == ["August", "Juni"]
+    assert [e.title for e in crud.get_exams(db, test_editor.id, school_year=2024)] == ["Juli"]
+    assert len(crud.get_exams(db, test_editor.id)) == 3
@@ -9,6 +9,7 @@ from app.schemas.exam import ExamCreate
 from app.exceptions.subject import *
 from app.exceptions.exam import *
 from app.exceptions.grade import *
+from app.exceptions.concurrency import *
 
 def create_subject_and_exam(db, user):
     subject_data = SubjectCreate(
@@ -129,4 +130,67 @@ def test_delete_grade_subject_access_denied(db, test_superuser, test_editor):
     )
 
     with pytest.raises(SubjectAccessDenied):
-        crud.delete_grade(db, grade_id=grade.id, owner_id=test_editor.id)
\ No newline at end of file
+        crud.delete_grade(db, grade_id=grade.id, owner_id=test_editor.id)
+
+def test_get_grades_by_ids(db, test_superuser, test_editor):
+    from app.schemas.batch import BatchStatus
+
+    own = crud.create_grade(db, GradeCreate(exam_id=create_subject_and_exam(db, test_editor).id, grade=GradeEnum.gut), test_editor.id)
+    foreign = crud.create_grade(db, GradeCreate(exam_id=create_subject_and_exam(db, test_superuser).id, grade=GradeEnum.gut), test_superuser.id)
+
+    results = crud.get_grades_by_ids(db, [own.id, foreign.id, 4242], owner_id=test_editor.id)
+
+    assert [r["status"] for r in results] == [BatchStatus.OK, BatchStatus.FORBIDDEN, BatchStatus.NOT_FOUND]
+
+
+def test_update_grade_with_matching_version(db, test_editor):
+    exam = create_subject_and_exam(db, test_editor)
+    grade = crud.create_grade(db, GradeCreate(exam_id=exam.id, grade=GradeEnum.gut), test_editor.id)
+    assert grade.version == 1
+
+    updated = crud.update_grade(db, grade.id, GradeUpdate(grade=GradeEnum.sehr_gut), test_editor.id, expected_version=1)
+
+    assert updated.version == 2
+    assert updated.grade == GradeEnum.sehr_gut
+
+
+def test_update_grade_with_stale_version_conflicts(db, test_editor):
+    exam = create_subject_and_exam(db, test_editor)
+    grade = crud.create_grade(db, GradeCreate(exam_id=exam.id, grade=GradeEnum.gut), test_editor.id)
+    crud.update_grade(db, grade.id, GradeUpdate(grade=GradeEnum.sehr_gut), test_editor.id, expected_version=1)
+
+    with pytest.raises(VersionConflict):
+        crud.update_grade(db, grade.id, GradeUpdate(grade=GradeEnum.befriedigend), test_editor.id, expected_version=1)
+    with pytest.raises(GradeNotFound):
+        crud.update_grade(db, 999, GradeUpdate(grade=GradeEnum.befriedigend), test_editor.id, expected_version=1)
+
+
+def test_grades_follow_exam_school_year(db, test_superuser, test_editor):
+    exam = create_subject_and_exam(db, test_editor)
+    grade = crud.create_grade(db, GradeCreate(exam_id=exam.id, grade=GradeEnum.gut), owner_id=test_editor.id)
+
+    assert grade.exam_date == exam.date
+    for owner in (test_editor, test_superuser):
+        assert [g.id for g in crud.get_grades(db, owner.id, school_year=2024)] == [grade.id]
+        assert crud.get_grades(db, owner.id, school_year=2025) == []
+
+
+def test_grades_from_before_partitioning_get_their_exam_date(db, test_editor):
+    from sqlalchemy import text
+
+    from app.core import db as init
+    from app.models.grade import Grade
+
+    exam = create_subject_and_exam(db, test_editor)
+    db.execute(text("DROP TABLE grades"))
+    db.execute(text(
+        "CREATE TABLE grades (id INTEGER PRIMARY KEY, exam_id INTEGER NOT NULL REFERENCES exams (id), "
+        "grade VARCHAR(13) NOT NULL, change_seq BIGINT, version INTEGER NOT NULL DEFAULT 1)"
+    ))
+    db.execute(text("INSERT INTO grades (id, exam_id, grade) VALUES (1, :exam_id, 'gut')"), {"exam_id": exam.id})
+    db.commit()
+
+    init._upgrade_schema(db.get_bind())
+
+    assert db.get(Grade, 1).exam_date == exam.date
+    assert [g.id for g in crud.get_grades(db, test_editor.id, school_year=2024)] == [1]
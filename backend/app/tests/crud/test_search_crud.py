@@ -0,0 +1,86 @@
+import pytest
+from datetime import datetime
+from app.crud import search as crud
+from app.crud import subject as subject_crud
+from app.crud import exam as exam_crud
+from app.schemas.subject import SubjectCreate, SubjectUpdate
+from app.schemas.exam import ExamCreate
+
+
+def create_subject(db, user, name="Mathematik", teacher_name="Prof. Gauß"):
+    subject_data = SubjectCreate(
+        user_id=user.id,
+        name=name,
+        description="Analysis und Algebra",
+        semester="1",
+        teacher_name=teacher_name
+    )
+    return subject_crud.create_subject(db, subject_data, user.id)
+
+
+def create_exam(db, user, subject, title):
+    exam_data = ExamCreate(
+        title=title,
+        date=datetime(2025, 1, 15),
+        type="schriftlich",
+        weight=0.5,
+        max_score=100,
+        subject_id=subject.id
+    )
+    return exam_crud.create_exam(db, exam_data, user.id)
+
+
+def test_search_finds_exam_by_title(db, test_editor):
+    subject = create_subject(db, test_editor)
+    exam = create_exam(db, test_editor, subject, "Mathe Schularbeit")
+
+    hits = crud.search(db, "mathe schularbeit", owner_id=test_editor.id)
+
+    assert hits[0].entity == "exam"
+    assert hits[0].id == exam.id
+    assert hits[0].subject_id == subject.id
+
+
+def test_search_matches_prefix_and_teacher(db, test_editor):
+    subject = create_subject(db, test_editor, name="Physik", teacher_name="Dr. Newton")
+
+    hits = crud.search(db, "newt", owner_id=test_editor.id)
+
+    assert [(hit.entity, hit.id) for hit in hits] == [("subject", subject.id)]
+
+
+def test_search_filters_foreign_subjects(db, test_superuser, test_editor):
+    foreign = create_subject(db, test_superuser, name="Chemie")
+    create_exam(db, test_superuser, foreign, "Chemie Test")
+
+    assert crud.search(db, "chemie", owner_id=test_editor.id) == []
+    assert len(crud.search(db, "chemie", owner_id=test_superuser.id)) == 2
+
+
+def test_search_excludes_deleted_and_reflects_updates(db, test_editor):
+    subject = create_subject(db, test_editor, name="Latein")
+    exam = create_exam(db, test_editor, subject, "Vokabeltest")
+
+    exam_crud.delete_exam(db, exam.id, test_editor.id)
+    assert crud.search(db, "vokabeltest", owner_id=test_editor.id) == []
+
+    subject_crud.update_subject(db, subject.id, SubjectUpdate(name="Griechisch"), test_editor.id)
+    assert crud.search(db, "latein", owner_id=test_editor.id) == []
+    assert crud.search(db, "griechisch", owner_id=test_editor.id)[0].id == subject.id
+
+
+def test_search_pagination(db, test_editor):
+    subject = create_subject(db, test_editor, name="Deutsch")
+    for i in range(5):
+        create_exam(db, test_editor, subject, f"Deutsch Test {i}")
+
+    first = crud.search(db, "deutsch", owner_id=test_editor.id, limit=3)
+    second = crud.search(db, "deutsch", owner_id=test_editor.id, limit=3, offset=3)
+
+    assert len(first) == 3
+    assert len(second) == 3
+    assert not {(h.entity, h.id) for h in first} & {(h.entity, h.id) for h in second}
+
+
+def test_search_ignores_operators(db, test_editor):
+    assert crud.search(db, '" * OR -', owner_id=test_editor.id) == []
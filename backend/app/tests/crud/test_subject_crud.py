@@ -1,4 +1,6 @@
 import pytest
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import CacheStats
 from app.models.subject import Subject
 from app.models.role import Role
 from app.schemas.subject import SubjectCreate, SubjectUpdate
@@ -6,6 +8,7 @@ from app.crud import subject as crud
 from app.exceptions.subject import *
 from app.exceptions.exam import *
 from app.exceptions.grade import *
+from app.exceptions.concurrency import *
 
 
 def test_create_subject_as_editor(db, test_editor):
@@ -92,3 +95,88 @@ def test_delete_subject_twice_raises(db, test_editor):
 def test_get_nonexistent_subject_raises(db, test_editor):
     with pytest.raises(SubjectNotFound):
         crud.get_subject(db, subject_id=9999, owner_id=test_editor.id)
+
+
+def test_get_subject_full_loads_tree_in_fixed_queries(db, test_editor):
+    from datetime import datetime
+
+    from app.crud import exam as exam_crud
+    from app.crud import grade as grade_crud
+    from app.models.grade_enum import GradeEnum
+    from app.schemas.exam import ExamCreate
+    from app.schemas.grade import GradeCreate
+    from app.schemas.subject import SubjectFull
+
+    subject = crud.create_subject(db, SubjectCreate(user_id=test_editor.id, name="Music"), owner_id=test_editor.id)
+    for weight, grades in ((1.0, [GradeEnum.sehr_gut, GradeEnum.gut]), (3.0, [GradeEnum.genuegend])):
+        exam = exam_crud.create_exam(
+            db,
+            ExamCreate(title="Test", date=datetime(2025, 1, 1), weight=weight, subject_id=subject.id),
+            test_editor.id
+        )
+        for grade in grades:
+            grade_crud.create_grade(db, GradeCreate(exam_id=exam.id, grade=grade), test_editor.id)
+    deleted = exam_crud.create_exam(db, ExamCreate(title="Old", date=datetime(2024, 1, 1), subject_id=subject.id), test_editor.id)
+    exam_crud.delete_exam(db, deleted.id, test_editor.id)
+    subject_id, owner_id = subject.id, test_editor.id
+    db.expire_all()
+
+    statements = []
+
+    def listener(*args):
+        statements.append(args[2])
+
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        full = SubjectFull.model_validate(crud.get_subject_full(db, subject_id, owner_id), from_attributes=True)
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+    # user, subject, exams, grades
+    assert len(statements) == 4
+    assert full.exam_count == 2
+    assert full.grade_count == 3
+    assert [exam.average_grade for exam in full.exams] == [1.5, 4.0]
+    assert full.average_grade == (1.5 * 1.0 + 4.0 * 3.0) / 4.0
+
+
+def test_get_subject_full_of_other_user_raises(db, test_superuser, test_editor):
+    subject = crud.create_subject(db, SubjectCreate(user_id=test_superuser.id, name="Art"), owner_id=test_superuser.id)
+
+    with pytest.raises(SubjectNotFound):
+        crud.get_subject_full(db, subject.id, owner_id=test_editor.id)
+    assert len(crud.get_subjects_full(db, owner_id=test_editor.id)) == 0
+    assert len(crud.get_subjects_full(db, owner_id=test_superuser.id)) == 1
+
+
+def test_update_subject_changed_concurrently_conflicts(db, test_editor):
+    subject = crud.create_subject(db, SubjectCreate(user_id=test_editor.id, name="Math"), test_editor.id)
+    crud.get_subject(db, subject.id, test_editor.id)
+
+    # Someone else updates the row behind the session's back
+    db.connection().execute(
+        Subject.__table__.update().where(Subject.id == subject.id).values(version=Subject.__table__.c.version + 1)
+    )
+
+    with pytest.raises(VersionConflict):
+        crud.update_subject(db, subject.id, SubjectUpdate(name="Maths"), test_editor.id)
+
+
+def test_lookups_reuse_compiled_statements(db, test_editor):
+    subject = crud.create_subject(db, SubjectCreate(user_id=test_editor.id, name="Math"), owner_id=test_editor.id)
+    crud.get_subject(db, subject.id, test_editor.id)
+
+    cache_stats = []
+    engine = db.get_bind()
+
+    def listener(_conn, _cursor, _statement, _parameters, context, _executemany):
+        cache_stats.append(context.cache_hit)
+
+    event.listen(engine, "after_cursor_execute", listener)
+    try:
+        db.expunge_all()
+        crud.get_subject(db, subject.id, test_editor.id)
+    finally:
+        event.remove(engine, "after_cursor_execute", listener)
+
+    assert cache_stats and all(stat == CacheStats.CACHE_HIT for stat in cache_stats)
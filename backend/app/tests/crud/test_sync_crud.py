@@ -0,0 +1,90 @@
+from datetime import datetime
+
+from app.crud import exam as exam_crud
+from app.crud import grade as grade_crud
+from app.crud import subject as subject_crud
+from app.crud import sync as crud
+from app.models.grade_enum import GradeEnum
+from app.schemas.exam import ExamCreate
+from app.schemas.grade import GradeCreate
+from app.schemas.subject import SubjectCreate, SubjectUpdate
+
+
+def create_tree(db, user, name="Englisch"):
+    subject = subject_crud.create_subject(db, SubjectCreate(user_id=user.id, name=name), user.id)
+    exam = exam_crud.create_exam(
+        db, ExamCreate(title="Test", date=datetime(2025, 5, 1), subject_id=subject.id), user.id
+    )
+    grade = grade_crud.create_grade(db, GradeCreate(exam_id=exam.id, grade=GradeEnum.gut), user.id)
+    return subject, exam, grade
+
+
+def test_full_sync_returns_everything(db, test_editor):
+    subject, exam, grade = create_tree(db, test_editor)
+
+    changes = crud.get_changes(db, test_editor.id, since=0)
+
+    assert [s.id for s in changes["subjects"]] == [subject.id]
+    assert [e.id for e in changes["exams"]] == [exam.id]
+    assert [g.id for g in changes["grades"]] == [grade.id]
+    assert changes["deleted"] == []
+    assert changes["has_more"] is False
+    assert changes["next_since"] == grade.change_seq
+
+
+def test_delta_sync_returns_only_changes_and_tombstones(db, test_editor):
+    subject, exam, grade = create_tree(db, test_editor)
+    since = crud.get_changes(db, test_editor.id, since=0)["next_since"]
+
+    subject_crud.update_subject(db, subject.id, SubjectUpdate(name="English"), test_editor.id)
+    exam_crud.delete_exam(db, exam.id, test_editor.id)
+    grade_crud.delete_grade(db, grade.id, test_editor.id)
+
+    changes = crud.get_changes(db, test_editor.id, since=since)
+
+    assert [s.name for s in changes["subjects"]] == ["English"]
+    assert changes["exams"] == []
+    assert changes["grades"] == []
+    assert {(d["entity"], d["id"]) for d in changes["deleted"]} == {("exam", exam.id), ("grade", grade.id)}
+
+    assert crud.get_changes(db, test_editor.id, since=changes["next_since"]) == {
+        "next_since": changes["next_since"], "has_more": False
+    }
+
+
+def test_sync_pages_and_filters_owner(db, test_superuser, test_editor):
+    create_tree(db, test_superuser, name="Fremd")
+    for i in range(3):
+        create_tree(db, test_editor, name=f"Fach {i}")
+
+    seen, since, has_more = [], 0, True
+    while has_more:
+        changes = crud.get_changes(db, test_editor.id, since=since, limit=2)
+        seen.extend(s.name for s in changes["subjects"])
+        since, has_more = changes["next_since"], changes["has_more"]
+
+    assert seen == ["Fach 0", "Fach 1", "Fach 2"]
+
+
+def test_rows_from_before_delta_sync_are_backfilled(db, test_editor):
+    from sqlalchemy import inspect, text
+
+    from app.core import db as init
+    from app.models.subject import Subject
+
+    subject, exam, grade = create_tree(db, test_editor)
+    since = crud.get_changes(db, test_editor.id, since=0)["next_since"]
+    updated_at = subject.updated_at
+    db.execute(text("UPDATE subjects SET change_seq = NULL"))
+    db.execute(text("DROP INDEX ix_grades_change_seq"))
+    db.execute(text("ALTER TABLE grades DROP COLUMN change_seq"))
+    db.commit()
+
+    init._upgrade_schema(db.get_bind())
+
+    assert "change_seq" in {column["name"] for column in inspect(db.get_bind()).get_columns("grades")}
+    changes = crud.get_changes(db, test_editor.id, since=since)
+    assert [s.id for s in changes["subjects"]] == [subject.id]
+    assert [g.id for g in changes["grades"]] == [grade.id]
+    assert changes["exams"] == []
+    assert db.get(Subject, subject.id).updated_at == updated_at
@@ -0,0 +1,25 @@
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import CacheStats
+
+from app.crud import user as crud
+
+
+def test_user_lookups_reuse_compiled_statements(db, test_editor):
+    crud.get_user(db=db, user_id=test_editor.id)
+    crud.get_user_by_email(db=db, email=test_editor.email)
+
+    cache_stats = []
+    engine = db.get_bind()
+
+    def listener(_conn, _cursor, _statement, _parameters, context, _executemany):
+        cache_stats.append(context.cache_hit)
+
+    event.listen(engine, "after_cursor_execute", listener)
+    try:
+        db.expunge_all()
+        assert crud.get_user(db=db, user_id=test_editor.id).email == test_editor.email
+        assert crud.get_user_by_email(db=db, email=test_editor.email).id == test_editor.id
+    finally:
+        event.remove(engine, "after_cursor_execute", listener)
+
+    assert cache_stats == [CacheStats.CACHE_HIT, CacheStats.CACHE_HIT]
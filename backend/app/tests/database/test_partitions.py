@@ -0,0 +1,54 @@
+import datetime
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateTable
+
+from app.core.config import settings
+from app.database import partitions
+from app.models.exam import Exam
+from app.models.grade import Grade
+
+
+def test_school_year_starts_in_august():
+    assert partitions.school_year(datetime.date(2025, 7, 31)) == 2024
+    assert partitions.school_year(datetime.date(2025, 8, 1)) == 2025
+    assert partitions.school_year_range(2025) == (datetime.datetime(2025, 8, 1), datetime.datetime(2026, 8, 1))
+
+
+def test_plan_creates_ahead_and_detaches_expired(monkeypatch):
+    monkeypatch.setattr(settings, "PARTITION_YEARS_AHEAD", 1)
+    monkeypatch.setattr(settings, "PARTITION_RETENTION_YEARS", 2)
+
+    create, detach = partitions.plan(datetime.date(2025, 9, 1), {2021, 2023, 2024, 2025})
+
+    assert create == [2026]
+    assert detach == [2021, 2023]
+
+
+def test_plan_keeps_everything_without_retention(monkeypatch):
+    monkeypatch.setattr(settings, "PARTITION_RETENTION_YEARS", None)
+
+    create, detach = partitions.plan(datetime.date(2025, 9, 1), {2010})
+
+    assert create == [2025, 2026]
+    assert detach == []
+
+
+def test_postgres_tables_are_partitioned():
+    exams = str(CreateTable(Exam.__table__).compile(dialect=postgresql.dialect()))
+    grades = str(CreateTable(Grade.__table__).compile(dialect=postgresql.dialect()))
+
+    assert "PRIMARY KEY (id, date)" in exams
+    assert "PARTITION BY RANGE (date)" in exams
+    assert "uq_exams_id_date" not in exams
+    assert "PRIMARY KEY (id, exam_date)" in grades
+    assert "PARTITION BY RANGE (exam_date)" in grades
+    assert "REFERENCES exams (id, date) ON UPDATE CASCADE DEFERRABLE" in grades
+
+
+def test_other_databases_get_plain_tables():
+    exams = str(CreateTable(Exam.__table__).compile(dialect=sqlite.dialect()))
+
+    assert "PRIMARY KEY (id)" in exams
+    assert "UNIQUE (id, date)" in exams
+    assert "PARTITION" not in exams
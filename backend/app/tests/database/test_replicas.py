@@ -0,0 +1,59 @@
+import time
+
+from sqlalchemy import create_engine
+
+from app.database import replicas
+from app.database.replicas import WRITE_COOKIE, ReplicaRouter
+
+
+def create_router(*urls, lag_window=5.0):
+    engines = [create_engine(url) for url in urls]
+    return ReplicaRouter(engines, lag_window=lag_window, health_check_interval=60.0), engines
+
+
+def test_choose_round_robin():
+    router, engines = create_router("sqlite://", "sqlite://")
+
+    chosen = [router.choose() for _ in range(4)]
+
+    assert chosen == [engines[0], engines[1], engines[0], engines[1]]
+
+
+def test_choose_without_replicas_uses_primary():
+    router, _ = create_router()
+
+    assert router.choose() is None
+
+
+def test_choose_skips_unhealthy_replica():
+    router, engines = create_router("sqlite:////nonexistent/dir/replica.db", "sqlite://")
+
+    assert {router.choose() for _ in range(3)} == {engines[1]}
+
+
+def test_recent_writer_reads_from_primary():
+    router, engines = create_router("sqlite://")
+
+    assert router.choose(written_at=time.time()) is None
+    assert router.choose(written_at=None) is engines[0]
+
+
+def test_lag_window_expires():
+    router, engines = create_router("sqlite://", lag_window=0.0)
+
+    assert router.choose(written_at=time.time()) is engines[0]
+
+
+def test_write_responses_pin_the_client_to_the_primary(client_with_editor, test_editor, monkeypatch):
+    written_at = []
+    monkeypatch.setattr(replicas.replica_router, "choose", lambda last_write=None: written_at.append(last_write))
+
+    created = client_with_editor.post(
+        "/api/v1/subjects/create-subject", json={"user_id": test_editor.id, "name": "Math"}
+    )
+    # The client, not the worker, carries the pin to the next request
+    read = client_with_editor.get(f"/api/v1/subjects/{created.json()['id']}")
+
+    assert WRITE_COOKIE in created.cookies
+    assert WRITE_COOKIE not in read.cookies
+    assert replicas.replica_router.recently_wrote(written_at[-1])
@@ -0,0 +1,202 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+
+from app.api import deps
+from app.api.routes import batch
+from app.api.routes.login import _issue_tokens
+from app.crud import exam as exam_crud
+from app.crud import grade as grade_crud
+from app.crud import subject as subject_crud
+from app.crud import tenant as tenant_crud
+from app.database import rebalance
+from app.database.session import Base
+from app.database.shards import ShardRouter
+from app.main import app
+from app.models.exam import Exam
+from app.models.grade import Grade
+from app.models.grade_enum import GradeEnum
+from app.models.role import Role
+from app.models.subject import Subject
+from app.models.tenant import Tenant
+from app.models.user import User
+from app.schemas.exam import ExamCreate
+from app.schemas.grade import GradeCreate
+from app.schemas.subject import SubjectCreate
+
+
+@pytest.fixture
+def router(tmp_path):
+    directory = create_engine(f"sqlite:///{tmp_path / 'primary.db'}", connect_args={"check_same_thread": False})
+    router = ShardRouter({"shard-1": f"sqlite:///{tmp_path / 'shard1.db'}"}, refresh_interval=0.0, directory=directory)
+    for shard in router.names:
+        Base.metadata.create_all(router.engine(shard))
+    yield router
+    router.dispose()
+    directory.dispose()
+
+
+def add_tenant(router, name, shard):
+    with router.session("default") as db:
+        tenant = Tenant(name=name, shard=shard)
+        db.add(tenant)
+        db.flush()
+        user = User(
+            username=f"{name}-editor", email=f"editor@{name}.invalid", hashed_password="!",
+            role=Role.EDITOR, tenant_id=tenant.id, created_at=datetime(2025, 1, 1),
+        )
+        db.add(user)
+        db.commit()
+        return tenant.id, user.id
+
+
+def add_grade(db, user_id, title="Schularbeit"):
+    subject = subject_crud.create_subject(db, SubjectCreate(user_id=user_id, name="Mathe"), user_id)
+    exam = exam_crud.create_exam(db, ExamCreate(title=title, date=datetime(2025, 1, 15), subject_id=subject.id), user_id)
+    return grade_crud.create_grade(db, GradeCreate(exam_id=exam.id, grade=GradeEnum.gut), user_id)
+
+
+def count(router, shard, model):
+    with router.session(shard) as db:
+        return db.scalar(select(func.count()).select_from(model))
+
+
+def test_tenants_are_routed_to_their_shard(router):
+    tenant_id, _ = add_tenant(router, "schule-a", "shard-1")
+
+    assert router.shard_of(tenant_id) == "shard-1"
+    assert router.shard_of(None) == "default"
+    assert router.shard_of(999) == "default"
+    assert not router.is_read_only(tenant_id)
+
+
+def test_without_shards_everything_is_default():
+    router = ShardRouter({}, refresh_interval=0.0)
+
+    assert not router.enabled
+    assert router.shard_of(1) == "default"
+
+
+def test_shard_session_keeps_directory_models_on_primary(router):
+    _, user_id = add_tenant(router, "schule-a", "shard-1")
+
+    with router.session("shard-1") as db:
+        add_grade(db, user_id)
+
+    assert count(router, "shard-1", Grade) == 1
+    assert count(router, "default", Grade) == 0
+    with router.session("default") as db:
+        assert db.scalar(select(func.count()).select_from(User).where(User.id == user_id)) == 1
+
+
+def test_fan_out_queries_every_shard(router):
+    _, user_a = add_tenant(router, "schule-a", "default")
+    _, user_b = add_tenant(router, "schule-b", "shard-1")
+    for shard, user_id in (("default", user_a), ("shard-1", user_b), ("shard-1", user_b)):
+        with router.session(shard) as db:
+            add_grade(db, user_id)
+
+    totals = router.fan_out(lambda db: db.scalar(select(func.count()).select_from(Subject)))
+
+    assert totals == {"default": 1, "shard-1": 2}
+
+
+def test_tenant_report_counts_each_tenant_on_its_shard(router, monkeypatch):
+    tenant_a, user_a = add_tenant(router, "schule-a", "default")
+    tenant_b, user_b = add_tenant(router, "schule-b", "shard-1")
+    with router.session("shard-1") as db:
+        add_grade(db, user_b)
+    with router.session("default") as db:
+        # A leftover of tenant b on its old shard isn't counted
+        add_grade(db, user_b)
+        db.add(User(username="admin", email="admin@x.invalid", hashed_password="!", role=Role.SUPERUSER, created_at=datetime(2025, 1, 1)))
+        db.commit()
+        admin_id = db.scalar(select(User.id).where(User.username == "admin"))
+    monkeypatch.setattr(tenant_crud, "shard_router", router)
+
+    with router.session("default") as db:
+        report = {row["tenant_id"]: row for row in tenant_crud.get_tenant_report(db, admin_id)}
+
+    assert report[tenant_b] == {
+        "tenant_id": tenant_b, "name": "schule-b", "shard": "shard-1", "users": 1, "subjects": 1, "exams": 1, "grades": 1,
+    }
+    assert report[tenant_a]["grades"] == 0
+    assert report[None]["users"] == 1
+
+
+def test_move_tenant_copies_changes_and_cleans_up(router):
+    tenant_id, user_id = add_tenant(router, "schule-a", "default")
+    _, other_id = add_tenant(router, "schule-b", "default")
+    with router.session("default") as db:
+        kept = add_grade(db, user_id)
+        dropped = grade_crud.create_grade(db, GradeCreate(exam_id=kept.exam_id, grade=GradeEnum.sehr_gut), user_id)
+        add_grade(db, other_id)
+        kept_id, dropped_id, subject_id = kept.id, dropped.id, kept.exam.subject_id
+
+    source, target = router.engine("default"), router.engine("shard-1")
+    since, copied = rebalance.copy_changes(source, target, [user_id], None)
+    assert copied == 4  # subject, exam, two grades
+
+    # Changed after the first copy
+    with router.session("default") as db:
+        grade_crud.delete_grade(db, dropped_id, user_id)
+        exam_crud.create_exam(db, ExamCreate(title="Test", date=datetime(2025, 3, 1), subject_id=subject_id), user_id)
+    _, copied = rebalance.copy_changes(source, target, [user_id], since)
+    assert copied == 3  # new exam, the grade's tombstone, its deletion
+
+    rebalance.move_tenant(tenant_id, "shard-1", router=router, grace=0.0)
+
+    assert router.shard_of(tenant_id) == "shard-1"
+    with router.session("shard-1") as db:
+        assert db.scalars(select(Grade.id)).all() == [kept_id]
+        assert sorted(db.scalars(select(Exam.title)).all()) == ["Schularbeit", "Test"]
+    # Only the other tenant is left on the source
+    assert count(router, "default", Subject) == 1
+    assert count(router, "default", Grade) == 1
+
+
+def test_atomic_batch_on_a_shard(router, monkeypatch):
+    _, user_id = add_tenant(router, "schule-a", "shard-1")
+    with router.session("default") as db:
+        token = _issue_tokens(db.get(User, user_id)).access_token
+    monkeypatch.setattr(deps, "shard_router", router)
+    monkeypatch.setattr(batch, "shard_router", router)
+    monkeypatch.setattr(app, "dependency_overrides", {})
+
+    response = TestClient(app).post(
+        "/api/v1/batch/",
+        json={"atomic": True, "operations": [
+            {"method": "POST", "path": "/subjects/create-subject", "body": {"user_id": user_id, "name": "Art"}},
+        ]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert [r["status"] for r in response.json()] == [201]
+    assert count(router, "shard-1", Subject) == 1
+    assert count(router, "default", Subject) == 0
+
+
+def test_superusers_write_on_the_shard_of_the_named_tenant(router, monkeypatch):
+    _, user_a = add_tenant(router, "schule-a", "default")
+    tenant_b, user_b = add_tenant(router, "schule-b", "shard-1")
+    with router.session("default") as db:
+        admin = User(username="admin", email="admin@x.invalid", hashed_password="!", role=Role.SUPERUSER, created_at=datetime(2025, 1, 1))
+        db.add(admin)
+        db.commit()
+        token = _issue_tokens(admin).access_token
+    monkeypatch.setattr(deps, "shard_router", router)
+    monkeypatch.setattr(subject_crud, "shard_router", router)
+    monkeypatch.setattr(app, "dependency_overrides", {})
+    client = TestClient(app, headers={"Authorization": f"Bearer {token}"})
+
+    def create_subject(user_id, headers=None):
+        return client.post("/api/v1/subjects/create-subject", json={"user_id": user_id, "name": "Art"}, headers=headers)
+
+    assert create_subject(user_b).status_code == 400
+    assert create_subject(user_a, {"X-Tenant-ID": str(tenant_b)}).status_code == 400
+    assert create_subject(user_b, {"X-Tenant-ID": str(tenant_b)}).status_code == 201
+    assert create_subject(user_a).status_code == 201
+    assert count(router, "shard-1", Subject) == 1
+    assert count(router, "default", Subject) == 1
@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from app.database.sqlite import WriterQueue, create_sqlite_engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_sqlite_engine(
+        str(tmp_path / "app.db"), cache_size_kib=1024, mmap_size=1 << 20, busy_timeout_ms=1000, write_timeout=5.0
+    )
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, value INTEGER)"))
+    yield engine
+    engine.dispose()
+
+
+def test_connection_pragmas(engine):
+    with engine.connect() as connection:
+        def pragma(name):
+            return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1  # NORMAL
+        assert pragma("cache_size") == -1024
+        assert pragma("foreign_keys") == 1
+
+
+def test_writer_queue_is_fifo():
+    queue = WriterQueue(timeout=5.0)
+    queue.acquire()
+    order = []
+    threads = []
+    for i in range(3):
+        def write(i=i):
+            queue.acquire()
+            order.append(i)
+            queue.release()
+        thread = threading.Thread(target=write)
+        thread.start()
+        threads.append(thread)
+        # Wait until the thread is queued, so the arrival order is fixed
+        while len(queue._waiters) <= i:
+            pass
+
+    queue.release()
+    for thread in threads:
+        thread.join()
+
+    assert order == [0, 1, 2]
+
+
+def test_writer_queue_timeout():
+    queue = WriterQueue(timeout=0.01)
+    queue.acquire()
+
+    with pytest.raises(TimeoutError):
+        queue.acquire()
+
+    queue.release()
+    queue.acquire()
+
+
+def test_concurrent_writes_are_serialized(engine):
+    errors = []
+
+    def write(n):
+        try:
+            for i in range(20):
+                with engine.begin() as connection:
+                    connection.execute(text("INSERT INTO items (value) VALUES (:v)"), {"v": n * 100 + i})
+                    connection.execute(text("SELECT count(*) FROM items")).scalar()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM items")).scalar() == 160
+
+
+def test_rollback_releases_writer(engine):
+    with engine.connect() as connection:
+        connection.execute(text("INSERT INTO items (value) VALUES (1)"))
+        connection.rollback()
+
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO items (value) VALUES (2)"))
+        assert connection.execute(text("SELECT value FROM items")).scalars().all() == [2]
+
+
+def test_released_savepoint_rolls_back_with_the_transaction(engine):
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        with connection.begin_nested():
+            connection.execute(text("INSERT INTO items (value) VALUES (1)"))
+        transaction.rollback()
+
+    # The writer was released by the rollback
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO items (value) VALUES (2)"))
+        assert connection.execute(text("SELECT value FROM items")).scalars().all() == [2]
+
+
+def test_reads_before_the_first_write_do_not_pin_a_snapshot(engine):
+    with engine.connect() as reader, engine.connect() as writer:
+        reader.execute(text("SELECT count(*) FROM items")).scalar()
+        writer.execute(text("INSERT INTO items (value) VALUES (1)"))
+        writer.commit()
+
+        # Would fail with "database is locked" in a transaction begun at the read
+        reader.execute(text("INSERT INTO items (value) VALUES (2)"))
+        reader.commit()
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM items")).scalar() == 2
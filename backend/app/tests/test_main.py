@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import app.main
+from app.main import create_app
+
+APP_DIR = Path(app.main.__file__).resolve().parent
+
+
+def test_import_defers_app_and_engine():
+    code = (
+        "import sys, app.main; "
+        "print(*(m for m in ('fastapi', 'app.api.main', 'sqlalchemy', 'psycopg') if m in sys.modules))"
+    )
+    env = {**os.environ, "PYTHONPATH": str(APP_DIR.parent)}
+    result = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, env=env, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
+
+
+def test_module_app_is_built_once():
+    assert app.main.app is app.main.app
+    assert "app" in dir(app.main)
+
+
+def test_create_app_builds_independent_apps():
+    first, second = create_app(), create_app()
+
+    assert first is not second
+    assert "/api/v1/subjects/" in first.openapi()["paths"]